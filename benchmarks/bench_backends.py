@@ -0,0 +1,130 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / 'socialetl'))
+import argparse
+import dataclasses
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from bench_load import synthetic_social_data
+from loader import DEFAULT_BATCH_SIZE, bulk_load
+from schema_manager import setup_db_schema, teardown_db_schema
+from social_etl import SocialMediaData
+from utils.db import DB_BACKENDS, PERFORMANCE_PROFILES, DatabaseConnection
+
+
+def updated_social_data(
+    social_data: List[SocialMediaData],
+) -> List[SocialMediaData]:
+    """Function to change the score of every post, so each one is
+    rewritten by the next load."""
+    return [
+        dataclasses.replace(
+            post,
+            social_data=dataclasses.replace(
+                post.social_data, score=post.social_data.score + 1
+            ),
+        )
+        for post in social_data
+    ]
+
+
+def time_backend(
+    db: DatabaseConnection,
+    social_data: List[SocialMediaData],
+    batch_size: int,
+) -> Dict[str, float]:
+    """Function to time a load of new posts, a reload of the same posts
+    (all skipped) and a load of changed posts into a fresh schema.
+
+    Returns:
+        Dict[str, float]: Seconds per pass.
+    """
+    teardown_db_schema(db)
+    setup_db_schema(db=db)
+    passes = {
+        'insert': social_data,
+        'unchanged': social_data,
+        'update': updated_social_data(social_data),
+    }
+    seconds = {}
+    for name, posts in passes.items():
+        start = time.perf_counter()
+        bulk_load(posts, db.managed_cursor(), batch_size=batch_size)
+        seconds[name] = time.perf_counter() - start
+    teardown_db_schema(db)
+    return seconds
+
+
+if __name__ == '__main__':
+    # Compare bulk load throughput per database backend, against local
+    # instances: sqlite3 and duckdb files in a temporary directory, and the
+    # Postgres server of --dsn (or $POSTGRES_DSN) when one is given, e.g.
+    # python benchmarks/bench_backends.py --sizes 100000 --dsn dbname=bench
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        type=int,
+        default=[10_000, 100_000],
+        help='Number of synthetic rows to load per run.',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help='Rows per transaction.',
+    )
+    parser.add_argument(
+        '--backends',
+        nargs='+',
+        choices=list(DB_BACKENDS),
+        default=list(DB_BACKENDS),
+        help='Backends to benchmark.',
+    )
+    parser.add_argument(
+        '--profile',
+        choices=list(PERFORMANCE_PROFILES),
+        default='balanced',
+        help='Performance profile applied on connect, as main.py does.',
+    )
+    parser.add_argument(
+        '--dsn',
+        type=str,
+        default=os.environ.get('POSTGRES_DSN'),
+        help='Connection string of a Postgres database the benchmark may'
+        ' drop and recreate social_posts in.',
+    )
+    args = parser.parse_args()
+    print(
+        f'{"rows":>10} {"backend":>9} {"pass":>10} {"seconds":>9}'
+        f' {"rows/sec":>12}'
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            social_data = synthetic_social_data(size)
+            for backend in args.backends:
+                db_file: Optional[str] = os.path.join(
+                    tmp_dir, f'bench.{backend}'
+                )
+                if backend == 'postgres':
+                    if not args.dsn:
+                        print(f'{size:>10} {backend:>9} skipped, no --dsn')
+                        continue
+                    db_file = None
+                with DatabaseConnection(
+                    db_type=backend,
+                    db_file=db_file,
+                    dsn=args.dsn,
+                    pooled=True,
+                    profile=args.profile,
+                ) as db:
+                    seconds = time_backend(db, social_data, args.batch_size)
+                for name, elapsed in seconds.items():
+                    print(
+                        f'{size:>10} {backend:>9} {name:>10} {elapsed:>9.3f}'
+                        f' {size / elapsed:>12,.0f}'
+                    )
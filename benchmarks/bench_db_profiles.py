@@ -0,0 +1,63 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / 'socialetl'))
+import argparse
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+from bench_load import CREATE_SOCIAL_POSTS_SQL, synthetic_social_data
+from loader import bulk_load
+from social_etl import SocialMediaData
+from utils.db import PERFORMANCE_PROFILES, DatabaseConnection
+
+
+def time_profile(
+    profile: Optional[str],
+    social_data: List[SocialMediaData],
+    batch_size: int,
+) -> float:
+    """Function to time a bulk load into a fresh db with the given profile."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with DatabaseConnection(
+            db_file=os.path.join(tmp_dir, 'bench.db'),
+            pooled=True,
+            profile=profile,
+        ) as db:
+            with db.managed_cursor() as cur:
+                cur.execute(CREATE_SOCIAL_POSTS_SQL)
+            start = time.perf_counter()
+            bulk_load(social_data, db.managed_cursor(), batch_size=batch_size)
+            return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    # Compare bulk load throughput per SQLite performance profile, e.g.
+    # python benchmarks/bench_db_profiles.py --sizes 100000 --batch-size 1000
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        type=int,
+        default=[100_000, 1_000_000],
+        help='Number of synthetic rows to load per run.',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=1_000,
+        help='Rows per transaction; smaller batches mean more commits.',
+    )
+    args = parser.parse_args()
+    profiles = [None, *PERFORMANCE_PROFILES]
+    print(f'{"rows":>10} {"profile":>9} {"seconds":>9} {"rows/sec":>12}')
+    for size in args.sizes:
+        social_data = synthetic_social_data(size)
+        for profile in profiles:
+            seconds = time_profile(profile, social_data, args.batch_size)
+            print(
+                f'{size:>10} {str(profile):>9} {seconds:>9.3f}'
+                f' {size / seconds:>12,.0f}'
+            )
@@ -0,0 +1,115 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / 'socialetl'))
+import argparse
+import os
+import tempfile
+import time
+from dataclasses import asdict
+from functools import partial
+from typing import Callable, List
+
+from loader import DEFAULT_BATCH_SIZE, INSERT_SOCIAL_POST_SQL, bulk_load
+from social_etl import RedditPostData, SocialMediaData
+from utils.db import DatabaseConnection
+
+CREATE_SOCIAL_POSTS_SQL = """
+    CREATE TABLE social_posts (
+        id TEXT PRIMARY KEY,
+        source TEXT,
+        social_data TEXT,
+        content_hash INTEGER,
+        dt_created datetime default current_timestamp
+    )
+"""
+
+
+def synthetic_social_data(num_records: int) -> List[SocialMediaData]:
+    """Function to generate synthetic reddit SocialMediaData objects."""
+    return [
+        SocialMediaData(
+            id=f'id{idx}',
+            source='reddit',
+            social_data=RedditPostData(
+                title=f'title{idx}',
+                score=idx % 1000,
+                url=f'https://reddit.com/r/dataengineering/{idx}',
+                comms_num=idx % 50,
+                created='1675000000.0',
+                text=f'text{idx}',
+            ),
+        )
+        for idx in range(num_records)
+    ]
+
+
+def row_loop_load(
+    social_data: List[SocialMediaData], db: DatabaseConnection
+) -> None:
+    """The original load: one execute per post in a single transaction."""
+    with db.managed_cursor() as cur:
+        for post in social_data:
+            cur.execute(
+                INSERT_SOCIAL_POST_SQL,
+                {
+                    'id': post.id,
+                    'source': post.source,
+                    'social_data': str(asdict(post.social_data)),
+                    'content_hash': None,
+                },
+            )
+
+
+def batched_load(
+    social_data: List[SocialMediaData],
+    db: DatabaseConnection,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> None:
+    bulk_load(social_data, db.managed_cursor(), batch_size=batch_size)
+
+
+def time_load(
+    load: Callable[[List[SocialMediaData], DatabaseConnection], None],
+    social_data: List[SocialMediaData],
+) -> float:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseConnection(db_file=os.path.join(tmp_dir, 'bench.db'))
+        with db.managed_cursor() as cur:
+            cur.execute(CREATE_SOCIAL_POSTS_SQL)
+        start = time.perf_counter()
+        load(social_data, db)
+        return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    # Benchmark the per-row INSERT loop against the batched bulk loader, e.g.
+    # python benchmarks/bench_load.py --sizes 1000 100000 1000000
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        type=int,
+        default=[1_000, 100_000, 1_000_000],
+        help='Number of synthetic rows to load per run.',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help='Rows per transaction for the batched loader.',
+    )
+    args = parser.parse_args()
+    loaders = [
+        ('row', row_loop_load),
+        ('batched', partial(batched_load, batch_size=args.batch_size)),
+    ]
+    print(f'{"rows":>10} {"loader":>8} {"seconds":>9} {"rows/sec":>12}')
+    for size in args.sizes:
+        social_data = synthetic_social_data(size)
+        for name, load in loaders:
+            seconds = time_load(load, social_data)
+            print(
+                f"{size:>10} {name:>8} {seconds:>9.3f}"
+                f" {size / seconds:>12,.0f}"
+            )
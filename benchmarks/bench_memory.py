@@ -0,0 +1,96 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / 'socialetl'))
+import argparse
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+from batch import SocialMediaBatch
+from bench_load import synthetic_social_data
+from social_etl import RedditPostData
+
+
+@dataclass
+class DictRedditPostData:
+    """The dict backed record types used before slots=True."""
+
+    title: str
+    score: int
+    url: str
+    comms_num: int
+    created: str
+    text: str
+
+
+@dataclass
+class DictSocialMediaData:
+    id: str
+    source: str
+    social_data: DictRedditPostData
+
+
+def dict_backed_social_data(num_records: int) -> list:
+    return [
+        DictSocialMediaData(
+            id=post.id,
+            source=post.source,
+            social_data=DictRedditPostData(
+                **{
+                    name: getattr(post.social_data, name)
+                    for name in RedditPostData.__slots__
+                }
+            ),
+        )
+        for post in synthetic_social_data(num_records)
+    ]
+
+
+def peak_memory(build) -> tuple:
+    """Function to get the traced memory held by build()'s result."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def time_comms_num_sum(social_data) -> float:
+    start = time.perf_counter()
+    if isinstance(social_data, SocialMediaBatch):
+        sum(social_data.column('comms_num'))
+    else:
+        sum(post.social_data.comms_num for post in social_data)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    # Compare per record memory and attribute access cost of the record
+    # layouts, e.g. python benchmarks/bench_memory.py --records 1000000
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--records',
+        type=int,
+        default=1_000_000,
+        help='Number of synthetic reddit records to build per layout.',
+    )
+    args = parser.parse_args()
+    layouts = {
+        'dict': lambda: dict_backed_social_data(args.records),
+        'slots': lambda: synthetic_social_data(args.records),
+        'columnar': lambda: SocialMediaBatch.from_records(
+            synthetic_social_data(args.records)
+        ),
+    }
+    print(f'{"layout":>9} {"bytes/record":>13} {"sum ms":>8}')
+    for name, build in layouts.items():
+        social_data, traced = peak_memory(build)
+        sum_seconds = time_comms_num_sum(social_data)
+        print(
+            f'{name:>9} {traced / args.records:>13,.0f}'
+            f' {sum_seconds * 1000:>8,.1f}'
+        )
+        del social_data
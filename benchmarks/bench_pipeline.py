@@ -0,0 +1,408 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / 'socialetl'))
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+from unittest import mock
+
+import loader
+from fake_clients import FakeRedditClient
+from loader import bulk_load
+from metadata import flush_metadata, log_metadata
+from schema_manager import setup_db_schema
+from social_etl import RedditETL, SocialMediaData
+from transform import STREAMING_TRANSFORMATIONS, transformation_factory
+from utils.db import db_factory
+
+TRANSFORMATIONS = ['no_tx', 'sd', 'sd_stream', 'rand', 'sample', 'strat']
+
+# a case returns the number of records it processed and its per-record
+# latency samples, in seconds
+Case = Callable[[], Tuple[int, List[float]]]
+
+
+@dataclass
+class BenchResult:
+    """Dataclass to hold the measurements of one case at one size.
+
+    Args:
+        case (str): Name of the measured step, e.g. 'transform:sd'.
+        size (int): Records extracted from the fake client.
+        records (int): Records the step processed.
+        seconds (float): Median wall time over the repeats.
+        records_per_sec (float): records / seconds.
+        p50_us (float): Median per-record latency, in microseconds.
+        p99_us (float): 99th percentile per-record latency, in
+            microseconds.
+        peak_mb (float): Peak traced Python memory of one run, in MiB.
+    """
+
+    case: str
+    size: int
+    records: int
+    seconds: float
+    records_per_sec: float
+    p50_us: float
+    p99_us: float
+    peak_mb: float
+
+
+def timed_chunks(
+    social_data: Iterable[SocialMediaData],
+    samples: List[float],
+    chunk_size: int,
+) -> Iterator[SocialMediaData]:
+    """Function to pass social_data through, appending the mean seconds
+    per record of every chunk_size records to samples. Wrapping the output
+    of a lazy step times that step. It cannot time a consuming step (e.g. a
+    load), whose work on the last chunk happens after the last record is
+    pulled; see timed_write_batches."""
+    start = time.perf_counter()
+    count = 0
+    for post in social_data:
+        yield post
+        count += 1
+        if count == chunk_size:
+            now = time.perf_counter()
+            samples.append((now - start) / count)
+            start, count = now, 0
+    if count:
+        samples.append((time.perf_counter() - start) / count)
+
+
+@contextmanager
+def timed_write_batches(
+    samples: List[float], end_to_end: bool = False
+) -> Iterator[None]:
+    """Context manager to append the mean seconds per record of every
+    loader.write_batch call (one load transaction) to samples. With
+    end_to_end, a sample spans from the end of the previous call, or from
+    entering the context, so it also counts extracting and transforming the
+    batch."""
+    write_batch = loader.write_batch
+    last = time.perf_counter()
+
+    def timed(cur: Any, rows: List[Dict[str, Any]], *args: Any) -> Any:
+        nonlocal last
+        start = time.perf_counter()
+        written = write_batch(cur, rows, *args)
+        end = time.perf_counter()
+        samples.append((end - (last if end_to_end else start)) / len(rows))
+        last = end
+        return written
+
+    with mock.patch.object(loader, 'write_batch', timed):
+        yield
+
+
+def fake_extract(size: int, latency: float) -> List[SocialMediaData]:
+    return RedditETL(prefetch_pages=False).extract(
+        id='bench', num_records=size, client=FakeRedditClient(size, latency)
+    )
+
+
+def extract_case(size: int, latency: float, chunk_size: int) -> Case:
+    def case() -> Tuple[int, List[float]]:
+        samples: List[float] = []
+        stream = RedditETL().extract_stream(
+            id='bench',
+            num_records=size,
+            client=FakeRedditClient(size, latency),
+        )
+        records = sum(1 for _ in timed_chunks(stream, samples, chunk_size))
+        return records, samples
+
+    return case
+
+
+def transform_case(
+    name: str, social_data: List[SocialMediaData], chunk_size: int
+) -> Case:
+    def case() -> Tuple[int, List[float]]:
+        samples: List[float] = []
+        if name in STREAMING_TRANSFORMATIONS:
+            # streaming transforms are timed per chunk of their input
+            output = transformation_factory(name)(
+                timed_chunks(iter(social_data), samples, chunk_size)
+            )
+            for _ in output:
+                pass
+        else:
+            # list transforms need all their input at once, so their
+            # per-record latency is the amortized call time
+            start = time.perf_counter()
+            transformation_factory(name)(social_data)
+            samples.append((time.perf_counter() - start) / len(social_data))
+        return len(social_data), samples
+
+    return case
+
+
+def load_case(social_data: List[SocialMediaData], chunk_size: int) -> Case:
+    def case() -> Tuple[int, List[float]]:
+        samples: List[float] = []
+        with db_factory(pooled=True) as db, timed_write_batches(samples):
+            bulk_load(
+                social_data, db.managed_cursor(), batch_size=chunk_size
+            )
+        return len(social_data), samples
+
+    return case
+
+
+def log_metadata_case(size: int, chunk_size: int) -> Case:
+    # the overhead of the decorator on a call that does no work
+    @log_metadata
+    def noop(social_data: List[SocialMediaData]) -> None:
+        return None
+
+    def case() -> Tuple[int, List[float]]:
+        samples: List[float] = []
+        for _ in timed_chunks(range(size), samples, chunk_size):
+            noop([])
+        flush_metadata()
+        return size, samples
+
+    return case
+
+
+def run_case(size: int, latency: float, chunk_size: int) -> Case:
+    def case() -> Tuple[int, List[float]]:
+        # the load pulls records one chunk at a time, so each chunk times
+        # its extract, transform and load end to end
+        samples: List[float] = []
+        with db_factory(pooled=True) as db, timed_write_batches(
+            samples, end_to_end=True
+        ):
+            RedditETL().run(
+                db_cursor_context=db.managed_cursor(),
+                client=FakeRedditClient(size, latency),
+                transform_function=transformation_factory('no_tx'),
+                id='bench_run',
+                num_records=size,
+                stream=True,
+                chunk_size=chunk_size,
+            )
+        flush_metadata()
+        return size, samples
+
+    return case
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure(
+    name: str, size: int, case: Case, repeat: int, memory: bool
+) -> BenchResult:
+    """Function to run case repeat times, then once more under tracemalloc
+    for its peak memory (tracing slows the run down, so it is not
+    timed)."""
+    timings, samples = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records, case_samples = case()
+        timings.append(time.perf_counter() - start)
+        samples.extend(case_samples)
+    peak = 0
+    if memory:
+        tracemalloc.start()
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    seconds = statistics.median(timings)
+    return BenchResult(
+        case=name,
+        size=size,
+        records=records,
+        seconds=seconds,
+        records_per_sec=records / seconds if seconds else 0.0,
+        p50_us=percentile(samples, 0.5) * 1e6,
+        p99_us=percentile(samples, 0.99) * 1e6,
+        peak_mb=peak / 2**20,
+    )
+
+
+def run_suite(
+    sizes: List[int],
+    repeat: int = 3,
+    latency: float = 0.0,
+    chunk_size: int = 1000,
+    memory: bool = True,
+) -> List[BenchResult]:
+    """Function to measure every case at every size, against the fake
+    reddit client and a throwaway database."""
+    results = []
+    for size in sizes:
+        social_data = fake_extract(size, latency=0.0)
+        cases: Dict[str, Case] = {
+            'extract': extract_case(size, latency, chunk_size),
+        }
+        for name in TRANSFORMATIONS:
+            cases[f'transform:{name}'] = transform_case(
+                name, social_data, chunk_size
+            )
+        cases['load'] = load_case(social_data, chunk_size)
+        cases['log_metadata'] = log_metadata_case(size, chunk_size)
+        cases['run'] = run_case(size, latency, chunk_size)
+        for name, case in cases.items():
+            result = measure(name, size, case, repeat, memory)
+            print(
+                f'{result.case:<20} {result.size:>9} '
+                f'{result.records_per_sec:>14,.0f} {result.p50_us:>9.2f}'
+                f' {result.p99_us:>9.2f} {result.peak_mb:>9.1f}'
+            )
+            results.append(result)
+    return results
+
+
+def compare(
+    results: List[Dict], baseline: List[Dict], threshold: float
+) -> List[str]:
+    """Function to list the cases slower or bigger than baseline by more
+    than threshold (a fraction, e.g. 0.1 for 10%).
+
+    Returns:
+        List[str]: One message per regression.
+    """
+    regressions = []
+    previous = {(row['case'], row['size']): row for row in baseline}
+    for row in results:
+        base = previous.get((row['case'], row['size']))
+        if base is None:
+            continue
+        checks = [
+            # (metric, ratio of new to old where higher is worse)
+            (
+                'records_per_sec',
+                base['records_per_sec'] / max(row['records_per_sec'], 1e-9),
+            ),
+            ('p99_us', row['p99_us'] / max(base['p99_us'], 1e-9)),
+            ('peak_mb', row['peak_mb'] / max(base['peak_mb'], 1e-9)),
+        ]
+        for metric, ratio in checks:
+            if base[metric] and ratio > 1 + threshold:
+                regressions.append(
+                    f'{row["case"]} at {row["size"]} records: {metric}'
+                    f' {base[metric]:,.2f} -> {row[metric]:,.2f}'
+                    f' ({(ratio - 1) * 100:.0f}% worse)'
+                )
+    return regressions
+
+
+if __name__ == '__main__':
+    # Measure extract, each transformation, load, log_metadata and a full
+    # streamed run against the fake reddit client, save the results and
+    # flag regressions against a previous results file, e.g.
+    # python benchmarks/bench_pipeline.py --sizes 1000 100000 \
+    #     --output bench_results.json --compare bench_baseline.json
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        type=int,
+        default=[1_000, 10_000, 100_000],
+        help='Number of records extracted per case.',
+    )
+    parser.add_argument(
+        '--repeat',
+        default=3,
+        type=int,
+        help='Timed runs per case; the median is reported.',
+    )
+    parser.add_argument(
+        '--latency',
+        default=0.0,
+        type=float,
+        help='Seconds every fake API request sleeps.',
+    )
+    parser.add_argument(
+        '--chunk-size',
+        default=1000,
+        type=int,
+        help='Records per load transaction and per latency sample.',
+    )
+    parser.add_argument(
+        '--no-memory',
+        action='store_true',
+        help='Skip the tracemalloc run measuring peak memory.',
+    )
+    parser.add_argument(
+        '--output',
+        default='bench_results.json',
+        type=str,
+        help='JSON file the results are written to.',
+    )
+    parser.add_argument(
+        '--compare',
+        default=None,
+        type=str,
+        help='Results file of a baseline run to flag regressions against.',
+    )
+    parser.add_argument(
+        '--threshold',
+        default=0.1,
+        type=float,
+        help='Relative slowdown or growth flagged as a regression.',
+    )
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    print(
+        f'{"case":<20} {"records":>9} {"records/sec":>14} {"p50_us":>9}'
+        f' {"p99_us":>9} {"peak_mb":>9}'
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # the ETL writes to data/socialetl.db, relative to the working dir
+        os.chdir(tmp_dir)
+        os.mkdir('data')
+        setup_db_schema()
+        results = run_suite(
+            args.sizes,
+            repeat=args.repeat,
+            latency=args.latency,
+            chunk_size=args.chunk_size,
+            memory=not args.no_memory,
+        )
+        flush_metadata()
+
+    rows = [asdict(result) for result in results]
+    with open(output, 'w') as f:
+        json.dump(
+            {
+                'meta': {
+                    'created': datetime.now(timezone.utc).isoformat(),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'args': vars(args),
+                },
+                'results': rows,
+            },
+            f,
+            indent=2,
+        )
+    print(f'Results written to {output}')
+    if baseline is not None:
+        regressions = compare(rows, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions.')
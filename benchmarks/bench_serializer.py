@@ -0,0 +1,45 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / 'socialetl'))
+import argparse
+import timeit
+from dataclasses import asdict
+
+from bench_load import synthetic_social_data
+from serializer import SERIALIZERS, row_encoder_factory
+
+
+def legacy_encode_row(post):
+    """The original row encoding, a python repr of dataclasses.asdict."""
+    return {
+        'id': post.id,
+        'source': post.source,
+        'social_data': str(asdict(post.social_data)),
+    }
+
+
+if __name__ == '__main__':
+    # Compare the per-row encode cost of each serializer backend, e.g.
+    # python benchmarks/bench_serializer.py --rows 100000
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--rows',
+        type=int,
+        default=100_000,
+        help='Number of synthetic rows encoded per backend.',
+    )
+    args = parser.parse_args()
+    social_data = synthetic_social_data(args.rows)
+    encoders = {'str(asdict)': legacy_encode_row}
+    encoders |= {name: row_encoder_factory(name) for name in SERIALIZERS}
+    print(f'{"encoder":>12} {"ns/row":>10}')
+    for name, encode_row in encoders.items():
+        seconds = min(
+            timeit.repeat(
+                lambda: [encode_row(post) for post in social_data],
+                number=1,
+                repeat=3,
+            )
+        )
+        print(f'{name:>12} {seconds / args.rows * 1e9:>10,.0f}')
@@ -0,0 +1,82 @@
+import pathlib
+import sys
+
+SOCIALETL_DIR = pathlib.Path(__file__).parent.parent / 'socialetl'
+sys.path.append(str(SOCIALETL_DIR))
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+
+def import_times(module: str) -> Tuple[int, Dict[str, int]]:
+    """Function to import module in a fresh interpreter under
+    python -X importtime.
+
+    Returns:
+        Tuple[int, Dict[str, int]]: Cumulative import time of module in
+            microseconds, and the cumulative microseconds of each import
+            module triggers directly (e.g. social_etl, numpy).
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SOCIALETL_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    direct: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:') :].split('|')
+        # nested imports are indented two spaces per level and are listed
+        # before the module importing them
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            direct[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                return int(cumulative), direct
+            direct = {}
+    raise ValueError(f'No import time reported for {module}.')
+
+
+if __name__ == '__main__':
+    # Measure the import time of the CLI entry point (what every run of
+    # main.py pays before doing any work), e.g.
+    # python benchmarks/bench_startup.py --module main --repeat 10
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--module',
+        default='main',
+        type=str,
+        help='Module of socialetl/ to import.',
+    )
+    parser.add_argument(
+        '--repeat',
+        default=10,
+        type=int,
+        help='Number of fresh interpreters; the median is reported.',
+    )
+    parser.add_argument(
+        '--top',
+        default=10,
+        type=int,
+        help='Number of slowest direct imports listed.',
+    )
+    args = parser.parse_args()
+    runs: List[Tuple[int, Dict[str, int]]] = [
+        import_times(args.module) for _ in range(args.repeat)
+    ]
+    totals = [total for total, _ in runs]
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])][1]
+    print(
+        f'import {args.module}: median {statistics.median(totals) / 1000:.1f}'
+        f' ms, min {min(totals) / 1000:.1f} ms over {args.repeat} runs'
+    )
+    print(f'{"module":<40} {"ms":>8}')
+    for name, cumulative in sorted(
+        median_run.items(), key=lambda item: item[1], reverse=True
+    )[: args.top]:
+        print(f'{name:<40} {cumulative / 1000:>8.1f}')
@@ -0,0 +1,72 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / 'socialetl'))
+import argparse
+import time
+from typing import List
+
+from batch import SocialMediaBatch
+from bench_load import synthetic_social_data
+from social_etl import SocialMediaData
+from transform import (
+    standard_deviation_outlier_filter,
+    streaming_standard_deviation_outlier_filter,
+)
+
+
+def pure_python_filter(
+    social_data: List[SocialMediaData],
+) -> List[SocialMediaData]:
+    """The original three pass, list comprehension implementation."""
+    num_comments = [post.social_data.comms_num for post in social_data]
+    mean_num_comments = sum(num_comments) / len(num_comments)
+    std_num_comments = (
+        sum([(x - mean_num_comments) ** 2 for x in num_comments])
+        / len(num_comments)
+    ) ** 0.5
+    return [
+        post
+        for post in social_data
+        if post.social_data.comms_num
+        > mean_num_comments + 2 * std_num_comments
+    ]
+
+
+def time_call(func, *args) -> float:
+    start = time.perf_counter()
+    result = func(*args)
+    if not isinstance(result, (list, SocialMediaBatch)):
+        result = list(result)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    # Compare the standard deviation filter implementations, e.g.
+    # python benchmarks/bench_transform.py --sizes 10000 1000000 10000000
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        type=int,
+        default=[10_000, 100_000, 1_000_000],
+        help='Number of synthetic reddit records to filter.',
+    )
+    args = parser.parse_args()
+    print(f'{"records":>10} {"implementation":>15} {"ms":>10}')
+    for size in args.sizes:
+        social_data = synthetic_social_data(size)
+        batch = SocialMediaBatch.from_records(social_data)
+        runs = {
+            'pure python': (pure_python_filter, social_data),
+            'numpy list': (standard_deviation_outlier_filter, social_data),
+            'numpy batch': (standard_deviation_outlier_filter, batch),
+            'welford stream': (
+                streaming_standard_deviation_outlier_filter,
+                iter(social_data),
+            ),
+        }
+        for name, (func, data) in runs.items():
+            seconds = time_call(func, data)
+            print(f'{size:>10} {name:>15} {seconds * 1000:>10,.1f}')
+        del social_data, batch
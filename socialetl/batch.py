@@ -0,0 +1,110 @@
+from array import array
+from dataclasses import dataclass, field, fields
+from typing import Dict, Iterable, Iterator, List, MutableSequence, Type
+
+from social_etl import RedditPostData, SocialMediaData, TwitterTweetData
+
+
+def _select(column: MutableSequence, indices: List[int]) -> MutableSequence:
+    values = [column[i] for i in indices]
+    if isinstance(column, array):
+        return array(column.typecode, values)
+    return values
+
+
+@dataclass(slots=True)
+class SocialMediaBatch:
+    """Dataclass to hold a batch of social media posts of one social_data
+    type as columns (struct of arrays) instead of one object per post. Int
+    fields are stored in array('q') columns, which takes 8 bytes per value
+    instead of a pointer to an int object.
+
+    Args:
+        social_data_type (Type): RedditPostData or TwitterTweetData.
+        ids (List[str]): ID of each post.
+        sources (List[str]): Source of each post.
+        columns (Dict[str, MutableSequence]): social_data field name to the
+            values of that field, in post order.
+    """
+
+    social_data_type: Type[RedditPostData | TwitterTweetData]
+    ids: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    columns: Dict[str, MutableSequence] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        for social_data_field in fields(self.social_data_type):
+            self.columns.setdefault(
+                social_data_field.name,
+                array('q') if social_data_field.type is int else [],
+            )
+
+    @classmethod
+    def from_records(
+        cls, social_data: Iterable[SocialMediaData]
+    ) -> 'SocialMediaBatch':
+        """Function to build a batch from SocialMediaData objects, which
+        must all hold the same social_data type.
+
+        Args:
+            social_data (Iterable[SocialMediaData]): Social media posts.
+
+        Returns:
+            SocialMediaBatch: The posts as columns.
+        """
+        iterator = iter(social_data)
+        first = next(iterator, None)
+        if first is None:
+            raise ValueError('Cannot infer the type of an empty batch.')
+        batch = cls(social_data_type=type(first.social_data))
+        batch.append(first)
+        for post in iterator:
+            batch.append(post)
+        return batch
+
+    def append(self, post: SocialMediaData) -> None:
+        if not isinstance(post.social_data, self.social_data_type):
+            raise TypeError(
+                f'Batch of {self.social_data_type.__name__} cannot hold'
+                f' {type(post.social_data).__name__}.'
+            )
+        self.ids.append(post.id)
+        self.sources.append(post.source)
+        for name, column in self.columns.items():
+            column.append(getattr(post.social_data, name))
+
+    def column(self, name: str) -> MutableSequence:
+        return self.columns[name]
+
+    def take(self, indices: Iterable[int]) -> 'SocialMediaBatch':
+        """Function to select posts by position, e.g. the ones kept by a
+        filter.
+
+        Args:
+            indices (Iterable[int]): Positions of the posts to keep.
+
+        Returns:
+            SocialMediaBatch: A new batch with the selected posts.
+        """
+        indices = list(indices)
+        return SocialMediaBatch(
+            social_data_type=self.social_data_type,
+            ids=[self.ids[i] for i in indices],
+            sources=[self.sources[i] for i in indices],
+            columns={
+                name: _select(column, indices)
+                for name, column in self.columns.items()
+            },
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[SocialMediaData]:
+        names = list(self.columns)
+        for idx, values in enumerate(zip(*self.columns.values())):
+            yield SocialMediaData(
+                id=self.ids[idx],
+                source=self.sources[idx],
+                social_data=self.social_data_type(**dict(zip(names, values))),
+            )
@@ -0,0 +1,276 @@
+import logging
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from utils.db import DatabaseConnection
+
+T = TypeVar('T')
+
+# seconds a cached response stays valid, per endpoint. Endpoints missing
+# here use the default_ttl of the cache; a TTL of 0 disables caching.
+DEFAULT_TTLS: Dict[str, float] = {
+    'twitter.get_user': 7 * 24 * 3600,
+    'twitter.get_users_following': 24 * 3600,
+    'reddit.listing': 5 * 60,
+    # timelines are what each run is after, so they are not cached
+    'twitter.get_users_tweets': 0,
+}
+
+CREATE_API_CACHE_SQL = """
+    CREATE TABLE IF NOT EXISTS api_cache (
+        endpoint TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (endpoint, key)
+    )
+"""
+
+# drops expired entries, then the least recently used ones beyond the
+# entry and byte budgets
+EVICT_API_CACHE_SQL = """
+    DELETE FROM api_cache WHERE (endpoint, key) IN (
+        SELECT endpoint, key FROM (
+            SELECT
+                endpoint,
+                key,
+                expires_at,
+                ROW_NUMBER() OVER recent AS entries,
+                SUM(size) OVER recent AS bytes
+            FROM api_cache
+            WINDOW recent AS (ORDER BY last_access DESC, rowid DESC)
+        )
+        WHERE expires_at <= :now OR entries > :max_entries
+            OR bytes > :max_bytes
+    )
+"""
+
+
+@dataclass(slots=True)
+class CacheStats:
+    """Dataclass to hold the counters of a ResponseCache.
+
+    Args:
+        hits (int): Lookups served from the cache.
+        misses (int): Lookups that had to call the API.
+        evictions (int): Entries dropped because they expired or did not
+            fit the cache budget.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResponseCache(ABC):
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 3600,
+        max_entries: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Class to cache API responses, with a TTL per endpoint and least
+        recently used eviction once max_entries or max_bytes is exceeded.
+
+        Args:
+            ttls (Optional[Dict[str, float]], optional): Endpoint to TTL in
+                seconds. Defaults to DEFAULT_TTLS.
+            default_ttl (float, optional): TTL of the other endpoints.
+                Defaults to 3600.
+            max_entries (int, optional): Entries kept. Defaults to 10_000.
+            max_bytes (int, optional): Bytes of pickled responses kept.
+                Defaults to 64 MiB.
+            clock (Callable[[], float], optional): Wall clock, in seconds.
+        """
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def ttl(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    @abstractmethod
+    def _get(self, endpoint: str, key: str, now: float) -> Tuple[bool, Any]:
+        """Return (found, value) for an unexpired entry."""
+
+    @abstractmethod
+    def _set(
+        self, endpoint: str, key: str, value: Any, expires_at: float
+    ) -> int:
+        """Store value and return the number of evicted entries."""
+
+    def get_or_fetch(
+        self, endpoint: str, key: str, fetch: Callable[[], T]
+    ) -> T:
+        """Function to return the cached response of endpoint for key, or
+        call fetch and cache its result.
+
+        Args:
+            endpoint (str): Name of the API call, e.g. 'twitter.get_user'.
+            key (str): Arguments of the call, e.g. the username.
+            fetch (Callable[[], T]): Function calling the API.
+
+        Returns:
+            T: The cached or fetched response.
+        """
+        ttl = self.ttl(endpoint)
+        if ttl <= 0:
+            return fetch()
+        with self._lock:
+            found, value = self._get(endpoint, key, self._clock())
+            if found:
+                self.stats.hits += 1
+                return value
+            self.stats.misses += 1
+        # the API call runs outside of the lock, so concurrent misses for
+        # different keys are not serialized
+        value = fetch()
+        with self._lock:
+            now = self._clock()
+            self.stats.evictions += self._set(
+                endpoint, key, value, now + ttl
+            )
+        return value
+
+    def release_thread(self) -> None:
+        """Function to release the resources the calling thread holds, e.g.
+        before a short-lived worker thread exits."""
+
+    def close(self) -> None:
+        """Function to release the resources of the cache."""
+
+
+class MemoryResponseCache(ResponseCache):
+    """ResponseCache holding the responses in process memory, for a single
+    long running process. Entry sizes are not tracked, so only max_entries
+    bounds it."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._entries: OrderedDict = OrderedDict()
+
+    def _get(self, endpoint: str, key: str, now: float) -> Tuple[bool, Any]:
+        entry = self._entries.get((endpoint, key))
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if expires_at <= now:
+            del self._entries[(endpoint, key)]
+            self.stats.evictions += 1
+            return False, None
+        self._entries.move_to_end((endpoint, key))
+        return True, value
+
+    def _set(
+        self, endpoint: str, key: str, value: Any, expires_at: float
+    ) -> int:
+        self._entries[(endpoint, key)] = (value, expires_at)
+        self._entries.move_to_end((endpoint, key))
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+
+class SQLiteResponseCache(ResponseCache):
+    def __init__(
+        self, db_file: str = 'data/api_cache.db', **kwargs: Any
+    ) -> None:
+        """ResponseCache persisting pickled responses in a SQLite file of
+        its own, so that it is shared by consecutive runs without
+        contending with the writes to the social posts database.
+
+        Args:
+            db_file (str, optional): Cache database file.
+                Defaults to 'data/api_cache.db'.
+            **kwargs: TTL and budget options of ResponseCache.
+        """
+        super().__init__(**kwargs)
+        self._db = DatabaseConnection(db_file=db_file, pooled=True)
+        with self._db.managed_cursor() as cur:
+            cur.execute(CREATE_API_CACHE_SQL)
+
+    def _get(self, endpoint: str, key: str, now: float) -> Tuple[bool, Any]:
+        with self._db.managed_cursor() as cur:
+            cur.execute(
+                'UPDATE api_cache SET last_access = ? WHERE endpoint = ?'
+                ' AND key = ? AND expires_at > ? RETURNING value',
+                (now, endpoint, key, now),
+            )
+            row = cur.fetchone()
+        if row is None:
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def _set(
+        self, endpoint: str, key: str, value: Any, expires_at: float
+    ) -> int:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = self._clock()
+        with self._db.managed_cursor() as cur:
+            cur.execute(
+                'INSERT OR REPLACE INTO api_cache (endpoint, key, value,'
+                ' size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)',
+                (endpoint, key, blob, len(blob), expires_at, now),
+            )
+            cur.execute(
+                EVICT_API_CACHE_SQL,
+                {
+                    'now': now,
+                    'max_entries': self.max_entries,
+                    'max_bytes': self.max_bytes,
+                },
+            )
+            return cur.rowcount
+
+    def release_thread(self) -> None:
+        self._db.release_thread()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def cache_factory(
+    backend: Optional[str], **kwargs: Any
+) -> Optional[ResponseCache]:
+    """Factory function to return a response cache.
+
+    Args:
+        backend (Optional[str]): 'sqlite', 'memory', or None for no cache.
+        **kwargs: Options of the cache class, e.g. db_file or ttls.
+
+    Returns:
+        Optional[ResponseCache]: The cache, None when backend is None.
+    """
+    factory = {
+        'sqlite': SQLiteResponseCache,
+        'memory': MemoryResponseCache,
+    }
+    if backend is None:
+        return None
+    if backend not in factory:
+        raise ValueError(
+            f'Cache backend {backend} is not supported. Please pass one of'
+            f' {", ".join(factory)}.'
+        )
+    logging.info(f'Caching API responses in a {backend} cache.')
+    return factory[backend](**kwargs)
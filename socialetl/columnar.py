@@ -0,0 +1,239 @@
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from schema_manager import utc_day
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
+if TYPE_CHECKING:
+    from social_etl import SocialMediaData
+
+# file format to the compression codecs pyarrow writes it with
+SINK_COMPRESSIONS: Dict[str, Tuple[str, ...]] = {
+    'parquet': ('zstd', 'snappy', 'gzip', 'lz4', 'brotli', 'none'),
+    'arrow': ('zstd', 'lz4', 'none'),
+}
+
+DEFAULT_ROW_GROUP_SIZE = 100_000
+
+
+def _timestamp(created: Any) -> Optional[datetime]:
+    # reddit stores created as the string repr of an epoch, older rows and
+    # fixtures as an ISO datetime
+    try:
+        return datetime.fromtimestamp(float(created), tz=timezone.utc)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(created).replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+# (social data class name, field) to the arrow type and converter of the
+# fields whose python type is not the column type
+FIELD_OVERRIDES = {
+    ('RedditPostData', 'created'): ('timestamp', _timestamp),
+}
+
+
+def arrow_schema(cls: type) -> 'pa.Schema':
+    """Function to get the arrow schema of the posts of a social data
+    dataclass: id, op, then one typed column per field. The source is not
+    a column, it is a partition key of the dataset.
+
+    Args:
+        cls (type): RedditPostData or TwitterTweetData.
+
+    Returns:
+        pa.Schema: The schema.
+    """
+    types = {
+        str: pa.string(),
+        int: pa.int64(),
+        float: pa.float64(),
+        bool: pa.bool_(),
+        'timestamp': pa.timestamp('s', tz='UTC'),
+    }
+    columns = [('id', pa.string()), ('op', pa.string())]
+    for attr in fields(cls):
+        override = FIELD_OVERRIDES.get((cls.__name__, attr.name))
+        columns.append(
+            (attr.name, types[override[0] if override else attr.type])
+        )
+    return pa.schema(columns)
+
+
+@dataclass(slots=True)
+class SinkStats:
+    """Dataclass to hold the counters of a ColumnarSink.
+
+    Args:
+        rows (int): Posts written.
+        row_groups (int): Row groups (or record batches) written.
+        files (List[str]): Files written.
+    """
+
+    rows: int = 0
+    row_groups: int = 0
+    files: List[str] = field(default_factory=list)
+
+
+class ColumnarSink:
+    def __init__(
+        self,
+        root: str = 'data/columnar',
+        format: str = 'parquet',
+        compression: str = 'zstd',
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    ) -> None:
+        """Class to write posts into typed, columnar files, next to the
+        social_posts table. Files are partitioned hive style, as
+        root/source=<source>/day=<load day>/<run id>.<format>, with one
+        column per field of the source's social data, so analytics engines
+        (pyarrow.dataset, DuckDB, Spark) read them without parsing JSON.
+
+        The sink gets the posts a load inserts and the stored posts whose
+        content it updates, so an id has one row per version, across files
+        and runs. The op column, 'inserted' or 'updated', tells them apart;
+        the latest version of an id is in its latest day.
+
+        Posts are buffered per source and written row_group_size at a time,
+        so each write is one row group. Call close() to write the remaining
+        posts and finalize the files.
+
+        Args:
+            root (str, optional): Directory of the dataset.
+                Defaults to 'data/columnar'.
+            format (str, optional): 'parquet' or 'arrow' (Arrow IPC file).
+                Defaults to 'parquet'.
+            compression (str, optional): Codec, one of SINK_COMPRESSIONS of
+                the format. Defaults to 'zstd'.
+            row_group_size (int, optional): Posts per row group.
+                Defaults to DEFAULT_ROW_GROUP_SIZE.
+        """
+        if pa is None:
+            raise ValueError(
+                'pyarrow is not installed. Please pip install pyarrow to'
+                ' use a columnar sink.'
+            )
+        if format not in SINK_COMPRESSIONS:
+            raise ValueError(
+                f'Sink format {format} is not supported. Please pass one of'
+                f' {", ".join(SINK_COMPRESSIONS)}.'
+            )
+        if compression not in SINK_COMPRESSIONS[format]:
+            raise ValueError(
+                f'Compression {compression} is not supported for {format}.'
+                f' Please pass one of {", ".join(SINK_COMPRESSIONS[format])}.'
+            )
+        if row_group_size < 1:
+            raise ValueError(
+                f'row_group_size must be positive, got {row_group_size}.'
+            )
+        self.root = root
+        self.format = format
+        self.compression = None if compression == 'none' else compression
+        self.row_group_size = row_group_size
+        self.run_id = uuid.uuid4().hex
+        self.stats = SinkStats()
+        self._buffers: Dict[str, List[Tuple['SocialMediaData', str]]] = {}
+        self._writers: Dict[Tuple[str, str], Any] = {}
+        self._schemas: Dict[str, 'pa.Schema'] = {}
+
+    def write(
+        self, social_data: Iterable['SocialMediaData'], op: str
+    ) -> None:
+        """Function to add posts to the sink.
+
+        Args:
+            social_data (Iterable[SocialMediaData]): Posts to write.
+            op (str): Whether the load 'inserted' or 'updated' the posts.
+        """
+        for post in social_data:
+            buffer = self._buffers.setdefault(post.source, [])
+            buffer.append((post, op))
+            if len(buffer) >= self.row_group_size:
+                self._flush(post.source)
+
+    def _to_table(
+        self, rows: List[Tuple['SocialMediaData', str]]
+    ) -> 'pa.Table':
+        posts = [post for post, _ in rows]
+        cls = type(posts[0].social_data)
+        source = posts[0].source
+        if source not in self._schemas:
+            self._schemas[source] = arrow_schema(cls)
+        columns: Dict[str, List[Any]] = {
+            'id': [post.id for post in posts],
+            'op': [op for _, op in rows],
+        }
+        for attr in fields(cls):
+            values = [getattr(post.social_data, attr.name) for post in posts]
+            override = FIELD_OVERRIDES.get((cls.__name__, attr.name))
+            if override:
+                values = [override[1](value) for value in values]
+            columns[attr.name] = values
+        return pa.Table.from_pydict(columns, schema=self._schemas[source])
+
+    def _writer(self, source: str, schema: 'pa.Schema') -> Any:
+        day = utc_day()
+        if (source, day) not in self._writers:
+            directory = os.path.join(
+                self.root, f'source={source}', f'day={day}'
+            )
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{self.run_id}.{self.format}')
+            logging.info(f'Writing {source} posts to {path}.')
+            if self.format == 'parquet':
+                writer = pq.ParquetWriter(
+                    path, schema, compression=self.compression or 'none'
+                )
+            else:
+                writer = pa.ipc.new_file(
+                    path,
+                    schema,
+                    options=pa.ipc.IpcWriteOptions(
+                        compression=self.compression
+                    ),
+                )
+            self._writers[(source, day)] = writer
+            self.stats.files.append(path)
+        return self._writers[(source, day)]
+
+    def _flush(self, source: str) -> None:
+        rows = self._buffers.pop(source, [])
+        if not rows:
+            return
+        table = self._to_table(rows)
+        self._writer(source, table.schema).write_table(
+            table, **self._write_options()
+        )
+        self.stats.rows += len(rows)
+        self.stats.row_groups += 1
+
+    def _write_options(self) -> Dict[str, Any]:
+        if self.format == 'parquet':
+            return {'row_group_size': self.row_group_size}
+        return {'max_chunksize': self.row_group_size}
+
+    def flush(self) -> None:
+        """Function to write the buffered posts of every source."""
+        for source in list(self._buffers):
+            self._flush(source)
+
+    def close(self) -> None:
+        """Function to write the buffered posts and finalize the files."""
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
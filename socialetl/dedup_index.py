@@ -0,0 +1,362 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Set
+
+from utils.db import DatabaseConnection
+from utils.iterables import batched
+
+if TYPE_CHECKING:
+    import numpy as np
+    from social_etl import SocialMediaData
+
+DEFAULT_CAPACITY = 1_000_000
+
+CREATE_DEDUP_INDEX_SQL = """
+    CREATE TABLE IF NOT EXISTS dedup_index (
+        name TEXT PRIMARY KEY,
+        capacity INTEGER NOT NULL,
+        fp_rate REAL NOT NULL,
+        num_hashes INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        bits BLOB NOT NULL,
+        dt_updated datetime default current_timestamp
+    )
+"""
+
+UPSERT_DEDUP_INDEX_SQL = """
+    INSERT INTO dedup_index (
+        name, capacity, fp_rate, num_hashes, count, bits
+    ) VALUES (
+        :name, :capacity, :fp_rate, :num_hashes, :count, :bits
+    )
+    ON CONFLICT (name) DO UPDATE SET
+        capacity = excluded.capacity,
+        fp_rate = excluded.fp_rate,
+        num_hashes = excluded.num_hashes,
+        count = excluded.count,
+        bits = excluded.bits,
+        dt_updated = current_timestamp
+"""
+
+SELECT_STORED_IDS_SQL = """
+    SELECT id FROM social_posts
+    WHERE id IN (SELECT value FROM json_each(?))
+"""
+
+
+class BloomFilter:
+    def __init__(
+        self,
+        capacity: int,
+        fp_rate: float = 0.001,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        """Class to test set membership in a fixed amount of memory. It
+        never misses an added key, and wrongly reports a key as added with
+        a probability of about fp_rate while it holds up to capacity keys.
+
+        Args:
+            capacity (int): Number of keys the filter is sized for.
+            fp_rate (float, optional): Target false positive rate.
+                Defaults to 0.001.
+            max_bytes (Optional[int], optional): Upper bound of the size of
+                the filter. When capacity and fp_rate need more, the filter
+                is capped and its false positive rate is higher. Defaults to
+                None (no bound).
+        """
+        if capacity <= 0 or not 0 < fp_rate < 1:
+            raise ValueError(
+                f'Bloom filter capacity {capacity} or fp_rate {fp_rate} is'
+                ' not valid. Please pass a positive capacity and an fp_rate'
+                ' between 0 and 1.'
+            )
+        num_bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        if max_bytes is not None and num_bits > max_bytes * 8:
+            num_bits = max_bytes * 8
+            logging.warning(
+                f'A bloom filter of {capacity} keys at fp_rate {fp_rate}'
+                f' does not fit in {max_bytes} bytes, its expected false'
+                f' positive rate is {_fp_rate(num_bits, capacity):.4f}.'
+            )
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.num_bits = max(8, num_bits - num_bits % 8)
+        self.num_hashes = max(
+            1, round(self.num_bits / capacity * math.log(2))
+        )
+        # numpy is only imported by the runs that deduplicate
+        import numpy as np
+
+        self.count = 0
+        self.bits = np.zeros(self.num_bits // 8, dtype=np.uint8)
+        self._steps = np.arange(self.num_hashes, dtype=np.uint64)
+
+    def _positions(self, keys: List[str]) -> 'np.ndarray':
+        import numpy as np
+
+        # double hashing: the k bit positions of a key are h1 + i * h2, from
+        # the two halves of one digest, computed for all keys at once
+        digests = b''.join(
+            hashlib.blake2b(key.encode(), digest_size=16).digest()
+            for key in keys
+        )
+        halves = np.frombuffer(digests, dtype='<u8').reshape(-1, 2)
+        h1 = halves[:, :1]
+        h2 = halves[:, 1:] | np.uint64(1)
+        with np.errstate(over='ignore'):
+            return (h1 + self._steps * h2) % np.uint64(self.num_bits)
+
+    def add_many(self, keys: List[str]) -> None:
+        if not keys:
+            return
+        import numpy as np
+
+        positions = self._positions(keys)
+        np.bitwise_or.at(
+            self.bits,
+            positions >> np.uint64(3),
+            (np.uint64(1) << (positions & np.uint64(7))).astype(np.uint8),
+        )
+        self.count += len(keys)
+
+    def contains_many(self, keys: List[str]) -> List[bool]:
+        if not keys:
+            return []
+        import numpy as np
+
+        positions = self._positions(keys)
+        found = (
+            self.bits[positions >> np.uint64(3)]
+            >> (positions & np.uint64(7)).astype(np.uint8)
+        ) & np.uint8(1)
+        return found.all(axis=1).tolist()
+
+    def load_bits(self, bits: bytes) -> None:
+        """Function to restore the bits of a filter saved with tobytes."""
+        import numpy as np
+
+        self.bits = np.frombuffer(bits, dtype=np.uint8).copy()
+
+    def add(self, key: str) -> None:
+        self.add_many([key])
+
+    def __contains__(self, key: str) -> bool:
+        return self.contains_many([key])[0]
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def expected_fp_rate(self) -> float:
+        return _fp_rate(self.num_bits, self.count, self.num_hashes)
+
+
+def _fp_rate(num_bits: int, count: int, num_hashes: int = 0) -> float:
+    if not count:
+        return 0.0
+    num_hashes = num_hashes or max(1, round(num_bits / count * math.log(2)))
+    return (1 - math.exp(-num_hashes * count / num_bits)) ** num_hashes
+
+
+@dataclass(slots=True)
+class DedupStats:
+    """Dataclass to hold the counters of a DedupIndex.
+
+    Args:
+        checked (int): Posts looked up.
+        dropped (int): Posts dropped as already loaded.
+        false_positives (int): Posts the filter reported as loaded, which
+            the verification against social_posts found were not.
+    """
+
+    checked: int = 0
+    dropped: int = 0
+    false_positives: int = 0
+
+
+class DedupIndex:
+    def __init__(
+        self,
+        db: DatabaseConnection,
+        fp_rate: float = 0.001,
+        max_bytes: int = 16 * 1024 * 1024,
+        capacity: Optional[int] = None,
+        verify: bool = False,
+        batch_size: int = 1000,
+        name: str = 'social_posts',
+    ) -> None:
+        """Class to drop posts already loaded into social_posts by earlier
+        runs, right after they are extracted. It keeps a bloom filter of
+        the loaded ids, persisted in the dedup_index table with the number
+        of ids it holds, and rebuilds it from social_posts.id when it is
+        missing, outgrown or was built with other options. Ids are added in
+        memory as they are loaded; call save() once at the end of a run to
+        persist them. Ids of a run that is not saved are only missing from
+        the filter, so their posts are loaded (and skipped as unchanged)
+        again, never dropped.
+
+        Args:
+            db (DatabaseConnection): Database holding social_posts.
+            fp_rate (float, optional): Target false positive rate of the
+                filter. Defaults to 0.001.
+            max_bytes (int, optional): Memory budget of the filter.
+                Defaults to 16 MiB.
+            capacity (Optional[int], optional): Number of ids the filter is
+                sized for. Defaults to twice the ids stored, and at least
+                DEFAULT_CAPACITY.
+            verify (bool, optional): Check the ids the filter reports as
+                loaded against social_posts, one query per batch, so a
+                false positive never drops a new post. When most posts
+                were already loaded, nearly every id is checked, which
+                costs as much as querying social_posts without the filter.
+                Without it, about fp_rate of the new posts are dropped.
+                Defaults to False.
+            batch_size (int, optional): Posts looked up at once.
+                Defaults to 1000.
+            name (str, optional): Key of the filter in dedup_index.
+                Defaults to 'social_posts'.
+        """
+        self.fp_rate = fp_rate
+        self.max_bytes = max_bytes
+        self.verify = verify
+        self.batch_size = batch_size
+        self.name = name
+        self.stats = DedupStats()
+        self._db = db
+        self._lock = threading.Lock()
+        self._unsaved = False
+        self._bloom = self._load(capacity)
+
+    def _load(self, capacity: Optional[int]) -> BloomFilter:
+        with self._db.managed_cursor() as cur:
+            cur.execute(CREATE_DEDUP_INDEX_SQL)
+            cur.execute(
+                'SELECT capacity, fp_rate, count, bits FROM dedup_index'
+                ' WHERE name = ?',
+                (self.name,),
+            )
+            row = cur.fetchone()
+        if row is not None:
+            stored_capacity, stored_fp_rate, count, bits = row
+            bloom = BloomFilter(stored_capacity, self.fp_rate, self.max_bytes)
+            # the stored count saves scanning social_posts on every run
+            if (
+                stored_fp_rate == self.fp_rate
+                and capacity in (None, stored_capacity)
+                and len(bits) == len(bloom.bits)
+                and count <= stored_capacity
+            ):
+                bloom.count = count
+                bloom.load_bits(bits)
+                return bloom
+        with self._db.managed_cursor() as cur:
+            cur.execute('SELECT COUNT(*) FROM social_posts')
+            num_ids = cur.fetchone()[0]
+        bloom = BloomFilter(
+            capacity or max(DEFAULT_CAPACITY, 2 * num_ids),
+            self.fp_rate,
+            self.max_bytes,
+        )
+        logging.info(
+            f'Building the {self.name} dedup index from {num_ids} ids.'
+        )
+        with self._db.managed_cursor() as cur:
+            cur.execute('SELECT id FROM social_posts')
+            while rows := cur.fetchmany(100_000):
+                bloom.add_many([row[0] for row in rows])
+        self._save(bloom)
+        return bloom
+
+    def _save(self, bloom: BloomFilter) -> None:
+        with self._db.managed_cursor() as cur:
+            cur.execute(
+                UPSERT_DEDUP_INDEX_SQL,
+                {
+                    'name': self.name,
+                    'capacity': bloom.capacity,
+                    'fp_rate': bloom.fp_rate,
+                    'num_hashes': bloom.num_hashes,
+                    'count': bloom.count,
+                    'bits': bloom.bits.tobytes(),
+                },
+            )
+
+    def _stored_ids(self, ids: List[str]) -> Set[str]:
+        with self._db.managed_cursor() as cur:
+            cur.execute(SELECT_STORED_IDS_SQL, (json.dumps(ids),))
+            return {row[0] for row in cur.fetchall()}
+
+    def _new_posts(
+        self, batch: List['SocialMediaData']
+    ) -> List['SocialMediaData']:
+        ids = [post.id for post in batch]
+        with self._lock:
+            found = self._bloom.contains_many(ids)
+        maybe_loaded = [id for id, seen in zip(ids, found) if seen]
+        loaded = set(maybe_loaded)
+        if self.verify and maybe_loaded:
+            loaded = self._stored_ids(maybe_loaded)
+        new_posts = [post for post in batch if post.id not in loaded]
+        with self._lock:
+            self.stats.checked += len(batch)
+            self.stats.dropped += len(batch) - len(new_posts)
+            self.stats.false_positives += len(maybe_loaded) - len(loaded)
+        return new_posts
+
+    def _filter_stream(
+        self, social_data: Iterable['SocialMediaData']
+    ) -> Iterator['SocialMediaData']:
+        for batch in batched(social_data, self.batch_size):
+            yield from self._new_posts(batch)
+
+    def filter(
+        self, social_data: Iterable['SocialMediaData']
+    ) -> Iterable['SocialMediaData']:
+        """Function to drop the posts whose id was already loaded.
+
+        Args:
+            social_data (Iterable[SocialMediaData]): Extracted posts.
+
+        Returns:
+            Iterable[SocialMediaData]: The new posts, as a list when
+                social_data is a list, else lazily.
+        """
+        if isinstance(social_data, list):
+            return list(self._filter_stream(social_data))
+        return self._filter_stream(social_data)
+
+    def add(self, ids: Iterable[str]) -> None:
+        """Function to add the ids of loaded posts to the filter. They are
+        persisted by save().
+
+        Args:
+            ids (Iterable[str]): Ids just loaded into social_posts.
+        """
+        with self._lock:
+            self._bloom.add_many(list(ids))
+            self._unsaved = True
+            if self._bloom.count > self._bloom.capacity:
+                logging.warning(
+                    f'The {self.name} dedup index holds more than the'
+                    f' {self._bloom.capacity} ids it was sized for; it is'
+                    ' rebuilt larger by the next run.'
+                )
+
+    def save(self) -> None:
+        """Function to persist the filter and its count in dedup_index,
+        when ids were added since it was loaded or last saved."""
+        with self._lock:
+            if self._unsaved:
+                self._save(self._bloom)
+                self._unsaved = False
+
+    @property
+    def expected_fp_rate(self) -> float:
+        return self._bloom.expected_fp_rate
+
+    def __len__(self) -> int:
+        return len(self._bloom)
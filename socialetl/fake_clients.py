@@ -0,0 +1,197 @@
+import random
+import time
+from types import SimpleNamespace
+from typing import Iterator, List, Optional
+
+from social_etl import (
+    REDDIT_MAX_PAGE_SIZE,
+    SOURCE_REGISTRY,
+    register_source,
+)
+
+# created epoch of the newest fake post, so fake runs are reproducible
+FAKE_EPOCH = 1_675_000_000
+
+
+def _text_pool(seed: int, size: int = 1000) -> List[str]:
+    # Faker is slow per call and only needed here, so a pool of sentences
+    # is generated once and posts pick from it
+    from faker import Faker
+
+    fake = Faker()
+    fake.seed_instance(seed)
+    return [fake.sentence(nb_words=10) for _ in range(size)]
+
+
+class FakeSubreddit:
+    def __init__(
+        self,
+        name: str,
+        num_posts: int,
+        texts: List[str],
+        latency: float,
+        seed: int,
+    ) -> None:
+        """Class to stand in for praw's Subreddit, with num_posts
+        synthetic submissions per listing, newest first. Posts are
+        generated from their position, so any page is produced in O(page
+        size) time and memory whatever num_posts is."""
+        self.name = name
+        self.num_posts = num_posts
+        self.requests = 0
+        self._texts = texts
+        self._latency = latency
+        self._seed = seed
+
+    def _submission(self, idx: int) -> SimpleNamespace:
+        rng = random.Random(f'{self._seed}-{self.name}-{idx}')
+        post_id = f'{self.name}-{idx}'
+        return SimpleNamespace(
+            id=post_id,
+            fullname=f't3_{post_id}',
+            title=rng.choice(self._texts),
+            score=int(rng.paretovariate(1.2)),
+            url=f'https://reddit.com/r/{self.name}/{post_id}',
+            num_comments=int(rng.paretovariate(1.5)),
+            created=float(FAKE_EPOCH - 60 * idx),
+            selftext=' '.join(rng.choices(self._texts, k=3)),
+        )
+
+    def _listing(
+        self, limit: Optional[int], params: Optional[dict] = None, **kwargs
+    ) -> Iterator[SimpleNamespace]:
+        self.requests += 1
+        if self._latency:
+            time.sleep(self._latency)
+        after = (params or {}).get('after')
+        start = int(after.rsplit('-', 1)[1]) + 1 if after else 0
+        stop = min(self.num_posts, start + (limit or REDDIT_MAX_PAGE_SIZE))
+        return (self._submission(idx) for idx in range(start, stop))
+
+    hot = new = top = _listing
+
+
+class FakeRedditClient:
+    def __init__(
+        self, num_posts: int = 1000, latency: float = 0.0, seed: int = 0
+    ) -> None:
+        """Class to stand in for praw.Reddit without credentials or
+        network access.
+
+        Args:
+            num_posts (int, optional): Posts in every listing of every
+                subreddit. Defaults to 1000.
+            latency (float, optional): Seconds every listing request
+                sleeps, to mimic the API. Defaults to 0.0.
+            seed (int, optional): Seed of the synthetic data.
+                Defaults to 0.
+        """
+        self.num_posts = num_posts
+        self.latency = latency
+        self.seed = seed
+        self._texts = _text_pool(seed)
+
+    def subreddit(self, name: str) -> FakeSubreddit:
+        return FakeSubreddit(
+            name, self.num_posts, self._texts, self.latency, self.seed
+        )
+
+
+class FakeTwitterClient:
+    def __init__(
+        self,
+        num_following: int = 10,
+        tweets_per_user: int = 100,
+        latency: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """Class to stand in for tweepy.Client without credentials or
+        network access. Every user follows num_following users, who each
+        have tweets_per_user tweets.
+
+        Args:
+            num_following (int, optional): Users followed. Defaults to 10.
+            tweets_per_user (int, optional): Tweets per followed user.
+                Defaults to 100.
+            latency (float, optional): Seconds every request sleeps, to
+                mimic the API. Defaults to 0.0.
+            seed (int, optional): Seed of the synthetic data.
+                Defaults to 0.
+        """
+        self.num_following = num_following
+        self.tweets_per_user = tweets_per_user
+        self.latency = latency
+        self.seed = seed
+        self.requests = 0
+        self._texts = _text_pool(seed)
+
+    def _request(self) -> None:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_user(self, username: str, **kwargs) -> SimpleNamespace:
+        self._request()
+        user_id = random.Random(f'{self.seed}-{username}').randrange(10**9)
+        return SimpleNamespace(
+            data=SimpleNamespace(id=user_id, username=username)
+        )
+
+    def get_users_following(self, id: int, **kwargs) -> SimpleNamespace:
+        self._request()
+        return SimpleNamespace(
+            data=[
+                SimpleNamespace(id=id * 1000 + idx + 1)
+                for idx in range(self.num_following)
+            ]
+        )
+
+    def get_users_tweets(
+        self, id: str, since_id: Optional[str] = None, **kwargs
+    ) -> SimpleNamespace:
+        self._request()
+        # tweet ids grow with time and are unique across users
+        first_id = int(id) * self.tweets_per_user
+        rng = random.Random(f'{self.seed}-{id}')
+        tweets = [
+            SimpleNamespace(
+                id=str(tweet_id), text=' '.join(rng.choices(self._texts, k=2))
+            )
+            for tweet_id in range(
+                first_id + self.tweets_per_user - 1, first_id - 1, -1
+            )
+            if since_id is None or tweet_id > int(since_id)
+        ]
+        # like the API, users without matching tweets return no data
+        return SimpleNamespace(data=tweets or None)
+
+
+def use_fake_clients(
+    num_posts: int = 1000, latency: float = 0.0, seed: int = 0
+) -> None:
+    """Function to make etl_factory return fake clients for reddit and
+    twitter, e.g. to benchmark the pipeline offline.
+
+    Args:
+        num_posts (int, optional): Posts per subreddit listing, and tweets
+            over all the users a twitter user follows. Defaults to 1000.
+        latency (float, optional): Seconds every API request sleeps.
+            Defaults to 0.0.
+        seed (int, optional): Seed of the synthetic data. Defaults to 0.
+    """
+    num_following = min(num_posts, 100)
+    register_source(
+        'reddit',
+        lambda: FakeRedditClient(num_posts, latency=latency, seed=seed),
+        SOURCE_REGISTRY['reddit'][1],
+    )
+    register_source(
+        'twitter',
+        lambda: FakeTwitterClient(
+            num_following=num_following,
+            tweets_per_user=-(-num_posts // num_following),
+            latency=latency,
+            seed=seed,
+        ),
+        SOURCE_REGISTRY['twitter'][1],
+    )
@@ -0,0 +1,355 @@
+import json
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+from utils.db import DatabaseConnection
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore
+
+T = TypeVar('T')
+
+PIPELINE_STAGES = ('extract', 'dedup', 'transform', 'load')
+
+CREATE_ETL_RUNS_SQL = """
+    CREATE TABLE IF NOT EXISTS etl_runs (
+        run_id TEXT NOT NULL,
+        source TEXT,
+        target_id TEXT,
+        stage TEXT NOT NULL,
+        started_at DOUBLE PRECISION,
+        wall_ms DOUBLE PRECISION,
+        cpu_ms DOUBLE PRECISION,
+        records_in INTEGER,
+        records_out INTEGER,
+        bytes_written BIGINT,
+        peak_rss_kb INTEGER,
+        PRIMARY KEY (run_id, stage)
+    )
+"""
+
+INSERT_ETL_RUN_SQL = """
+    INSERT INTO etl_runs (
+        run_id, source, target_id, stage, started_at, wall_ms, cpu_ms,
+        records_in, records_out, bytes_written, peak_rss_kb
+    ) VALUES (
+        :run_id, :source, :target_id, :stage, :started_at, :wall_ms,
+        :cpu_ms, :records_in, :records_out, :bytes_written, :peak_rss_kb
+    )
+    ON CONFLICT (run_id, stage) DO UPDATE SET
+        source = excluded.source,
+        target_id = excluded.target_id,
+        started_at = excluded.started_at,
+        wall_ms = excluded.wall_ms,
+        cpu_ms = excluded.cpu_ms,
+        records_in = excluded.records_in,
+        records_out = excluded.records_out,
+        bytes_written = excluded.bytes_written,
+        peak_rss_kb = excluded.peak_rss_kb
+"""
+
+# (attribute, metric name, help) of the Prometheus export
+PROMETHEUS_METRICS = (
+    ('wall_seconds', 'wall_seconds', 'Wall time spent in the stage.'),
+    ('cpu_seconds', 'cpu_seconds', 'Process CPU time spent in the stage.'),
+    ('records_in', 'records_in', 'Records passed to the stage.'),
+    ('records_out', 'records_out', 'Records produced by the stage.'),
+    ('bytes_written', 'bytes_written', 'Bytes of social_data loaded.'),
+    ('peak_rss_kb', 'peak_rss_kilobytes', 'Peak RSS once the stage ended.'),
+)
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Function to return the peak resident set size of the process, in
+    KiB, or None where the resource module is not available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+@dataclass(slots=True)
+class StageMetrics:
+    """Dataclass to hold the measurements of one stage of a run.
+
+    Args:
+        stage (str): Stage name, e.g. 'extract'.
+        started_at (float): Unix time the stage was first entered.
+        ended_at (float): Unix time the stage was last left.
+        wall_seconds (float): Wall time spent in the stage itself,
+            excluding the upstream stages it pulled records from.
+        cpu_seconds (float): Process CPU time spent in the stage itself.
+        records_in (Optional[int]): Records passed to the stage.
+        records_out (Optional[int]): Records the stage produced, or wrote
+            for load.
+        bytes_written (Optional[int]): Bytes of social_data loaded.
+        peak_rss_kb (Optional[int]): Peak RSS of the process when the
+            stage was last left, in KiB.
+    """
+
+    stage: str
+    started_at: float = 0.0
+    ended_at: float = 0.0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    records_in: Optional[int] = None
+    records_out: Optional[int] = None
+    bytes_written: Optional[int] = None
+    peak_rss_kb: Optional[int] = None
+
+
+class RunMetrics:
+    def __init__(
+        self,
+        source: Optional[str] = None,
+        target_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        chunk_size: int = 1024,
+    ) -> None:
+        """Class to measure the stages of one ETL run. Stages are timed
+        with the stage context manager, and the lazy output of a streamed
+        stage with timed, so that time spent pulling records from an
+        upstream stage is accounted to that stage and not to its consumer.
+        Not thread safe: the stages of a run must be driven by one thread.
+
+        Args:
+            source (Optional[str], optional): Source of the run, e.g.
+                'reddit'. Set by SocialETL.run when None.
+            target_id (Optional[str], optional): Subreddit or user the run
+                extracted. Set by SocialETL.run when None.
+            run_id (Optional[str], optional): Identifier of the run.
+                Defaults to a random one.
+            chunk_size (int, optional): Records of a lazy stage timed at
+                once, to keep the clock reads off the per-record path.
+                Defaults to 1024.
+        """
+        self.source = source
+        self.target_id = target_id
+        self.run_id = run_id or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self.started_at = time.time()
+        self.stages: Dict[str, StageMetrics] = {}
+        # [wall start, cpu start, nested wall, nested cpu] per open stage
+        self._frames: List[List[float]] = []
+
+    def _get(self, name: str) -> StageMetrics:
+        if name not in self.stages:
+            self.stages[name] = StageMetrics(name, started_at=time.time())
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        """Context manager to add the time spent in its body to the stage
+        name, minus the time of the stages entered within it."""
+        stage = self._get(name)
+        self._frames.append(
+            [time.perf_counter(), time.process_time(), 0.0, 0.0]
+        )
+        try:
+            yield stage
+        finally:
+            wall_start, cpu_start, nested_wall, nested_cpu = (
+                self._frames.pop()
+            )
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            stage.wall_seconds += wall - nested_wall
+            stage.cpu_seconds += cpu - nested_cpu
+            if self._frames:
+                self._frames[-1][2] += wall
+                self._frames[-1][3] += cpu
+            stage.ended_at = time.time()
+            stage.peak_rss_kb = peak_rss_kb()
+
+    def timed(self, name: str, social_data: Iterable[T]) -> Iterable[T]:
+        """Function to count the records stage name produced and, when it
+        produced them lazily, time their production.
+
+        Args:
+            name (str): Stage name.
+            social_data (Iterable[T]): Output of the stage.
+
+        Returns:
+            Iterable[T]: social_data itself when it is a list, else an
+                iterator over it.
+        """
+        if isinstance(social_data, list):
+            self._get(name).records_out = len(social_data)
+            return social_data
+        return self._timed(name, iter(social_data))
+
+    def _timed(self, name: str, social_data: Iterator[T]) -> Iterator[T]:
+        stage = self._get(name)
+        stage.records_out = 0
+        while True:
+            with self.stage(name):
+                chunk = list(islice(social_data, self.chunk_size))
+            if not chunk:
+                return
+            stage.records_out += len(chunk)
+            yield from chunk
+
+    def chain(self, stages: Iterable[str] = PIPELINE_STAGES) -> None:
+        """Function to set the records_in of each stage to the records_out
+        of the stage before it."""
+        previous: Optional[StageMetrics] = None
+        for name in stages:
+            stage = self.stages.get(name)
+            if stage is None:
+                continue
+            if previous is not None:
+                stage.records_in = previous.records_out
+            previous = stage
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Function to return one etl_runs row per stage."""
+        return [
+            {
+                'run_id': self.run_id,
+                'source': self.source,
+                'target_id': self.target_id,
+                'stage': stage.stage,
+                'started_at': stage.started_at,
+                'wall_ms': stage.wall_seconds * 1000,
+                'cpu_ms': stage.cpu_seconds * 1000,
+                'records_in': stage.records_in,
+                'records_out': stage.records_out,
+                'bytes_written': stage.bytes_written,
+                'peak_rss_kb': stage.peak_rss_kb,
+            }
+            for stage in self.stages.values()
+        ]
+
+    def save(self, db: DatabaseConnection) -> None:
+        """Function to write the stages of the run to the etl_runs table.
+
+        Args:
+            db (DatabaseConnection): Database connection.
+        """
+        with db.managed_cursor() as cur:
+            cur.execute(CREATE_ETL_RUNS_SQL)
+            cur.executemany(INSERT_ETL_RUN_SQL, self.rows())
+
+    def format(self) -> str:
+        lines = [
+            f'{"stage":<10} {"wall_ms":>10} {"cpu_ms":>10} {"in":>9}'
+            f' {"out":>9} {"bytes":>12} {"peak_rss_kb":>12}'
+        ]
+        for row in self.rows():
+            lines.append(
+                f'{row["stage"]:<10} {row["wall_ms"]:>10.1f}'
+                f' {row["cpu_ms"]:>10.1f} {_or_dash(row["records_in"]):>9}'
+                f' {_or_dash(row["records_out"]):>9}'
+                f' {_or_dash(row["bytes_written"]):>12}'
+                f' {_or_dash(row["peak_rss_kb"]):>12}'
+            )
+        return '\n'.join(lines)
+
+    def to_prometheus(self) -> str:
+        """Function to export the run in the Prometheus text format, e.g.
+        for the node exporter textfile collector.
+
+        Returns:
+            str: One gauge per measurement, labelled by source, target and
+                stage.
+        """
+        lines = []
+        for attribute, metric, description in PROMETHEUS_METRICS:
+            name = f'socialetl_stage_{metric}'
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} gauge')
+            for stage in self.stages.values():
+                value = getattr(stage, attribute)
+                if value is None:
+                    continue
+                labels = ','.join(
+                    f'{key}="{_escape_label(label)}"'
+                    for key, label in (
+                        ('source', self.source),
+                        ('target', self.target_id),
+                        ('stage', stage.stage),
+                    )
+                )
+                lines.append(f'{name}{{{labels}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def to_otel_spans(self) -> List[Dict[str, Any]]:
+        """Function to export the run as OpenTelemetry style spans: one
+        root span for the run, with a child span per stage. A streamed
+        stage spans from when it was first entered to when it was last
+        left, so the spans of a streamed run overlap.
+
+        Returns:
+            List[Dict[str, Any]]: Spans, JSON serializable.
+        """
+        root_id = uuid.uuid4().hex[:16]
+        ended_at = max(
+            (stage.ended_at for stage in self.stages.values()),
+            default=self.started_at,
+        )
+        spans = [
+            {
+                'traceId': self.run_id,
+                'spanId': root_id,
+                'parentSpanId': None,
+                'name': 'socialetl.run',
+                'startTimeUnixNano': int(self.started_at * 1e9),
+                'endTimeUnixNano': int(ended_at * 1e9),
+                'attributes': {
+                    'socialetl.source': self.source,
+                    'socialetl.target_id': self.target_id,
+                },
+            }
+        ]
+        for stage in self.stages.values():
+            attributes = {
+                f'socialetl.{key}': value
+                for key, value in asdict(stage).items()
+                if key not in ('stage', 'started_at', 'ended_at')
+                and value is not None
+            }
+            spans.append(
+                {
+                    'traceId': self.run_id,
+                    'spanId': uuid.uuid4().hex[:16],
+                    'parentSpanId': root_id,
+                    'name': f'socialetl.{stage.stage}',
+                    'startTimeUnixNano': int(stage.started_at * 1e9),
+                    'endTimeUnixNano': int(stage.ended_at * 1e9),
+                    'attributes': attributes,
+                }
+            )
+        return spans
+
+    def export(self, metrics_format: str) -> str:
+        """Function to export the run as 'prometheus' text or 'otel' JSON
+        spans."""
+        if metrics_format == 'prometheus':
+            return self.to_prometheus()
+        if metrics_format == 'otel':
+            return json.dumps(self.to_otel_spans(), indent=2)
+        raise ValueError(
+            f'Metrics format {metrics_format} is not supported. Please pass'
+            ' one of prometheus, otel.'
+        )
+
+
+def _or_dash(value: Optional[int]) -> str:
+    return '-' if value is None else str(value)
+
+
+def _escape_label(value: Optional[str]) -> str:
+    return (
+        str(value or '')
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
@@ -0,0 +1,347 @@
+import json
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    ContextManager,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
+
+from schema_manager import ensure_partition, is_partitioned, utc_day
+from serializer import RowEncoder, row_encoder_factory
+from utils.iterables import batched
+
+if TYPE_CHECKING:
+    from columnar import ColumnarSink
+    from social_etl import SocialMediaData
+    from utils.db import BackendCursor
+
+DEFAULT_BATCH_SIZE = 10_000
+
+# op of the rows written, as passed to the sinks
+INSERTED = 'inserted'
+UPDATED = 'updated'
+
+# the loader only passes new or changed rows; the WHERE clause guards
+# against a concurrent writer having stored the same content in between
+INSERT_POSTS_SQL = """
+    INSERT INTO {table} (
+        id, source, social_data, content_hash
+    ) VALUES (
+        :id, :source, :social_data, :content_hash
+    )
+    ON CONFLICT (id) DO UPDATE SET
+        source = excluded.source,
+        social_data = excluded.social_data,
+        content_hash = excluded.content_hash
+    WHERE content_hash IS NOT excluded.content_hash
+"""
+INSERT_SOCIAL_POST_SQL = INSERT_POSTS_SQL.format(table='social_posts')
+
+# the content hashes stored for a batch of ids, in one primary key lookup
+# (per partition, when social_posts is partitioned)
+SELECT_CONTENT_HASHES_SQL = """
+    SELECT id, content_hash, NULL FROM social_posts
+    WHERE id IN (SELECT value FROM json_each(?))
+"""
+SELECT_PARTITIONED_CONTENT_HASHES_SQL = """
+    SELECT id, content_hash, partition_name FROM social_posts
+    WHERE id IN (SELECT value FROM json_each(?))
+"""
+
+# backends other than sqlite3 copy each batch into a staging table, find
+# the new and changed rows with one join, and merge them in one statement
+STAGED_COLUMNS = ['id', 'source', 'social_data', 'content_hash']
+CREATE_STAGING_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS social_posts_staging (
+        id TEXT,
+        source TEXT,
+        social_data TEXT,
+        content_hash BIGINT
+    )
+"""
+SELECT_STAGED_CHANGES_SQL = """
+    SELECT s.id, p.id IS NULL FROM social_posts_staging s
+    LEFT JOIN social_posts p ON p.id = s.id
+    WHERE p.content_hash IS DISTINCT FROM s.content_hash
+"""
+UPSERT_STAGED_SQL = """
+    INSERT INTO social_posts (id, source, social_data, content_hash)
+    SELECT id, source, social_data, content_hash FROM social_posts_staging
+    ON CONFLICT (id) DO UPDATE SET
+        source = excluded.source,
+        social_data = excluded.social_data,
+        content_hash = excluded.content_hash
+    WHERE social_posts.content_hash IS DISTINCT FROM excluded.content_hash
+"""
+
+
+@dataclass
+class LoadStats:
+    """Dataclass to hold the outcome of a bulk load.
+
+    Args:
+        rows (int): Number of rows passed to the loader.
+        batches (int): Number of batches (transactions) committed.
+        seconds (float): Wall clock time spent loading.
+        inserted (int): Number of rows that were not stored yet.
+        updated (int): Number of stored rows whose content changed.
+        skipped (int): Number of rows identical to the stored ones, which
+            were not written.
+        bytes (int): Size of the serialized social_data of the rows
+            written (characters of JSON text, bytes of msgpack).
+    """
+
+    rows: int = 0
+    batches: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def changed_rows(
+    cur: sqlite3.Cursor,
+    rows: List[Dict[str, Any]],
+    stats: LoadStats,
+    partitioned: bool = False,
+) -> List[Dict[str, Any]]:
+    """Function to keep the rows whose content_hash differs from the
+    stored one, counting them into stats as inserted, updated or skipped,
+    and setting their 'op' to INSERTED or UPDATED.
+
+    Args:
+        cur (sqlite3.Cursor): Database cursor.
+        rows (List[Dict[str, Any]]): Encoded social_posts rows.
+        stats (LoadStats): Counters of the load.
+        partitioned (bool, optional): Whether social_posts is the view over
+            partitions, in which case the rows of stored posts get the
+            'partition' they are stored in. Defaults to False.
+
+    Returns:
+        List[Dict[str, Any]]: The new and changed rows.
+    """
+    cur.execute(
+        (
+            SELECT_PARTITIONED_CONTENT_HASHES_SQL
+            if partitioned
+            else SELECT_CONTENT_HASHES_SQL
+        ),
+        (json.dumps([row['id'] for row in rows]),),
+    )
+    stored = {id: (hash, partition) for id, hash, partition in cur}
+    changed = []
+    for row in rows:
+        if row['id'] not in stored:
+            stats.inserted += 1
+            row['op'] = INSERTED
+        elif stored[row['id']][0] != row['content_hash']:
+            stats.updated += 1
+            row['op'] = UPDATED
+            row['partition'] = stored[row['id']][1]
+        else:
+            stats.skipped += 1
+            continue
+        # a later duplicate of the id in the batch compares to this row
+        stored[row['id']] = (row['content_hash'], row.get('partition'))
+        changed.append(row)
+    return changed
+
+
+def write_partitioned(
+    cur: sqlite3.Cursor, rows: List[Dict[str, Any]], day: str
+) -> None:
+    """Function to upsert rows into the partition they are stored in, or
+    for new posts, the partition of their source and day.
+
+    Args:
+        cur (sqlite3.Cursor): Database cursor.
+        rows (List[Dict[str, Any]]): New and changed rows.
+        day (str): Load day, as YYYYMMDD.
+    """
+    new_partitions: Dict[str, str] = {}
+    by_partition: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        partition = row.get('partition')
+        if partition is None:
+            source = row['source']
+            if source not in new_partitions:
+                new_partitions[source] = ensure_partition(cur, source, day)
+            partition = new_partitions[source]
+        by_partition.setdefault(partition, []).append(row)
+    for partition, partition_rows in by_partition.items():
+        cur.executemany(
+            INSERT_POSTS_SQL.format(table=partition), partition_rows
+        )
+
+
+def write_batch(
+    cur: sqlite3.Cursor,
+    rows: List[Dict[str, Any]],
+    stats: LoadStats,
+    partitioned: bool = False,
+) -> List[Dict[str, Any]]:
+    """Function to upsert the new and changed rows of a batch into SQLite,
+    in one transaction.
+
+    Args:
+        cur (sqlite3.Cursor): Database cursor.
+        rows (List[Dict[str, Any]]): Encoded social_posts rows.
+        stats (LoadStats): Counters of the load.
+        partitioned (bool, optional): Whether social_posts is the view over
+            partitions. Defaults to False.
+
+    Returns:
+        List[Dict[str, Any]]: The rows written, with their 'op'.
+    """
+    if not cur.connection.in_transaction:
+        cur.execute('BEGIN')
+    try:
+        rows = changed_rows(cur, rows, stats, partitioned)
+        if partitioned:
+            write_partitioned(cur, rows, utc_day())
+        else:
+            cur.executemany(INSERT_SOCIAL_POST_SQL, rows)
+    except Exception:
+        cur.execute('ROLLBACK')
+        raise
+    cur.execute('COMMIT')
+    return rows
+
+
+def write_staged(
+    cur: 'BackendCursor', rows: List[Dict[str, Any]], stats: LoadStats
+) -> List[Dict[str, Any]]:
+    """Function to upsert the new and changed rows of a batch through a
+    staging table, in one transaction, for the backends other than sqlite3.
+    The batch is bulk copied (COPY on Postgres), so the round trips do not
+    grow with the batch size.
+
+    Args:
+        cur (BackendCursor): Database cursor.
+        rows (List[Dict[str, Any]]): Encoded social_posts rows.
+        stats (LoadStats): Counters of the load.
+
+    Returns:
+        List[Dict[str, Any]]: The rows written, with their 'op'.
+    """
+    if rows and isinstance(rows[0]['social_data'], bytes):
+        raise ValueError(
+            f'{cur.backend.name} stores social_data as text. Please pass a'
+            ' text serializer, e.g. json.'
+        )
+    # one statement cannot upsert an id twice, the last duplicate wins
+    latest = list({row['id']: row for row in rows}.values())
+    cur.begin()
+    try:
+        cur.execute(CREATE_STAGING_SQL)
+        cur.execute('TRUNCATE social_posts_staging')
+        cur.copy_rows('social_posts_staging', STAGED_COLUMNS, latest)
+        cur.execute(SELECT_STAGED_CHANGES_SQL)
+        changed = dict(cur.fetchall())
+        cur.execute(UPSERT_STAGED_SQL)
+    except Exception:
+        cur.rollback()
+        raise
+    cur.commit()
+    inserted = sum(1 for is_new in changed.values() if is_new)
+    stats.inserted += inserted
+    stats.updated += len(changed) - inserted
+    stats.skipped += len(rows) - len(changed)
+    written = [row for row in latest if row['id'] in changed]
+    for row in written:
+        row['op'] = INSERTED if changed[row['id']] else UPDATED
+    return written
+
+
+def bulk_load(
+    social_data: Iterable['SocialMediaData'],
+    db_cursor_context: ContextManager,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    encoder: Optional[RowEncoder] = None,
+    sinks: Optional[List['ColumnarSink']] = None,
+) -> LoadStats:
+    """Function to load social media posts with executemany, committing
+    one explicit transaction per batch. Rows whose content hash matches the
+    stored one are skipped, the others are inserted or updated in place.
+    When social_posts is partitioned, new posts go to the partition of
+    their source and the current day. Other backends than sqlite3 load
+    each batch with write_staged. The posts written in a batch are
+    also passed to each sink once the batch is committed, with their op
+    (INSERTED or UPDATED), so one pass over the posts feeds the database
+    and the columnar files.
+
+    Args:
+        social_data (Iterable[SocialMediaData]): Social media posts.
+        db_cursor_context (ContextManager): Managed database cursor, as
+            returned by DatabaseConnection.managed_cursor().
+        batch_size (int, optional): Number of rows per transaction.
+            Defaults to DEFAULT_BATCH_SIZE.
+        encoder (Optional[RowEncoder], optional): Function turning a post
+            into a row. Defaults to row_encoder_factory().
+        sinks (Optional[List[ColumnarSink]], optional): Sinks to write the
+            inserted and updated posts to. Defaults to None.
+
+    Returns:
+        LoadStats: Number of rows inserted, updated and skipped, and the
+            throughput.
+    """
+    if db_cursor_context is None:
+        raise ValueError(
+            'db_cursor is None. Please pass a valid DatabaseConnection'
+            ' object.'
+        )
+
+    encode_row = encoder or row_encoder_factory()
+    stats = LoadStats()
+    start = time.perf_counter()
+    with db_cursor_context as cur:
+        sqlite = isinstance(cur, sqlite3.Cursor)
+        partitioned = sqlite and is_partitioned(cur)
+        for batch in batched(social_data, batch_size):
+            rows = [encode_row(post) for post in batch]
+            if sqlite:
+                rows = write_batch(cur, rows, stats, partitioned)
+            else:
+                rows = write_staged(cur, rows, stats)
+            if sinks and rows:
+                # the database keeps the last duplicate of an id in the
+                # batch, which was inserted if any of the duplicates was
+                ops: Dict[str, str] = {}
+                for row in rows:
+                    if ops.get(row['id']) != INSERTED:
+                        ops[row['id']] = row['op']
+                latest = {post.id: post for post in batch if post.id in ops}
+                for op in (INSERTED, UPDATED):
+                    posts = [
+                        post for id, post in latest.items() if ops[id] == op
+                    ]
+                    if not posts:
+                        continue
+                    for sink in sinks:
+                        sink.write(posts, op)
+            stats.rows += len(batch)
+            stats.batches += 1
+            stats.bytes += sum(len(row['social_data']) for row in rows)
+    stats.seconds = time.perf_counter() - start
+    logging.info(
+        f'Loaded {stats.rows} rows in {stats.batches} batches: inserted'
+        f' {stats.inserted}, updated {stats.updated}, skipped'
+        f' {stats.skipped} unchanged ({stats.rows_per_sec:,.0f} rows/sec).'
+    )
+    return stats
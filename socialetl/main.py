@@ -1,27 +1,211 @@
 import argparse
 import logging
+from typing import Optional
 
-from social_etl import etl_factory  # type: ignore
-from transform import transformation_factory
-from utils.db import db_factory
+from cache import cache_factory
+from dedup_index import DedupIndex
+from fake_clients import use_fake_clients
+from instrumentation import RunMetrics
+from loader import DEFAULT_BATCH_SIZE
+from metadata import use_metadata_db
+from pipeline import STAGE_FACTORY, pipeline_factory
+from replay import ReplayCache, recording_cache, use_offline_clients
+from social_etl import REDDIT_LISTINGS, etl_factory  # type: ignore
+from utils.db import DB_BACKENDS, PERFORMANCE_PROFILES, db_factory
+from watermark import WatermarkStore
 
 
-def main(source: str, transformation: str) -> None:
+def main(
+    source: str,
+    transformation: str,
+    stream: bool = False,
+    chunk_size: int = DEFAULT_BATCH_SIZE,
+    max_workers: int = 1,
+    requests_per_second: Optional[float] = None,
+    db_profile: Optional[str] = 'balanced',
+    db_type: str = 'sqlite3',
+    dsn: Optional[str] = None,
+    incremental: bool = False,
+    num_records: int = 100,
+    listing: str = 'hot',
+    resume: bool = False,
+    api_cache: Optional[str] = None,
+    record: Optional[str] = None,
+    replay: Optional[str] = None,
+    fake_client: bool = False,
+    fake_latency: float = 0.0,
+    metrics_format: Optional[str] = None,
+    metrics_file: Optional[str] = None,
+    dedup: bool = False,
+    dedup_fp_rate: float = 0.001,
+    dedup_max_mb: float = 16,
+    dedup_verify: bool = False,
+    sink_format: Optional[str] = None,
+    sink_dir: str = 'data/columnar',
+    sink_compression: str = 'zstd',
+    row_group_size: int = 100_000,
+) -> None:
     """Function to call the ETL code
 
     Args:
         source (str, optional): Defines which ata to pull.
         Defaults to 'reddit'.
+        transformation (str): Transformation pipeline spec, e.g. 'sd' or
+            'dedup|sd:field=score,k=3'.
+        stream (bool, optional): Stream records through the pipeline in
+            chunks of chunk_size instead of materializing full lists.
+        chunk_size (int, optional): Records per transform window and
+            load transaction.
+        max_workers (int, optional): Concurrent API calls during extract,
+            for twitter.
+        requests_per_second (Optional[float], optional): Rate limit for
+            those API calls.
+        db_profile (Optional[str], optional): SQLite performance profile.
+            Defaults to 'balanced'.
+        db_type (str, optional): Database the posts are loaded into, one
+            of DB_BACKENDS. Defaults to 'sqlite3'.
+        dsn (Optional[str], optional): Connection string of postgres.
+            Defaults to the POSTGRES_DSN environment variable.
+        incremental (bool, optional): Only extract items newer than the
+            high-water marks stored by previous runs.
+        num_records (int, optional): Number of records to extract.
+            Defaults to 100.
+        listing (str, optional): Reddit listing to page through.
+            Defaults to 'hot'.
+        resume (bool, optional): Continue paging the reddit listing from
+            the cursor saved by the previous run.
+        api_cache (Optional[str], optional): Backend of the API response
+            cache, 'sqlite' or 'memory'. Defaults to None (no cache).
+        record (Optional[str], optional): Fixture file to record every API
+            response of the run in.
+        replay (Optional[str], optional): Fixture file to replay the API
+            responses from, without credentials or network access.
+        fake_client (bool, optional): Extract synthetic posts from a fake
+            API client instead of the real API.
+        fake_latency (float, optional): Seconds every fake API request
+            sleeps.
+        metrics_format (Optional[str], optional): Export the per-stage
+            metrics of the run as 'prometheus' text or 'otel' spans. They
+            are always saved to the etl_runs table.
+        metrics_file (Optional[str], optional): File the exported metrics
+            are written to. Defaults to printing them.
+        dedup (bool, optional): Drop the posts loaded by earlier runs
+            right after extract.
+        dedup_fp_rate (float, optional): Target false positive rate of the
+            dedup index. Defaults to 0.001.
+        dedup_max_mb (float, optional): Memory budget of the dedup index,
+            in MiB. Defaults to 16.
+        dedup_verify (bool, optional): Check the posts the dedup index
+            reports as loaded against social_posts, so a false positive
+            never drops a new post.
+        sink_format (Optional[str], optional): Also write the loaded posts
+            to typed 'parquet' or 'arrow' files. Defaults to None.
+        sink_dir (str, optional): Directory of the columnar files.
+            Defaults to 'data/columnar'.
+        sink_compression (str, optional): Compression of the columnar
+            files. Defaults to 'zstd'.
+        row_group_size (int, optional): Posts per row group of the columnar
+            files. Defaults to 100_000.
     """
     logging.info(f'Starting {source} ETL')
+    if db_type != 'sqlite3' and (incremental or resume or dedup):
+        raise ValueError(
+            f'{db_type} does not store watermarks or a dedup index. Please'
+            ' use the sqlite3 db_type for incremental, resumed or deduped'
+            ' runs.'
+        )
     logging.info(f'Getting {source} ETL object from factory')
-    client, social_etl = etl_factory(source)
-    db = db_factory()
-    social_etl.run(
-        db_cursor_context=db.managed_cursor(),
-        client=client,
-        transform_function=transformation_factory(transformation),
-    )
+    if fake_client:
+        use_fake_clients(num_posts=num_records, latency=fake_latency)
+    if replay:
+        use_offline_clients()
+        cache = ReplayCache(replay)
+    elif record:
+        cache = recording_cache(record)
+    else:
+        cache = cache_factory(api_cache)
+    sinks = []
+    if sink_format:
+        # pyarrow is only imported by the runs writing columnar files
+        from columnar import ColumnarSink
+
+        sinks.append(
+            ColumnarSink(
+                root=sink_dir,
+                format=sink_format,
+                compression=sink_compression,
+                row_group_size=row_group_size,
+            )
+        )
+    with db_factory(
+        db_type=db_type, pooled=True, profile=db_profile, dsn=dsn
+    ) as db:
+        # log_metadata rows go to the database the posts are loaded into
+        use_metadata_db(db)
+        source_options = (
+            {'listing': listing, 'resume': resume}
+            if source == 'reddit'
+            else {}
+        )
+        dedup_index = (
+            DedupIndex(
+                db,
+                fp_rate=dedup_fp_rate,
+                max_bytes=int(dedup_max_mb * 2**20),
+                verify=dedup_verify,
+            )
+            if dedup
+            else None
+        )
+        client, social_etl = etl_factory(
+            source,
+            max_workers=max_workers,
+            requests_per_second=requests_per_second,
+            watermark_store=(
+                WatermarkStore(db) if incremental or resume else None
+            ),
+            cache=cache,
+            dedup_index=dedup_index,
+            sinks=sinks,
+            **source_options,
+        )
+        metrics = RunMetrics()
+        try:
+            social_etl.run(
+                db_cursor_context=db.managed_cursor(),
+                client=client,
+                transform_function=pipeline_factory(
+                    transformation,
+                    window_size=chunk_size if stream else None,
+                ),
+                num_records=num_records,
+                stream=stream,
+                chunk_size=chunk_size,
+                metrics=metrics,
+            )
+        finally:
+            # a failed run still writes the footers of its columnar files,
+            # which hold the posts of the batches committed before the error
+            for sink in sinks:
+                sink.close()
+        for sink in sinks:
+            logging.info(f'Columnar sink usage: {sink.stats}')
+        metrics.save(db)
+        if dedup_index is not None:
+            dedup_index.save()
+            logging.info(f'Dedup index usage: {dedup_index.stats}')
+        logging.info(f'Database connection usage: {db.pool_stats()}')
+        use_metadata_db(None)
+    if cache is not None:
+        logging.info(f'API cache usage: {cache.stats}')
+        cache.close()
+    if metrics_format:
+        exported = metrics.export(metrics_format)
+        if metrics_file:
+            with open(metrics_file, 'w') as f:
+                f.write(exported)
+        else:
+            print(exported)
     logging.info(f'Finished {source} ETL')
 
 
@@ -36,10 +220,170 @@ if __name__ == '__main__':
     )
     parser.add_argument(
         '--tx',
-        choices=['sd', 'no_tx', 'rand'],
         default='no_tx',
         type=str,
-        help='Indicates which transformation algorithm to run.',
+        help=(
+            'Transformation pipeline to run: stages separated by |, each'
+            ' with optional key=value options. Example'
+            ' --tx "dedup|min:field=score,value=10|sd:field=score,k=3".'
+            f' Stages: {", ".join(STAGE_FACTORY)}.'
+        ),
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Stream records through extract, transform and load in chunks.',
+    )
+    parser.add_argument(
+        '--chunk-size',
+        default=DEFAULT_BATCH_SIZE,
+        type=int,
+        help='Records per transform window and load transaction.',
+    )
+    parser.add_argument(
+        '--max-workers',
+        default=1,
+        type=int,
+        help='Number of concurrent API calls during extract (twitter).',
+    )
+    parser.add_argument(
+        '--rps',
+        default=None,
+        type=float,
+        help='Maximum API requests per second during extract.',
+    )
+    parser.add_argument(
+        '--db-profile',
+        choices=list(PERFORMANCE_PROFILES),
+        default='balanced',
+        type=str,
+        help='SQLite performance profile applied on connect.',
+    )
+    parser.add_argument(
+        '--db-type',
+        choices=list(DB_BACKENDS),
+        default='sqlite3',
+        type=str,
+        help='Database the posts are loaded into.',
+    )
+    parser.add_argument(
+        '--dsn',
+        default=None,
+        type=str,
+        help='Connection string of postgres, defaults to $POSTGRES_DSN.',
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only extract items newer than the previous run.',
+    )
+    parser.add_argument(
+        '--num-records',
+        default=100,
+        type=int,
+        help='Number of records to extract.',
+    )
+    parser.add_argument(
+        '--listing',
+        choices=list(REDDIT_LISTINGS),
+        default='hot',
+        type=str,
+        help='Reddit listing to page through.',
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue paging the reddit listing where the last run ended.',
+    )
+    parser.add_argument(
+        '--api-cache',
+        choices=['sqlite', 'memory'],
+        default=None,
+        type=str,
+        help='Cache API lookups that rarely change between runs.',
+    )
+    parser.add_argument(
+        '--record',
+        default=None,
+        type=str,
+        help='Record every API response of the run in this fixture file.',
+    )
+    parser.add_argument(
+        '--replay',
+        default=None,
+        type=str,
+        help='Replay the API responses recorded in this fixture file.',
+    )
+    parser.add_argument(
+        '--fake-client',
+        action='store_true',
+        help='Extract synthetic posts from a fake API client.',
+    )
+    parser.add_argument(
+        '--fake-latency',
+        default=0.0,
+        type=float,
+        help='Seconds every fake API request sleeps.',
+    )
+    parser.add_argument(
+        '--dedup',
+        action='store_true',
+        help='Drop posts loaded by earlier runs right after extract.',
+    )
+    parser.add_argument(
+        '--dedup-fp-rate',
+        default=0.001,
+        type=float,
+        help='Target false positive rate of the dedup index.',
+    )
+    parser.add_argument(
+        '--dedup-max-mb',
+        default=16,
+        type=float,
+        help='Memory budget of the dedup index, in MiB.',
+    )
+    parser.add_argument(
+        '--dedup-verify',
+        action='store_true',
+        help='Check the posts the dedup index drops against social_posts.',
+    )
+    parser.add_argument(
+        '--sink',
+        choices=['parquet', 'arrow'],
+        default=None,
+        type=str,
+        help='Also write the loaded posts to typed columnar files.',
+    )
+    parser.add_argument(
+        '--sink-dir',
+        default='data/columnar',
+        type=str,
+        help='Directory of the columnar files.',
+    )
+    parser.add_argument(
+        '--sink-compression',
+        default='zstd',
+        type=str,
+        help='Compression of the columnar files, e.g. zstd, snappy, none.',
+    )
+    parser.add_argument(
+        '--row-group-size',
+        default=100_000,
+        type=int,
+        help='Posts per row group of the columnar files.',
+    )
+    parser.add_argument(
+        '--metrics-format',
+        choices=['prometheus', 'otel'],
+        default=None,
+        type=str,
+        help='Export the per-stage metrics of the run in this format.',
+    )
+    parser.add_argument(
+        '--metrics-file',
+        default=None,
+        type=str,
+        help='File the exported metrics are written to, instead of stdout.',
     )
     parser.add_argument(
         '-log',
@@ -52,4 +396,33 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
     logging.basicConfig(level=args.loglevel.upper())
-    main(source=args.etl, transformation=args.tx)
+    main(
+        source=args.etl,
+        transformation=args.tx,
+        stream=args.stream,
+        chunk_size=args.chunk_size,
+        max_workers=args.max_workers,
+        requests_per_second=args.rps,
+        db_profile=args.db_profile,
+        db_type=args.db_type,
+        dsn=args.dsn,
+        incremental=args.incremental,
+        num_records=args.num_records,
+        listing=args.listing,
+        resume=args.resume,
+        api_cache=args.api_cache,
+        record=args.record,
+        replay=args.replay,
+        fake_client=args.fake_client,
+        fake_latency=args.fake_latency,
+        metrics_format=args.metrics_format,
+        metrics_file=args.metrics_file,
+        dedup=args.dedup,
+        dedup_fp_rate=args.dedup_fp_rate,
+        dedup_max_mb=args.dedup_max_mb,
+        dedup_verify=args.dedup_verify,
+        sink_format=args.sink,
+        sink_dir=args.sink_dir,
+        sink_compression=args.sink_compression,
+        row_group_size=args.row_group_size,
+    )
@@ -1,36 +1,195 @@
+import atexit
 import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
 
-from utils.db import db_factory
+from utils.db import DatabaseConnection, db_factory
+
+INSERT_LOG_METADATA_SQL = (
+    'INSERT INTO log_metadata'
+    ' (function_name, input_params, duration_ms, num_records)'
+    ' VALUES (:func_name, :input_params, :duration_ms, :num_records)'
+)
+
+
+class MetadataBuffer:
+    def __init__(
+        self, flush_size: int = 100, flush_interval: float = 5.0
+    ) -> None:
+        """Class to buffer log_metadata rows in memory and write them in
+        batches. A flush happens when flush_size rows are buffered, on the
+        first append after flush_interval seconds and at process exit. There
+        is no timer: a process that stops logging keeps its last rows
+        buffered until it exits or calls flush. Rows are written through a
+        single pooled connection, by default to the SQLite database, or to
+        the database passed to use_db.
+
+        Args:
+            flush_size (int, optional): Rows buffered before a flush.
+                Defaults to 100.
+            flush_interval (float, optional): Seconds after which the next
+                append flushes. Defaults to 5.0.
+        """
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # serializes the writes, so rows are written in order without
+        # blocking the appending threads on the database
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._db: Optional[DatabaseConnection] = None
+        self._local = threading.local()
+
+    def use_db(self, db: Optional[DatabaseConnection]) -> None:
+        """Function to write the rows buffered from now on to db, e.g. the
+        database a run loads its posts into. Rows buffered before are
+        flushed to the previous database first.
+
+        Args:
+            db (Optional[DatabaseConnection]): Database with a log_metadata
+                table, or None for the default SQLite database.
+        """
+        self.flush()
+        with self._lock:
+            previous, self._db = self._db, db
+        if previous is not None and previous is not db:
+            previous.close()
+
+    @contextmanager
+    def deferred(self) -> Iterator[None]:
+        """Context manager to only buffer the rows appended by the current
+        thread, and leave the flushes to the other threads, e.g. to the
+        single writer of runner.run_jobs."""
+        self._local.deferred = True
+        try:
+            yield
+        finally:
+            self._local.deferred = False
+
+    def append(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self._rows.append(row)
+            should_flush = (
+                len(self._rows) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if should_flush and not getattr(self._local, 'deferred', False):
+            self.flush()
+
+    def flush(self) -> None:
+        """Function to write all buffered rows in one transaction. When the
+        write fails, the rows are put back in the buffer for the next
+        flush."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._last_flush = time.monotonic()
+                if not rows:
+                    return
+                if self._db is None:
+                    self._db = db_factory(pooled=True)
+                db = self._db
+            try:
+                with db.managed_cursor() as cur:
+                    cur.executemany(INSERT_LOG_METADATA_SQL, rows)
+            except Exception:
+                with self._lock:
+                    self._rows[:0] = rows
+                raise
+
+    def close(self) -> None:
+        """Function to flush the buffer and release its connection."""
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+_buffer = MetadataBuffer()
+
+
+def flush_metadata() -> None:
+    """Function to write any buffered log_metadata rows to the database."""
+    _buffer.flush()
+
+
+def defer_metadata_flush() -> ContextManager[None]:
+    """Function to get a context manager, within which the log_metadata
+    rows of the current thread are buffered but not flushed."""
+    return _buffer.deferred()
+
+
+def use_metadata_db(db: Optional[DatabaseConnection]) -> None:
+    """Function to write the log_metadata rows to db instead of the
+    default SQLite database, or back to it with None."""
+    _buffer.use_db(db)
+
+
+@atexit.register
+def _flush_metadata_at_exit() -> None:
+    try:
+        _buffer.close()
+    except Exception:
+        logging.exception('Unable to flush buffered log_metadata rows.')
+
+
+def _count_records(result: Any, input_dict: Dict[str, Any]) -> Optional[int]:
+    # the records returned by extract/transform, or the ones passed to load
+    for value in (result, input_dict.get('social_data')):
+        if hasattr(value, '__len__') and not isinstance(value, str):
+            return len(value)
+    return None
+
+
+def _summarize(value: Any) -> Any:
+    # scalars are logged as is; containers (e.g. the social_data passed to
+    # load) and other objects by type and size, so a call's log row stays
+    # small and cheap to build whatever it was passed
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, '__len__'):
+        return f'<{type(value).__name__} of {len(value)}>'
+    return f'<{type(value).__name__}>'
 
 
 def log_metadata(func):
+    # resolve the parameter names once, instead of on every call
+    param_names = list(inspect.signature(func).parameters.keys())
+
+    @wraps(func)
     def log_wrapper(*args, **kwargs):
-        input_params = dict(
-            zip(list(locals().keys())[:-1], list(locals().values())[:-1])
+        # positional args are matched to parameter names in order, then
+        # merged with the keyword args
+        input_dict = dict(zip(param_names, args)) | kwargs
+        input_params = str(
+            {name: _summarize(value) for name, value in input_dict.items()}
         )
-        param_names = list(
-            inspect.signature(func).parameters.keys()
-        )  # order is preserved
-        # match with input_params.get('args') and
-        # then input_params.get('kwargs')
-        input_dict = {}
-        for v in input_params.get('args'):
-            input_dict[param_names.pop(0)] = v
-
-        db = db_factory()
-        with db.managed_cursor() as cur:
-            cur.execute(
-                (
-                    'INSERT INTO log_metadata (function_name, input_params)'
-                    ' VALUES (:func_name, :input_params)'
-                ),
-                {
-                    'func_name': func.__name__,
-                    'input_params': str(
-                        input_dict | input_params.get('kwargs')
-                    ),
-                },
-            )
-        return func(*args, **kwargs)
+        result = None
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            # a failed metadata write must not fail the wrapped call
+            try:
+                _buffer.append(
+                    {
+                        'func_name': func.__name__,
+                        'input_params': input_params,
+                        'duration_ms': (time.perf_counter() - start) * 1000,
+                        'num_records': _count_records(result, input_dict),
+                    }
+                )
+            except Exception:
+                logging.exception(
+                    'Unable to flush buffered log_metadata rows.'
+                )
 
     return log_wrapper
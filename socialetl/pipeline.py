@@ -0,0 +1,359 @@
+import ast
+import dataclasses
+import inspect
+import logging
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from sampling import reservoir_sample, stratified_sample
+from social_etl import SocialMediaData
+from transform import (
+    numeric_field,
+    random_choice_filter,
+    standard_deviation_outlier_filter,
+    streaming_standard_deviation_outlier_filter,
+)
+from utils.iterables import batched
+
+# Stage kinds. filter and map stages look at one record at a time, so
+# adjacent ones are fused into a single loop over the records. stream stages
+# transform an iterator lazily; batch stages need all their input at once
+# (or one window of it when the pipeline runs over a stream).
+FILTER = 'filter'
+MAP = 'map'
+STREAM = 'stream'
+BATCH = 'batch'
+ROW_KINDS = (FILTER, MAP)
+
+
+@dataclasses.dataclass(slots=True)
+class Stage:
+    """Dataclass to hold one step of a TransformPipeline.
+
+    Args:
+        name (str): Name shown in the stage statistics.
+        kind (str): One of FILTER, MAP, STREAM or BATCH.
+        func (Callable): Predicate for FILTER, record to record function
+            for MAP, iterator to iterator for STREAM, list to list for
+            BATCH.
+    """
+
+    name: str
+    kind: str
+    func: Callable
+
+
+@dataclasses.dataclass(slots=True)
+class StageStats:
+    """Dataclass to hold the record counts and timing of a stage.
+
+    Args:
+        name (str): Name of the stage.
+        records_in (int): Records the stage read.
+        records_out (int): Records the stage passed on.
+        seconds (float): Time spent in the stage. Fused stages report the
+            time of their whole segment.
+        segment (int): Index of the loop the stage ran in; stages sharing
+            a segment were fused.
+    """
+
+    name: str
+    records_in: int = 0
+    records_out: int = 0
+    seconds: float = 0.0
+    segment: int = 0
+
+
+@dataclasses.dataclass
+class TransformPipeline:
+    """Dataclass to chain transformation stages. Usable anywhere a
+    transform_function is expected.
+
+    Args:
+        stages (List[Stage]): Stages, applied in order.
+        window_size (Optional[int]): When set, batch stages run on windows
+            of window_size records, so the pipeline never materializes more
+            than one window of a stream.
+    """
+
+    stages: List[Stage]
+    window_size: Optional[int] = None
+    stats: List[StageStats] = dataclasses.field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.__name__ = 'pipeline:' + '|'.join(s.name for s in self.stages)
+
+    def _segments(self) -> List[List[int]]:
+        segments: List[List[int]] = []
+        for idx, stage in enumerate(self.stages):
+            if (
+                stage.kind in ROW_KINDS
+                and segments
+                and self.stages[segments[-1][-1]].kind in ROW_KINDS
+            ):
+                segments[-1].append(idx)
+            else:
+                segments.append([idx])
+        return segments
+
+    def _fused(
+        self, social_data: Iterable[SocialMediaData], segment: List[int]
+    ) -> Iterator[SocialMediaData]:
+        stages = [(self.stages[idx], self.stats[idx]) for idx in segment]
+        perf_counter = time.perf_counter
+        for post in social_data:
+            start = perf_counter()
+            kept = True
+            for stage, stats in stages:
+                stats.records_in += 1
+                if stage.kind == FILTER:
+                    if not stage.func(post):
+                        kept = False
+                        break
+                else:
+                    post = stage.func(post)
+                stats.records_out += 1
+            elapsed = perf_counter() - start
+            for _, stats in stages:
+                stats.seconds += elapsed
+            if kept:
+                yield post
+
+    def _counted(
+        self, social_data: Iterable[SocialMediaData], stats: StageStats
+    ) -> Iterator[SocialMediaData]:
+        for post in social_data:
+            stats.records_in += 1
+            yield post
+
+    def _stream(
+        self, social_data: Iterable[SocialMediaData], idx: int
+    ) -> Iterator[SocialMediaData]:
+        stats = self.stats[idx]
+        func = self.stages[idx].func
+        iterator = iter(func(self._counted(social_data, stats)))
+        while True:
+            start = time.perf_counter()
+            post = next(iterator, None)
+            stats.seconds += time.perf_counter() - start
+            if post is None:
+                return
+            stats.records_out += 1
+            yield post
+
+    def _batch(
+        self, social_data: Iterable[SocialMediaData], idx: int
+    ) -> Iterator[SocialMediaData]:
+        stats = self.stats[idx]
+        if self.window_size is None:
+            windows: Iterable[List[SocialMediaData]] = [list(social_data)]
+        else:
+            windows = batched(social_data, self.window_size)
+        for window in windows:
+            stats.records_in += len(window)
+            start = time.perf_counter()
+            output = self.stages[idx].func(window)
+            stats.seconds += time.perf_counter() - start
+            stats.records_out += len(output)
+            yield from output
+
+    def __call__(
+        self, social_data: Iterable[SocialMediaData]
+    ) -> List[SocialMediaData] | Iterator[SocialMediaData]:
+        """Function to run the stages over social_data.
+
+        Args:
+            social_data (Iterable[SocialMediaData]): Social media post data.
+
+        Returns:
+            List[SocialMediaData] | Iterator[SocialMediaData]: A list when
+                social_data is a list, else a lazy iterator.
+        """
+        self.stats = [StageStats(name=stage.name) for stage in self.stages]
+        output: Iterable[SocialMediaData] = social_data
+        for segment_idx, segment in enumerate(self._segments()):
+            for idx in segment:
+                self.stats[idx].segment = segment_idx
+            kind = self.stages[segment[0]].kind
+            if kind in ROW_KINDS:
+                output = self._fused(output, segment)
+            elif kind == STREAM:
+                output = self._stream(output, segment[0])
+            else:
+                output = self._batch(output, segment[0])
+        if isinstance(social_data, list):
+            output = list(output)
+            logging.info(self.format_stats())
+            return output
+        return self._log_when_exhausted(output)
+
+    def _log_when_exhausted(
+        self, social_data: Iterable[SocialMediaData]
+    ) -> Iterator[SocialMediaData]:
+        yield from social_data
+        logging.info(self.format_stats())
+
+    def format_stats(self) -> str:
+        """Function to render the stage statistics as a table."""
+        lines = [f'{"stage":<24} {"in":>10} {"out":>10} {"ms":>10}']
+        for stats in self.stats:
+            lines.append(
+                f'{stats.name:<24} {stats.records_in:>10}'
+                f' {stats.records_out:>10} {stats.seconds * 1000:>10.1f}'
+                f' (segment {stats.segment})'
+            )
+        return '\n'.join(lines)
+
+
+def dedup_stage() -> Stage:
+    """Function to build a filter that drops posts whose id was already
+    seen by this stage."""
+    seen: set = set()
+
+    def first_seen(post: SocialMediaData) -> bool:
+        if post.id in seen:
+            return False
+        seen.add(post.id)
+        return True
+
+    return Stage(name='dedup', kind=FILTER, func=first_seen)
+
+
+def min_stage(field: str, value: float) -> Stage:
+    """Function to build a filter that keeps posts whose social_data field
+    is at least value."""
+
+    def at_least(post: SocialMediaData) -> bool:
+        # posts without the field, e.g. tweets for score, are dropped
+        field_value = getattr(post.social_data, field, None)
+        return field_value is not None and field_value >= value
+
+    return Stage(name=f'min({field}>={value})', kind=FILTER, func=at_least)
+
+
+def project_stage(fields: str) -> Stage:
+    """Function to build a map that keeps the listed social_data fields
+    (joined by '+') and resets the others to their empty value, e.g. to
+    drop post bodies before loading."""
+    keep = set(fields.split('+'))
+
+    def project(post: SocialMediaData) -> SocialMediaData:
+        dropped = {
+            f.name: f.type()
+            for f in dataclasses.fields(post.social_data)
+            if f.name not in keep
+        }
+        return dataclasses.replace(
+            post, social_data=dataclasses.replace(post.social_data, **dropped)
+        )
+
+    return Stage(name=f'project({fields})', kind=MAP, func=project)
+
+
+def _bind_options(
+    func: Callable[..., Any], options: Dict[str, Any]
+) -> Callable[..., Any]:
+    # options are checked when the spec is parsed, not mid-run after the
+    # extract; a wrong name raises TypeError, a bad field ValueError
+    inspect.signature(func).bind_partial(None, **options)
+    if 'field' in options:
+        numeric_field(options['field'])
+    return partial(func, **options)
+
+
+def _batch_stage(
+    name: str, func: Callable[..., Any]
+) -> Callable[..., Stage]:
+    def build(**options: Any) -> Stage:
+        return Stage(
+            name=name, kind=BATCH, func=_bind_options(func, options)
+        )
+
+    return build
+
+
+def _stream_stage(
+    name: str, func: Callable[..., Any]
+) -> Callable[..., Stage]:
+    def build(**options: Any) -> Stage:
+        return Stage(
+            name=name, kind=STREAM, func=_bind_options(func, options)
+        )
+
+    return build
+
+
+STAGE_FACTORY: Dict[str, Callable[..., Stage]] = {
+    'no_tx': lambda: Stage(name='no_tx', kind=MAP, func=lambda post: post),
+    'sd': _batch_stage('sd', standard_deviation_outlier_filter),
+    'sd_stream': _stream_stage(
+        'sd_stream', streaming_standard_deviation_outlier_filter
+    ),
+    'rand': _stream_stage('rand', random_choice_filter),
+    'sample': _stream_stage('sample', reservoir_sample),
+    'strat': _stream_stage('strat', stratified_sample),
+    'dedup': dedup_stage,
+    'min': min_stage,
+    'project': project_stage,
+}
+
+
+def _parse_value(value: str) -> Any:
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def parse_pipeline_spec(spec: str) -> List[Stage]:
+    """Function to build stages from a pipeline spec: stage names separated
+    by '|', each optionally followed by ':' and comma separated key=value
+    options, e.g. 'dedup|min:field=score,value=10|sd:field=score,k=3'.
+
+    Args:
+        spec (str): Pipeline spec.
+
+    Returns:
+        List[Stage]: The stages, in order.
+    """
+    stages = []
+    for stage_spec in spec.split('|'):
+        name, _, option_spec = stage_spec.strip().partition(':')
+        if name not in STAGE_FACTORY:
+            raise ValueError(
+                f'Transformation stage {name} is not supported. Please pass'
+                f' one of {", ".join(STAGE_FACTORY)}.'
+            )
+        options = {}
+        for option in filter(None, option_spec.split(',')):
+            key, sep, value = option.partition('=')
+            if not sep:
+                raise ValueError(
+                    f'Option {option} of stage {name} is not key=value.'
+                )
+            options[key.strip()] = _parse_value(value.strip())
+        try:
+            stages.append(STAGE_FACTORY[name](**options))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Invalid options for stage {name}: {e}') from e
+    return stages
+
+
+def pipeline_factory(
+    spec: str, window_size: Optional[int] = None
+) -> TransformPipeline:
+    """Factory function to return a TransformPipeline from a spec.
+
+    Args:
+        spec (str): Pipeline spec, see parse_pipeline_spec.
+        window_size (Optional[int], optional): Window of records the batch
+            stages see when the pipeline runs over a stream.
+            Defaults to None.
+
+    Returns:
+        TransformPipeline: The pipeline.
+    """
+    return TransformPipeline(
+        stages=parse_pipeline_spec(spec), window_size=window_size
+    )
@@ -0,0 +1,91 @@
+import math
+import os
+from typing import Any, Callable, Dict, TypeVar
+
+from cache import SQLiteResponseCache
+from social_etl import SOURCE_REGISTRY, register_source
+
+T = TypeVar('T')
+
+# a recording keeps every response of every endpoint, forever
+RECORDING_OPTIONS: Dict[str, Any] = {
+    'ttls': {},
+    'default_ttl': math.inf,
+    'max_entries': 2**62,
+    'max_bytes': 2**62,
+}
+
+
+class ResponseNotRecorded(LookupError):
+    """Raised when replaying an API call that was not recorded."""
+
+
+def recording_cache(fixture: str) -> SQLiteResponseCache:
+    """Function to return a cache that records the responses of every API
+    call of a run into the fixture file, to replay them later with
+    ReplayCache.
+
+    Args:
+        fixture (str): SQLite file the responses are recorded in.
+
+    Returns:
+        SQLiteResponseCache: The recording cache.
+    """
+    return SQLiteResponseCache(db_file=fixture, **RECORDING_OPTIONS)
+
+
+class ReplayCache(SQLiteResponseCache):
+    def __init__(self, fixture: str) -> None:
+        """Class to serve API calls from a fixture recorded with
+        recording_cache, without ever calling the API.
+
+        Args:
+            fixture (str): SQLite file the responses were recorded in.
+        """
+        if not os.path.exists(fixture):
+            raise FileNotFoundError(
+                f'Fixture {fixture} does not exist. Please pass a valid'
+                ' recording.'
+            )
+        super().__init__(db_file=fixture, **RECORDING_OPTIONS)
+
+    def get_or_fetch(
+        self, endpoint: str, key: str, fetch: Callable[[], T]
+    ) -> T:
+        with self._lock:
+            found, value = self._get(endpoint, key, self._clock())
+            if not found:
+                self.stats.misses += 1
+                raise ResponseNotRecorded(
+                    f'No recorded response for {endpoint} {key}.'
+                )
+            self.stats.hits += 1
+        return value
+
+
+class OfflineClient:
+    """Stand in for the API clients when replaying. All the calls of a
+    replayed run are served by a ReplayCache, so any use of the client
+    means the call was not recorded."""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+
+    def __getattr__(self, name: str) -> Any:
+        # protocol lookups (e.g. hasattr(client, '__len__')) are not calls
+        if name.startswith('__'):
+            raise AttributeError(name)
+        raise ResponseNotRecorded(
+            f'{self.source} client call {name} was not recorded.'
+        )
+
+
+def use_offline_clients() -> None:
+    """Function to make etl_factory return OfflineClients, so a replayed
+    run needs neither credentials nor network access."""
+    for source in ('reddit', 'twitter'):
+        register_source(
+            source,
+            lambda source=source: OfflineClient(source),
+            SOURCE_REGISTRY[source][1],
+        )
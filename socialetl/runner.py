@@ -0,0 +1,400 @@
+import argparse
+import logging
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cache import cache_factory
+from dedup_index import DedupIndex
+from instrumentation import RunMetrics
+from loader import DEFAULT_BATCH_SIZE
+from metadata import defer_metadata_flush, flush_metadata
+from pipeline import pipeline_factory
+from social_etl import SocialETL, SocialMediaData, etl_factory
+from utils.db import PERFORMANCE_PROFILES, DatabaseConnection, db_factory
+from watermark import WatermarkStore
+
+
+@dataclass(slots=True)
+class EtlJob:
+    """Dataclass to hold one ETL job of a run.
+
+    Args:
+        source (str): Source to ETL, 'reddit' or 'twitter'.
+        id (str): Subreddit name or twitter user to get data from.
+        transformation (str): Transformation pipeline spec, see
+            pipeline.parse_pipeline_spec. Defaults to 'no_tx'.
+    """
+
+    source: str
+    id: str
+    transformation: str = 'no_tx'
+
+
+@dataclass(slots=True)
+class JobResult:
+    """Dataclass to hold the outcome of an EtlJob.
+
+    Args:
+        job (EtlJob): The job.
+        records (int): Records loaded.
+        inserted (int): Records that were not stored yet.
+        updated (int): Stored records whose content changed.
+        skipped (int): Records identical to the stored ones.
+        extract_seconds (float): Time spent extracting and transforming.
+        load_seconds (float): Time spent loading.
+        seconds (float): Time from the job being submitted to it being
+            loaded, including the time spent waiting for the writer.
+        error (Optional[str]): Error that failed the job, if any.
+        run_id (Optional[str]): Run of the job in the etl_runs table.
+    """
+
+    job: EtlJob
+    records: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    extract_seconds: float = 0.0
+    load_seconds: float = 0.0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    run_id: Optional[str] = None
+
+
+@dataclass
+class RunReport:
+    """Dataclass to hold the results of all the jobs of a run.
+
+    Args:
+        results (List[JobResult]): Result of each job, in job order.
+        seconds (float): Wall time of the run.
+    """
+
+    results: List[JobResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def records(self) -> int:
+        return sum(result.records for result in self.results)
+
+    @property
+    def failed(self) -> List[JobResult]:
+        return [result for result in self.results if result.error]
+
+    @property
+    def records_per_sec(self) -> float:
+        return self.records / self.seconds if self.seconds else 0.0
+
+    def format(self) -> str:
+        """Function to render the per job latencies and total throughput
+        as a table."""
+        lines = [
+            f'{"job":<40} {"records":>8} {"inserted":>8} {"updated":>8}'
+            f' {"skipped":>8} {"extract_ms":>11} {"load_ms":>9}'
+            f' {"total_ms":>9}'
+        ]
+        for result in self.results:
+            job = result.job
+            lines.append(
+                f'{f"{job.source}:{job.id}":<40} {result.records:>8}'
+                f' {result.inserted:>8} {result.updated:>8}'
+                f' {result.skipped:>8}'
+                f' {result.extract_seconds * 1000:>11.1f}'
+                f' {result.load_seconds * 1000:>9.1f}'
+                f' {result.seconds * 1000:>9.1f}'
+                + (f' FAILED: {result.error}' if result.error else '')
+            )
+        lines.append(
+            f'{len(self.results)} jobs, {len(self.failed)} failed,'
+            f' {self.records} records in {self.seconds:.2f}s'
+            f' ({self.records_per_sec:.0f} records/sec)'
+        )
+        return '\n'.join(lines)
+
+
+def parse_job(spec: str) -> EtlJob:
+    """Function to build an EtlJob from 'source:id' or
+    'source:id:transformation', e.g. 'reddit:python:dedup|sd:k=3'.
+
+    Args:
+        spec (str): Job spec.
+
+    Returns:
+        EtlJob: The job.
+    """
+    source, _, rest = spec.partition(':')
+    id, _, transformation = rest.partition(':')
+    if not source or not id:
+        raise ValueError(
+            f'Job {spec} is not valid. Please pass source:id or'
+            ' source:id:transformation.'
+        )
+    return EtlJob(
+        source=source, id=id, transformation=transformation or 'no_tx'
+    )
+
+
+EtlBuilder = Callable[[EtlJob], Tuple[object, SocialETL]]
+
+
+def _default_etl_builder(job: EtlJob) -> Tuple[object, SocialETL]:
+    return etl_factory(job.source)
+
+
+def _extract_job(
+    job: EtlJob, etl_builder: EtlBuilder, num_records: int
+) -> Tuple[SocialETL, List[SocialMediaData], RunMetrics, float]:
+    start = time.perf_counter()
+    client, social_etl = etl_builder(job)
+    metrics = RunMetrics(target_id=job.id)
+    # log_metadata rows are flushed by the writer, not by the workers
+    with defer_metadata_flush():
+        social_data = list(
+            social_etl.extract_transform(
+                client=client,
+                transform_function=pipeline_factory(job.transformation),
+                id=job.id,
+                num_records=num_records,
+                metrics=metrics,
+            )
+        )
+    return social_etl, social_data, metrics, time.perf_counter() - start
+
+
+def run_jobs(
+    jobs: List[EtlJob],
+    db: DatabaseConnection,
+    max_workers: int = 4,
+    num_records: int = 100,
+    chunk_size: int = DEFAULT_BATCH_SIZE,
+    etl_builder: Optional[EtlBuilder] = None,
+) -> RunReport:
+    """Function to run several ETL jobs. Extracts (and transforms) run
+    concurrently on a pool of max_workers threads, while loads run one at a
+    time on the calling thread, so there is a single SQLite writer and no
+    lock contention. The writer also flushes the log_metadata rows and
+    saves the stages of each job to etl_runs. The pool is refilled before
+    each load, so up to max_workers + 1 extracted jobs are held in memory:
+    the one being loaded and one per worker. A failed job is reported
+    without stopping the others.
+
+    Args:
+        jobs (List[EtlJob]): Jobs to run.
+        db (DatabaseConnection): Database to load into.
+        max_workers (int, optional): Concurrent extracts. Defaults to 4.
+        num_records (int, optional): Records to extract per job.
+            Defaults to 100.
+        chunk_size (int, optional): Records per load transaction.
+            Defaults to DEFAULT_BATCH_SIZE.
+        etl_builder (Optional[EtlBuilder], optional): Function returning
+            the client and ETL object of a job. Defaults to one calling
+            etl_factory for the job's source.
+
+    Returns:
+        RunReport: Per job latencies and total throughput.
+    """
+    if max_workers < 1:
+        raise ValueError(f'max_workers must be positive, got {max_workers}.')
+    build = etl_builder or _default_etl_builder
+    start = time.perf_counter()
+    results = [JobResult(job=job) for job in jobs]
+    submitted: Dict[Future, Tuple[JobResult, float]] = {}
+    remaining = iter(results)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def submit_next() -> None:
+            result = next(remaining, None)
+            if result is not None:
+                future = executor.submit(
+                    _extract_job, result.job, build, num_records
+                )
+                submitted[future] = (result, time.perf_counter())
+
+        for _ in range(max_workers):
+            submit_next()
+        while submitted:
+            done, _ = wait(submitted, return_when=FIRST_COMPLETED)
+            for future in done:
+                result, submitted_at = submitted.pop(future)
+                # refill the pool before blocking it on the load
+                submit_next()
+                try:
+                    social_etl, social_data, metrics, extract_seconds = (
+                        future.result()
+                    )
+                    result.extract_seconds = extract_seconds
+                    result.run_id = metrics.run_id
+                    load_start = time.perf_counter()
+                    stats = social_etl.load_and_commit(
+                        social_data=social_data,
+                        db_cursor_context=db.managed_cursor(),
+                        batch_size=chunk_size,
+                        metrics=metrics,
+                    )
+                    metrics.save(db)
+                    result.load_seconds = time.perf_counter() - load_start
+                    result.records = len(social_data)
+                    result.inserted = stats.inserted
+                    result.updated = stats.updated
+                    result.skipped = stats.skipped
+                except Exception as e:
+                    logging.exception(f'Job {result.job} failed.')
+                    result.error = repr(e)
+                try:
+                    flush_metadata()
+                except Exception:
+                    logging.exception(
+                        'Unable to flush buffered log_metadata rows.'
+                    )
+                result.seconds = time.perf_counter() - submitted_at
+
+    report = RunReport(results=results, seconds=time.perf_counter() - start)
+    logging.info(report.format())
+    return report
+
+
+def main(
+    jobs: List[EtlJob],
+    max_workers: int = 4,
+    num_records: int = 100,
+    chunk_size: int = DEFAULT_BATCH_SIZE,
+    db_profile: Optional[str] = 'balanced',
+    incremental: bool = False,
+    api_cache: Optional[str] = None,
+    dedup: bool = False,
+) -> RunReport:
+    """Function to run several ETL jobs against the project database.
+
+    Args:
+        jobs (List[EtlJob]): Jobs to run.
+        max_workers (int, optional): Concurrent extracts.
+        num_records (int, optional): Records to extract per job.
+        chunk_size (int, optional): Records per load transaction.
+        db_profile (Optional[str], optional): SQLite performance profile.
+            Defaults to 'balanced'.
+        incremental (bool, optional): Only extract items newer than the
+            high-water marks stored by previous runs.
+        api_cache (Optional[str], optional): Backend of the API response
+            cache shared by the jobs, 'sqlite' or 'memory'.
+            Defaults to None (no cache).
+        dedup (bool, optional): Drop the posts loaded by earlier runs or
+            jobs right after extract.
+    """
+    logging.info(f'Starting {len(jobs)} ETL jobs')
+    cache = cache_factory(api_cache)
+    with db_factory(pooled=True, profile=db_profile) as db:
+        watermark_store = WatermarkStore(db) if incremental else None
+        dedup_index = DedupIndex(db) if dedup else None
+
+        def etl_builder(job: EtlJob) -> Tuple[object, SocialETL]:
+            return etl_factory(
+                job.source,
+                watermark_store=watermark_store,
+                cache=cache,
+                dedup_index=dedup_index,
+            )
+
+        report = run_jobs(
+            jobs,
+            db,
+            max_workers=max_workers,
+            num_records=num_records,
+            chunk_size=chunk_size,
+            etl_builder=etl_builder,
+        )
+        if dedup_index is not None:
+            dedup_index.save()
+            logging.info(f'Dedup index usage: {dedup_index.stats}')
+        logging.info(f'Database connection usage: {db.pool_stats()}')
+    if cache is not None:
+        logging.info(f'API cache usage: {cache.stats}')
+        cache.close()
+    return report
+
+
+if __name__ == '__main__':
+    # python ./socialetl/runner.py --job reddit:dataengineering \
+    #     --job reddit:python:sd --job twitter:startdataeng --log info
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--job',
+        action='append',
+        required=True,
+        type=parse_job,
+        dest='jobs',
+        help=(
+            'Job to run, as source:id or source:id:transformation. Repeat'
+            ' for several jobs. Example --job "reddit:python:dedup|sd:k=3".'
+        ),
+    )
+    parser.add_argument(
+        '--max-workers',
+        default=4,
+        type=int,
+        help='Number of concurrent extracts.',
+    )
+    parser.add_argument(
+        '--num-records',
+        default=100,
+        type=int,
+        help='Records to extract per job.',
+    )
+    parser.add_argument(
+        '--chunk-size',
+        default=DEFAULT_BATCH_SIZE,
+        type=int,
+        help='Records per load transaction.',
+    )
+    parser.add_argument(
+        '--db-profile',
+        choices=list(PERFORMANCE_PROFILES),
+        default='balanced',
+        type=str,
+        help='SQLite performance profile applied on connect.',
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only extract items newer than the previous run.',
+    )
+    parser.add_argument(
+        '--api-cache',
+        choices=['sqlite', 'memory'],
+        default=None,
+        type=str,
+        help='Cache API lookups that rarely change between runs.',
+    )
+    parser.add_argument(
+        '--dedup',
+        action='store_true',
+        help='Drop posts loaded by earlier runs or jobs after extract.',
+    )
+    parser.add_argument(
+        '-log',
+        '--loglevel',
+        default='warning',
+        help=(
+            'Provide logging level. Example --loglevel debug, default=warning'
+        ),
+    )
+
+    args = parser.parse_args()
+    logging.basicConfig(level=args.loglevel.upper())
+    report = main(
+        jobs=args.jobs,
+        max_workers=args.max_workers,
+        num_records=args.num_records,
+        chunk_size=args.chunk_size,
+        db_profile=args.db_profile,
+        incremental=args.incremental,
+        api_cache=args.api_cache,
+        dedup=args.dedup,
+    )
+    print(report.format())
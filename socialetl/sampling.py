@@ -0,0 +1,128 @@
+import math
+import random
+from collections import defaultdict
+from itertools import islice
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+from social_etl import SocialMediaData
+
+
+def _uniform(rng: random.Random) -> float:
+    # a uniform float in (0, 1), so that its log is finite
+    value = rng.random()
+    while value == 0.0:
+        value = rng.random()
+    return value
+
+
+def reservoir_sample(
+    social_data: Iterable[SocialMediaData],
+    k: int = 2,
+    seed: Optional[int] = None,
+) -> List[SocialMediaData]:
+    """Function to sample k posts without replacement in a single pass over
+    social_data, holding only the k sampled posts in memory. Uses Algorithm
+    L, which skips ahead between replacements instead of drawing a random
+    number per post.
+
+    Args:
+        social_data (Iterable[SocialMediaData]): Social media post data.
+        k (int, optional): Number of posts to sample. Defaults to 2.
+        seed (Optional[int], optional): Seed that makes the sample
+            reproducible. Defaults to None.
+
+    Returns:
+        List[SocialMediaData]: At most k posts, each post having the same
+            probability of being sampled.
+    """
+    if k < 1:
+        raise ValueError(f'k must be positive, got {k}.')
+    rng = random.Random(seed)
+    iterator = iter(social_data)
+    reservoir = list(islice(iterator, k))
+    if len(reservoir) < k:
+        return reservoir
+
+    w = math.exp(math.log(_uniform(rng)) / k)
+    while True:
+        # w rounds to 1.0 for draws very close to 1 and a small k, where
+        # the next post replaces a sampled one
+        skip = (
+            math.floor(math.log(_uniform(rng)) / math.log1p(-w))
+            if w < 1.0
+            else 0
+        )
+        post = next(islice(iterator, skip, None), None)
+        if post is None:
+            return reservoir
+        reservoir[rng.randrange(k)] = post
+        w *= math.exp(math.log(_uniform(rng)) / k)
+
+
+STRATA = ('source', 'score')
+
+
+def _stratum_key(
+    by: str, bucket_size: int
+) -> Callable[[SocialMediaData], Hashable]:
+    if by not in STRATA:
+        raise ValueError(
+            f'Stratum {by} is not supported. Please pass one of'
+            f' {", ".join(STRATA)}.'
+        )
+    if by == 'source':
+        return lambda post: post.source
+
+    def score_bucket(post: SocialMediaData) -> Hashable:
+        # posts without a score, i.e. tweets, share the None bucket
+        score = getattr(post.social_data, 'score', None)
+        return None if score is None else score // bucket_size
+
+    return score_bucket
+
+
+def stratified_sample(
+    social_data: Iterable[SocialMediaData],
+    k: int = 2,
+    by: str = 'source',
+    bucket_size: int = 100,
+    seed: Optional[int] = None,
+) -> List[SocialMediaData]:
+    """Function to sample up to k posts without replacement from every
+    stratum (e.g. every source), in a single pass over social_data, with
+    one reservoir of k posts per stratum.
+
+    Args:
+        social_data (Iterable[SocialMediaData]): Social media post data.
+        k (int, optional): Number of posts to sample per stratum.
+            Defaults to 2.
+        by (str, optional): Stratum key, 'source' or 'score'.
+            Defaults to 'source'.
+        bucket_size (int, optional): Width of the score buckets when by is
+            'score'. Defaults to 100.
+        seed (Optional[int], optional): Seed that makes the sample
+            reproducible. Defaults to None.
+
+    Returns:
+        List[SocialMediaData]: The sampled posts, grouped by stratum in the
+            order the strata were first seen.
+    """
+    if k < 1:
+        raise ValueError(f'k must be positive, got {k}.')
+    stratum_of = _stratum_key(by, bucket_size)
+    rng = random.Random(seed)
+    reservoirs: Dict[Hashable, List[SocialMediaData]] = defaultdict(list)
+    seen: Dict[Hashable, int] = defaultdict(int)
+    for post in social_data:
+        stratum = stratum_of(post)
+        reservoir = reservoirs[stratum]
+        seen[stratum] += 1
+        # Algorithm R: the n-th post of a stratum replaces a sampled one
+        # with probability k / n
+        if len(reservoir) < k:
+            reservoir.append(post)
+        else:
+            idx = rng.randrange(seen[stratum])
+            if idx < k:
+                reservoir[idx] = post
+    return [post for reservoir in reservoirs.values() for post in reservoir]
@@ -1,44 +1,503 @@
 import argparse
+import ast
+import json
 import logging
+import re
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
 
-from utils.db import db_factory
+from dedup_index import CREATE_DEDUP_INDEX_SQL
+from instrumentation import CREATE_ETL_RUNS_SQL
+from utils.db import DB_BACKENDS, DatabaseConnection, db_factory
+from utils.iterables import batched
 
 
-def setup_db_schema():
-    """Function to setup the database schema."""
-    db = db_factory()
+def _json_field(field: str, sql_type: str) -> str:
+    # rows written before social_data was stored as JSON hold a python repr,
+    # which json_extract would reject
+    return (
+        f'{sql_type} GENERATED ALWAYS AS (CASE WHEN json_valid(social_data)'
+        f" THEN CAST(json_extract(social_data, '$.{field}') AS {sql_type})"
+        ' END) VIRTUAL'
+    )
+
+
+# Virtual columns computed from the social_data JSON on read, so hot fields
+# can be filtered and indexed without parsing social_data in python.
+SOCIAL_POSTS_GENERATED_COLUMNS = {
+    'score': _json_field('score', 'INTEGER'),
+    'comms_num': _json_field('comms_num', 'INTEGER'),
+    'created': _json_field('created', 'REAL'),
+}
+
+
+def add_missing_columns(
+    cur: sqlite3.Cursor, table: str, columns: Dict[str, str]
+) -> None:
+    """Function to add columns to a table created by an older schema.
+
+    Args:
+        cur (sqlite3.Cursor): Database cursor.
+        table (str): Table to alter.
+        columns (Dict[str, str]): Column name to column definition.
+    """
+    cur.execute(f'PRAGMA table_xinfo({table})')
+    existing = {row[1] for row in cur.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            logging.info(f'Adding column {name} to {table} table.')
+            cur.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
+def create_posts_table(cur: sqlite3.Cursor, table: str) -> None:
+    """Function to create a table with the social_posts columns, or add
+    the columns it misses.
+
+    Args:
+        cur (sqlite3.Cursor): Database cursor.
+        table (str): Table to create, e.g. a partition.
+    """
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id TEXT PRIMARY KEY,
+            source TEXT,
+            social_data TEXT,
+            content_hash INTEGER,
+            dt_created datetime default current_timestamp
+        )
+        """
+    )
+    add_missing_columns(
+        cur,
+        table,
+        {'content_hash': 'INTEGER'} | SOCIAL_POSTS_GENERATED_COLUMNS,
+    )
+
+
+# social_posts of the backends other than sqlite3, which read the hot
+# fields from the social_data JSON with their own functions
+CREATE_PORTABLE_POSTS_SQL = """
+    CREATE TABLE IF NOT EXISTS social_posts (
+        id TEXT PRIMARY KEY,
+        source TEXT,
+        social_data TEXT,
+        content_hash BIGINT,
+        dt_created TIMESTAMP DEFAULT current_timestamp
+    )
+"""
+
+
+# log_metadata of the other backends, written through the same backend as
+# the posts of the run (see metadata.use_metadata_db)
+CREATE_PORTABLE_LOG_METADATA_SQL = """
+    CREATE TABLE IF NOT EXISTS log_metadata (
+        dt_created TIMESTAMP DEFAULT current_timestamp,
+        function_name TEXT,
+        input_params TEXT,
+        duration_ms DOUBLE PRECISION,
+        num_records INTEGER
+    )
+"""
+
+
+def _create_posts_indexes(
+    cur: sqlite3.Cursor, table: str = 'social_posts'
+) -> None:
+    logging.info(f'Creating {table} indexes.')
+    cur.execute(
+        f'CREATE INDEX IF NOT EXISTS {table}_source_idx ON {table} (source)'
+    )
+    cur.execute(
+        f'CREATE INDEX IF NOT EXISTS {table}_dt_created_idx'
+        f' ON {table} (dt_created)'
+    )
+
+
+# With partitioning, posts are stored in one table per source and load
+# day (UTC), listed in social_posts_partitions, and social_posts is a view
+# over all of them. A partition_day filter on the view only reads the
+# matching partitions, and retention drops whole tables.
+PARTITION_TEMPLATE = 'social_posts_template'
+
+CREATE_PARTITIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS social_posts_partitions (
+        name TEXT PRIMARY KEY,
+        source TEXT NOT NULL,
+        day TEXT NOT NULL,
+        dt_created datetime default current_timestamp
+    )
+"""
+
+# SQLite compound selects are limited to 500 terms, so the view unions
+# sub-views of at most this many partitions each
+MAX_VIEW_PARTITIONS = 400
+
+# partition source of the migrated posts that have none
+UNKNOWN_SOURCE = 'unknown'
+
+
+def is_partitioned(cur: sqlite3.Cursor) -> bool:
+    """Function to tell whether social_posts is the view over
+    partitions."""
+    cur.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'social_posts'"
+    )
+    row = cur.fetchone()
+    return row is not None and row[0] == 'view'
+
+
+def partition_name(source: str, day: str) -> str:
+    """Function to get the table of a source and day (YYYYMMDD)."""
+    if not re.fullmatch(r'\w+', source) or not re.fullmatch(r'\d{8}', day):
+        raise ValueError(
+            f'Cannot partition source {source} by day {day}. Please pass a'
+            ' source of letters, digits or _, and a day as YYYYMMDD.'
+        )
+    return f'social_posts_{source}_{day}'
+
+
+def utc_day(now: Optional[datetime] = None) -> str:
+    """Function to get the partition day of now, by default the current
+    UTC time."""
+    return (now or datetime.now(timezone.utc)).strftime('%Y%m%d')
+
+
+def _drop_partitions_view(cur: sqlite3.Cursor) -> None:
+    cur.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'view'"
+        " AND (name = 'social_posts' OR name LIKE 'social_posts_union_%')"
+    )
+    for (view,) in cur.fetchall():
+        cur.execute(f'DROP VIEW {view}')
+
+
+def refresh_partitions_view(cur: sqlite3.Cursor) -> None:
+    """Function to recreate the social_posts view over the partitions
+    listed in social_posts_partitions.
+
+    Args:
+        cur (sqlite3.Cursor): Database cursor.
+    """
+    _drop_partitions_view(cur)
+    cur.execute('SELECT name, day FROM social_posts_partitions ORDER BY 1')
+    # the empty template comes first, as it names the partition columns
+    selects = [
+        f"SELECT *, '{PARTITION_TEMPLATE}' AS partition_name,"
+        f' NULL AS partition_day FROM {PARTITION_TEMPLATE}'
+    ] + [
+        f"SELECT *, '{name}', '{day}' FROM {name}"
+        for name, day in cur.fetchall()
+    ]
+    if len(selects) > MAX_VIEW_PARTITIONS:
+        chunks = list(batched(selects, MAX_VIEW_PARTITIONS))
+        selects = []
+        for idx, chunk in enumerate(chunks):
+            cur.execute(
+                f'CREATE VIEW social_posts_union_{idx} AS'
+                f' {" UNION ALL ".join(chunk)}'
+            )
+            selects.append(f'SELECT * FROM social_posts_union_{idx}')
+    cur.execute(f'CREATE VIEW social_posts AS {" UNION ALL ".join(selects)}')
+
+
+def ensure_partition(cur: sqlite3.Cursor, source: str, day: str) -> str:
+    """Function to create the partition of source and day if it does not
+    exist yet, and add it to the social_posts view.
+
+    Args:
+        cur (sqlite3.Cursor): Database cursor.
+        source (str): Source of the posts, e.g. 'reddit'.
+        day (str): Load day, as YYYYMMDD.
+
+    Returns:
+        str: The partition table.
+    """
+    name = partition_name(source, day)
+    cur.execute(
+        'INSERT OR IGNORE INTO social_posts_partitions (name, source, day)'
+        ' VALUES (?, ?, ?)',
+        (name, source, day),
+    )
+    if cur.rowcount:
+        logging.info(f'Creating partition {name}.')
+        create_posts_table(cur, name)
+        _create_posts_indexes(cur, name)
+        refresh_partitions_view(cur)
+    return name
+
+
+def list_partitions(
+    db: Optional[DatabaseConnection] = None,
+) -> List[Dict[str, str]]:
+    """Function to list the partitions of social_posts, oldest first."""
+    db = db or db_factory()
     with db.managed_cursor() as cur:
-        logging.info('Creating social_posts table.')
         cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS social_posts (
-                id TEXT PRIMARY KEY,
-                source TEXT,
-                social_data TEXT,
-                dt_created datetime default current_timestamp
+            'SELECT name, source, day FROM social_posts_partitions'
+            ' ORDER BY day, source'
+        )
+        return [
+            {'name': name, 'source': source, 'day': day}
+            for name, source, day in cur.fetchall()
+        ]
+
+
+def drop_partitions(
+    retention_days: int,
+    source: Optional[str] = None,
+    db: Optional[DatabaseConnection] = None,
+    now: Optional[datetime] = None,
+) -> List[str]:
+    """Function to apply retention, by dropping the partitions loaded more
+    than retention_days days ago. Unlike a DELETE, dropping a table does not
+    scan or rewrite the rows of the partitions that are kept.
+
+    Args:
+        retention_days (int): Days of partitions to keep, including today.
+        source (Optional[str], optional): Only drop the partitions of this
+            source. Defaults to None (all sources).
+        db (Optional[DatabaseConnection], optional): Database connection.
+            Defaults to db_factory().
+        now (Optional[datetime], optional): Current time. Defaults to the
+            current UTC time.
+
+    Returns:
+        List[str]: The dropped partitions.
+    """
+    if retention_days < 1:
+        raise ValueError(
+            f'retention_days {retention_days} would drop the partitions'
+            ' being loaded. Please pass a positive number of days.'
+        )
+    cutoff = utc_day(
+        (now or datetime.now(timezone.utc))
+        - timedelta(days=retention_days - 1)
+    )
+    db = db or db_factory()
+    with db.managed_cursor() as cur:
+        if db.db_type != 'sqlite3' or not is_partitioned(cur):
+            raise ValueError(
+                'social_posts is not partitioned, so retention has no'
+                ' partitions to drop. Please migrate it with'
+                ' migrate_to_partitions first.'
             )
-            """
+        cur.execute('BEGIN')
+        try:
+            cur.execute(
+                'SELECT name FROM social_posts_partitions WHERE day < ?'
+                ' AND source = coalesce(?, source)',
+                (cutoff, source),
+            )
+            dropped = [row[0] for row in cur.fetchall()]
+            for name in dropped:
+                logging.info(f'Dropping partition {name}.')
+                cur.execute(
+                    'DELETE FROM social_posts_partitions WHERE name = ?',
+                    (name,),
+                )
+            # the view is recreated first, as it references the tables
+            refresh_partitions_view(cur)
+            for name in dropped:
+                cur.execute(f'DROP TABLE {name}')
+        except Exception:
+            cur.execute('ROLLBACK')
+            raise
+        cur.execute('COMMIT')
+    return dropped
+
+
+def _setup_partitions(cur: sqlite3.Cursor) -> None:
+    cur.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'social_posts'"
+    )
+    row = cur.fetchone()
+    if row is not None and row[0] == 'table':
+        raise ValueError(
+            'social_posts is a table. Please migrate it with'
+            ' migrate_to_partitions, or reset the database.'
         )
+    logging.info('Creating social_posts partitions.')
+    cur.execute(CREATE_PARTITIONS_SQL)
+    create_posts_table(cur, PARTITION_TEMPLATE)
+    refresh_partitions_view(cur)
+
+
+def setup_db_schema(
+    partitioned: bool = False, db: Optional[DatabaseConnection] = None
+):
+    """Function to setup the database schema.
+
+    Args:
+        partitioned (bool, optional): Store social_posts as one table per
+            source and load day, behind a social_posts view. A database
+            that is already partitioned stays so. Defaults to False.
+        db (Optional[DatabaseConnection], optional): Database connection.
+            Defaults to db_factory(). Other backends than sqlite3 get the
+            social_posts, log_metadata and etl_runs tables; the watermarks
+            and dedup index stay in SQLite.
+    """
+    db = db or db_factory()
+    if db.db_type != 'sqlite3':
+        if partitioned:
+            raise ValueError(
+                f'{db.db_type} does not support partitioning. Please use'
+                ' the sqlite3 db_type.'
+            )
+        with db.managed_cursor() as cur:
+            logging.info('Creating social_posts table.')
+            cur.execute(CREATE_PORTABLE_POSTS_SQL)
+            _create_posts_indexes(cur)
+            logging.info('Creating ETL metadata table.')
+            cur.execute(CREATE_PORTABLE_LOG_METADATA_SQL)
+            logging.info('Creating ETL runs table.')
+            cur.execute(CREATE_ETL_RUNS_SQL)
+        return
+    with db.managed_cursor() as cur:
+        if partitioned or is_partitioned(cur):
+            _setup_partitions(cur)
+        else:
+            logging.info('Creating social_posts table.')
+            create_posts_table(cur, 'social_posts')
+            _create_posts_indexes(cur)
         logging.info('Creating ETL metadata table.')
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS log_metadata (
                 dt_created datetime default current_timestamp,
                 function_name TEXT,
-                input_params TEXT
+                input_params TEXT,
+                duration_ms REAL,
+                num_records INTEGER
             )
             """
         )
+        add_missing_columns(
+            cur,
+            'log_metadata',
+            {'duration_ms': 'REAL', 'num_records': 'INTEGER'},
+        )
+        logging.info('Creating ETL watermarks table.')
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS etl_watermarks (
+                source TEXT,
+                target_id TEXT,
+                last_id TEXT,
+                last_created REAL,
+                dt_updated datetime default current_timestamp,
+                PRIMARY KEY (source, target_id)
+            )
+            """
+        )
+        logging.info('Creating ETL runs table.')
+        cur.execute(CREATE_ETL_RUNS_SQL)
+        logging.info('Creating dedup index table.')
+        cur.execute(CREATE_DEDUP_INDEX_SQL)
+
+
+def migrate_social_data_to_json(db: Optional[DatabaseConnection] = None):
+    """Function to rewrite social_data stored as a python repr, by loads
+    that predate JSON storage, as JSON.
+
+    Args:
+        db (Optional[DatabaseConnection], optional): Database connection.
+            Defaults to db_factory().
+    """
+    db = db or db_factory()
+    if db.db_type != 'sqlite3':
+        # the other backends have only ever stored social_data as JSON
+        return
+    with db.managed_cursor() as cur:
+        # the social_posts view of a partitioned database is not updatable
+        tables = ['social_posts']
+        if is_partitioned(cur):
+            cur.execute('SELECT name FROM social_posts_partitions')
+            tables = [row[0] for row in cur.fetchall()]
+        for table in tables:
+            cur.execute(
+                f'SELECT id, social_data FROM {table}'
+                ' WHERE NOT json_valid(social_data)'
+            )
+            rows = [
+                {'id': id, 'social_data': json.dumps(ast.literal_eval(data))}
+                for id, data in cur.fetchall()
+            ]
+            logging.info(f'Rewriting {len(rows)} {table} rows as JSON.')
+            cur.executemany(
+                f'UPDATE {table} SET social_data = :social_data'
+                ' WHERE id = :id',
+                rows,
+            )
 
 
-def teardown_db_schema():
+def migrate_to_partitions(db: Optional[DatabaseConnection] = None):
+    """Function to move the rows of a social_posts table into partitions,
+    by source and by the day they were loaded. When social_posts is already
+    partitioned, the partitions that miss the social_posts indexes get
+    them."""
+    db = db or db_factory()
+    with db.managed_cursor() as cur:
+        if is_partitioned(cur):
+            cur.execute('SELECT name FROM social_posts_partitions')
+            for (name,) in cur.fetchall():
+                _create_posts_indexes(cur, name)
+            return
+        cur.execute('BEGIN')
+        try:
+            cur.execute(
+                'ALTER TABLE social_posts RENAME TO social_posts_unpartitioned'
+            )
+            _setup_partitions(cur)
+            cur.execute(
+                "SELECT DISTINCT source, strftime('%Y%m%d', dt_created)"
+                ' FROM social_posts_unpartitioned'
+            )
+            for source, day in cur.fetchall():
+                # posts without a source or a valid dt_created go to the
+                # partition of UNKNOWN_SOURCE or of the migration day
+                name = ensure_partition(
+                    cur, source or UNKNOWN_SOURCE, day or utc_day()
+                )
+                logging.info(f'Moving {source} posts of {day} to {name}.')
+                cur.execute(
+                    f'INSERT INTO {name} (id, source, social_data,'
+                    ' content_hash, dt_created) SELECT id, source,'
+                    ' social_data, content_hash, dt_created'
+                    ' FROM social_posts_unpartitioned WHERE source IS ?'
+                    " AND strftime('%Y%m%d', dt_created) IS ?",
+                    (source, day),
+                )
+            cur.execute('DROP TABLE social_posts_unpartitioned')
+        except Exception:
+            cur.execute('ROLLBACK')
+            raise
+        cur.execute('COMMIT')
+
+
+def teardown_db_schema(db: Optional[DatabaseConnection] = None):
     """Function to teardown the database schema."""
-    db = db_factory()
+    db = db or db_factory()
     with db.managed_cursor() as cur:
+        if db.db_type == 'sqlite3' and is_partitioned(cur):
+            logging.info('Dropping social_posts partitions.')
+            cur.execute('SELECT name FROM social_posts_partitions')
+            partitions = [row[0] for row in cur.fetchall()]
+            _drop_partitions_view(cur)
+            for name in partitions + [PARTITION_TEMPLATE]:
+                cur.execute(f'DROP TABLE IF EXISTS {name}')
+            cur.execute('DROP TABLE social_posts_partitions')
         logging.info('Dropping social_posts table.')
         cur.execute('DROP TABLE IF EXISTS social_posts')
         logging.info('Dropping log_metadata table.')
         cur.execute('DROP TABLE IF EXISTS log_metadata')
+        logging.info('Dropping etl_watermarks table.')
+        cur.execute('DROP TABLE IF EXISTS etl_watermarks')
+        logging.info('Dropping etl_runs table.')
+        cur.execute('DROP TABLE IF EXISTS etl_runs')
+        logging.info('Dropping dedup_index table.')
+        cur.execute('DROP TABLE IF EXISTS dedup_index')
 
 
 if __name__ == '__main__':
@@ -48,8 +507,57 @@ if __name__ == '__main__':
         action='store_true',
         help='Reset your database objects',
     )
+    parser.add_argument(
+        '--migrate-json',
+        action='store_true',
+        help='Rewrite social_data stored as a python repr as JSON',
+    )
+    parser.add_argument(
+        '--partitioned',
+        action='store_true',
+        help='With --reset-db, store posts in per source and day partitions',
+    )
+    parser.add_argument(
+        '--migrate-partitions',
+        action='store_true',
+        help='Move the posts of the social_posts table into partitions',
+    )
+    parser.add_argument(
+        '--retention-days',
+        default=None,
+        type=int,
+        help='Drop the partitions loaded more than this many days ago',
+    )
+    parser.add_argument(
+        '--db-type',
+        choices=list(DB_BACKENDS),
+        default='sqlite3',
+        help='Database to manage',
+    )
+    parser.add_argument(
+        '--db-file',
+        default=None,
+        help='Database file of sqlite3 and duckdb',
+    )
+    parser.add_argument(
+        '--dsn',
+        default=None,
+        help='Connection string of postgres, defaults to $POSTGRES_DSN',
+    )
     args = parser.parse_args()
     logging.basicConfig(level='INFO')
+    db = db_factory(db_type=args.db_type, db_file=args.db_file, dsn=args.dsn)
     if args.reset_db:
-        teardown_db_schema()
-        setup_db_schema()
+        teardown_db_schema(db)
+        setup_db_schema(partitioned=args.partitioned, db=db)
+    if args.migrate_partitions:
+        migrate_to_partitions(db)
+        setup_db_schema(db=db)
+    if args.retention_days is not None:
+        try:
+            drop_partitions(args.retention_days, db=db)
+        except ValueError as e:
+            parser.exit(1, f'{e}\n')
+    if args.migrate_json:
+        setup_db_schema(db=db)
+        migrate_social_data_to_json(db)
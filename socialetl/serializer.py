@@ -0,0 +1,118 @@
+import hashlib
+import json
+from dataclasses import fields
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # type: ignore
+
+if TYPE_CHECKING:
+    from social_etl import SocialMediaData
+
+RowEncoder = Callable[['SocialMediaData'], Dict[str, Any]]
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'))
+
+# Backends that turn the social_data dict into the stored column value.
+# json and orjson store TEXT that the generated columns in schema_manager can
+# read; msgpack stores a compact BLOB, for which those columns are NULL.
+# The backends write different bytes for the same post (orjson does not
+# escape non-ASCII text), so switching backends changes the content_hash of
+# those posts and rewrites them on the next load.
+SERIALIZERS: Dict[str, Callable[[Dict[str, Any]], str | bytes]] = {
+    'json': _json_encoder.encode,
+}
+if orjson is not None:
+    SERIALIZERS['orjson'] = lambda data: orjson.dumps(data).decode()
+if msgpack is not None:
+    SERIALIZERS['msgpack'] = msgpack.packb
+
+# the stored social_data and its content_hash must not depend on which
+# optional packages are installed, so the faster backends are opt-in
+DEFAULT_SERIALIZER = 'json'
+
+_getters: Dict[type, Tuple[Tuple[str, ...], attrgetter]] = {}
+
+
+def _fields_getter(cls: type) -> Tuple[Tuple[str, ...], attrgetter]:
+    # dataclasses.fields is only walked once per type
+    if cls not in _getters:
+        names = tuple(field.name for field in fields(cls))
+        _getters[cls] = (names, attrgetter(*names))
+    return _getters[cls]
+
+
+def social_data_dict(social_data: Any) -> Dict[str, Any]:
+    """Function to build a shallow dict of a dataclass' fields. Unlike
+    dataclasses.asdict it does not deep copy, which is safe for the flat
+    RedditPostData and TwitterTweetData records.
+
+    Args:
+        social_data (Any): RedditPostData or TwitterTweetData.
+
+    Returns:
+        Dict[str, Any]: Field name to value.
+    """
+    names, getter = _fields_getter(type(social_data))
+    values = getter(social_data)
+    if len(names) == 1:
+        return {names[0]: values}
+    return dict(zip(names, values))
+
+
+def content_hash(source: str, social_data: str | bytes) -> int:
+    """Function to hash the stored content of a post into a signed 64 bit
+    integer, which SQLite stores in at most 8 bytes.
+
+    Args:
+        source (str): Source of the post.
+        social_data (str | bytes): Serialized social_data of the post.
+
+    Returns:
+        int: The content hash.
+    """
+    if isinstance(social_data, str):
+        social_data = social_data.encode()
+    digest = hashlib.blake2b(
+        social_data, digest_size=8, person=source.encode()[:16]
+    ).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def row_encoder_factory(backend: Optional[str] = None) -> RowEncoder:
+    """Factory function to return a function that encodes a
+    SocialMediaData object into a social_posts row.
+
+    Args:
+        backend (Optional[str], optional): Key of SERIALIZERS.
+            Defaults to DEFAULT_SERIALIZER.
+
+    Returns:
+        RowEncoder: Function returning the row keyed by column name.
+    """
+    backend = backend or DEFAULT_SERIALIZER
+    if backend not in SERIALIZERS:
+        raise ValueError(
+            f'Serializer backend {backend} is not supported or not'
+            ' installed.'
+        )
+    serialize = SERIALIZERS[backend]
+
+    def encode_row(post: 'SocialMediaData') -> Dict[str, Any]:
+        social_data = serialize(social_data_dict(post.social_data))
+        return {
+            'id': post.id,
+            'source': post.source,
+            'social_data': social_data,
+            'content_hash': content_hash(post.source, social_data),
+        }
+
+    return encode_row
@@ -1,20 +1,44 @@
 import logging
 import os
 from abc import ABC, abstractmethod
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Callable, List, Tuple
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
-import praw
-import tweepy
+from cache import ResponseCache
+from dedup_index import DedupIndex
 from dotenv import load_dotenv
+from instrumentation import RunMetrics
+from loader import DEFAULT_BATCH_SIZE, LoadStats, bulk_load
 from metadata import log_metadata
+from utils.concurrency import bounded_map, prefetch
 from utils.db import DatabaseConnection
+from utils.rate_limit import TokenBucket
+from watermark import Watermark, WatermarkStore
+
+if TYPE_CHECKING:
+    import praw
+    import tweepy
+    from columnar import ColumnarSink
 
 load_dotenv()
 
+T = TypeVar('T')
+
 
-@dataclass
+@dataclass(slots=True)
 class RedditPostData:
     """Dataclass to hold reddit post data.
 
@@ -35,7 +59,7 @@ class RedditPostData:
     text: str
 
 
-@dataclass
+@dataclass(slots=True)
 class TwitterTweetData:
     """Dataclass to hold twitter post data.
 
@@ -46,7 +70,7 @@ class TwitterTweetData:
     text: str
 
 
-@dataclass
+@dataclass(slots=True)
 class SocialMediaData:
     """Dataclass to hold social media data.
 
@@ -61,12 +85,97 @@ class SocialMediaData:
 
 
 class SocialETL(ABC):
+    source: str
+
+    def __init__(
+        self,
+        watermark_store: Optional[WatermarkStore] = None,
+        cache: Optional[ResponseCache] = None,
+        dedup_index: Optional[DedupIndex] = None,
+        sinks: Optional[List['ColumnarSink']] = None,
+    ) -> None:
+        """Class to ETL social media posts.
+
+        Args:
+            watermark_store (Optional[WatermarkStore], optional): When set,
+                only items newer than the stored high-water marks are
+                extracted, and the marks are advanced after each load.
+                Defaults to None.
+            cache (Optional[ResponseCache], optional): Cache in front of the
+                API calls that rarely change between runs. Defaults to None.
+            dedup_index (Optional[DedupIndex], optional): When set, posts
+                loaded by earlier runs are dropped right after extract, and
+                the ids of loaded posts are added to it. Defaults to None.
+            sinks (Optional[List[ColumnarSink]], optional): Columnar sinks
+                the inserted and updated posts are written to, in the same
+                pass as the database. Defaults to None.
+        """
+        self._watermark_store = watermark_store
+        self._pending_watermarks: Dict[str, Watermark] = {}
+        self._cache = cache
+        self._dedup_index = dedup_index
+        self._loaded_ids: List[str] = []
+        self._sinks = sinks or []
+
+    def _cached(self, endpoint: str, key: str, fetch: Callable[[], T]) -> T:
+        if self._cache is None:
+            return fetch()
+        return self._cache.get_or_fetch(endpoint, key, fetch)
+
+    def _get_watermarks(self, target_ids: List[str]) -> Dict[str, Watermark]:
+        if self._watermark_store is None:
+            return {}
+        return self._watermark_store.get_many(self.source, target_ids)
+
+    def _commit_progress(self) -> None:
+        if self._watermark_store is not None:
+            self._watermark_store.set_many(
+                self.source, self._pending_watermarks
+            )
+        if self._dedup_index is not None:
+            self._dedup_index.add(self._loaded_ids)
+        self._pending_watermarks = {}
+        self._loaded_ids = []
+
+    def dedup(
+        self, social_data: Iterable[SocialMediaData]
+    ) -> Iterable[SocialMediaData]:
+        """Function to drop the posts loaded by earlier runs, when the ETL
+        has a dedup_index."""
+        if self._dedup_index is None:
+            return social_data
+        return self._dedup_index.filter(social_data)
+
+    def _track_loaded(
+        self, social_data: Iterable[SocialMediaData]
+    ) -> Iterable[SocialMediaData]:
+        # collects the ids passed to load, for load_and_commit
+        if self._dedup_index is None:
+            return social_data
+        if isinstance(social_data, list):
+            self._loaded_ids.extend(post.id for post in social_data)
+            return social_data
+        return self._iter_tracked(social_data)
+
+    def _iter_tracked(
+        self, social_data: Iterable[SocialMediaData]
+    ) -> Iterator[SocialMediaData]:
+        for post in social_data:
+            self._loaded_ids.append(post.id)
+            yield post
+
     @abstractmethod
     def extract(
         self, id: str, num_records: int, client
     ) -> List[SocialMediaData]:
         pass
 
+    @abstractmethod
+    def extract_stream(
+        self, id: str, num_records: int, client
+    ) -> Iterator[SocialMediaData]:
+        pass
+
     @abstractmethod
     def transform(
         self,
@@ -82,7 +191,8 @@ class SocialETL(ABC):
         self,
         social_data: List[SocialMediaData],
         db_cursor_context: DatabaseConnection,
-    ) -> None:
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> LoadStats:
         pass
 
     @abstractmethod
@@ -95,17 +205,206 @@ class SocialETL(ABC):
         ],
         id: str,
         num_records: int,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_BATCH_SIZE,
+        metrics: Optional[RunMetrics] = None,
     ):
         pass
 
+    def extract_transform(
+        self,
+        client,
+        transform_function: Callable[
+            [List[SocialMediaData]], List[SocialMediaData]
+        ],
+        id: str,
+        num_records: int,
+        stream: bool = False,
+        metrics: Optional[RunMetrics] = None,
+    ) -> Iterable[SocialMediaData]:
+        """Function to chain extract, dedup and transform, the stages of a
+        run before load.
+
+        When stream is set, extract yields records lazily, so
+        transform_function must accept an iterator (see
+        transform.windowed_transformation). When metrics is set, each stage
+        is measured into it.
+
+        Returns:
+            Iterable[SocialMediaData]: The records to pass to
+                load_and_commit, a list unless stream is set.
+        """
+        metrics = metrics or RunMetrics()
+        metrics.source = metrics.source or self.source
+        metrics.target_id = metrics.target_id or id
+        extract = self.extract_stream if stream else self.extract
+        with metrics.stage('extract'):
+            social_data = metrics.timed(
+                'extract',
+                extract(id=id, num_records=num_records, client=client),
+            )
+        if self._dedup_index is not None:
+            with metrics.stage('dedup'):
+                social_data = metrics.timed('dedup', self.dedup(social_data))
+        with metrics.stage('transform'):
+            return self.transform(
+                social_data=social_data,
+                transform_function=transform_function,
+            )
+
+    def load_and_commit(
+        self,
+        social_data: Iterable[SocialMediaData],
+        db_cursor_context: DatabaseConnection,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        metrics: Optional[RunMetrics] = None,
+    ) -> LoadStats:
+        """Function to load the records returned by extract_transform, then
+        advance the watermarks and add the loaded ids to the dedup index.
+        The progress is only committed once the records are loaded, so a
+        failed run is extracted again by the next one.
+
+        Returns:
+            LoadStats: Rows inserted, updated and skipped.
+        """
+        metrics = metrics or RunMetrics()
+        with metrics.stage('load') as load_metrics:
+            stats = self.load(
+                social_data=metrics.timed('transform', social_data),
+                db_cursor_context=db_cursor_context,
+                batch_size=batch_size,
+            )
+        load_metrics.records_out = stats.written
+        load_metrics.bytes_written = stats.bytes
+        metrics.chain()
+        self._commit_progress()
+        return stats
+
+    def _run_pipeline(
+        self,
+        db_cursor_context: DatabaseConnection,
+        client,
+        transform_function: Callable[
+            [List[SocialMediaData]], List[SocialMediaData]
+        ],
+        id: str,
+        num_records: int,
+        stream: bool,
+        chunk_size: int,
+        metrics: Optional[RunMetrics] = None,
+    ) -> None:
+        """Function to chain extract, transform and load.
+
+        When stream is set, extract yields records lazily and load writes
+        them chunk_size at a time, so transform_function must accept an
+        iterator (see transform.windowed_transformation). When metrics is
+        set, each stage is measured into it.
+        """
+        metrics = metrics or RunMetrics()
+        social_data = self.extract_transform(
+            client=client,
+            transform_function=transform_function,
+            id=id,
+            num_records=num_records,
+            stream=stream,
+            metrics=metrics,
+        )
+        self.load_and_commit(
+            social_data=social_data,
+            db_cursor_context=db_cursor_context,
+            batch_size=chunk_size,
+            metrics=metrics,
+        )
+        logging.info(f'Run {metrics.run_id} stages:\n{metrics.format()}')
+
+
+# reddit listings RedditETL can page through, and the most posts reddit
+# returns per page
+REDDIT_LISTINGS = ('hot', 'new', 'top')
+REDDIT_MAX_PAGE_SIZE = 100
+
 
 class RedditETL(SocialETL):
+    source = 'reddit'
+
+    def __init__(
+        self,
+        listing: str = 'hot',
+        page_size: int = REDDIT_MAX_PAGE_SIZE,
+        time_filter: str = 'all',
+        prefetch_pages: bool = True,
+        resume: bool = False,
+        rate_limiter: Optional[TokenBucket] = None,
+        watermark_store: Optional[WatermarkStore] = None,
+        cache: Optional[ResponseCache] = None,
+        dedup_index: Optional[DedupIndex] = None,
+        sinks: Optional[List['ColumnarSink']] = None,
+    ) -> None:
+        """Class to ETL posts from a subreddit listing, one page of
+        page_size posts at a time.
+
+        Args:
+            listing (str, optional): Listing to page through, one of
+                REDDIT_LISTINGS. Defaults to 'hot'.
+            page_size (int, optional): Posts per API request, at most
+                REDDIT_MAX_PAGE_SIZE. Defaults to REDDIT_MAX_PAGE_SIZE.
+            time_filter (str, optional): Time filter of the 'top' listing,
+                e.g. 'day' or 'all'. Defaults to 'all'.
+            prefetch_pages (bool, optional): Fetch the next page while the
+                current one is converted. Defaults to True.
+            resume (bool, optional): Start from the listing cursor saved by
+                the previous run instead of the top of the listing, and save
+                the cursor reached once loaded, so consecutive runs page
+                deeper into the listing. Needs watermark_store.
+                Defaults to False.
+            rate_limiter (Optional[TokenBucket], optional): Bucket every
+                listing page request acquires a token from.
+                Defaults to None.
+            watermark_store (Optional[WatermarkStore], optional): Store of
+                the high-water marks and listing cursors. Defaults to None.
+            cache (Optional[ResponseCache], optional): Cache of listing
+                pages, keyed by subreddit, listing and cursor.
+                Defaults to None.
+            dedup_index (Optional[DedupIndex], optional): Index of the ids
+                loaded by earlier runs, to drop them after extract.
+                Defaults to None.
+            sinks (Optional[List[ColumnarSink]], optional): Columnar sinks
+                fed by load. Defaults to None.
+        """
+        super().__init__(
+            watermark_store=watermark_store,
+            cache=cache,
+            dedup_index=dedup_index,
+            sinks=sinks,
+        )
+        if listing not in REDDIT_LISTINGS:
+            raise ValueError(
+                f'Listing {listing} is not supported. Please pass one of'
+                f' {", ".join(REDDIT_LISTINGS)}.'
+            )
+        if not 0 < page_size <= REDDIT_MAX_PAGE_SIZE:
+            raise ValueError(
+                f'page_size must be between 1 and {REDDIT_MAX_PAGE_SIZE},'
+                f' got {page_size}.'
+            )
+        if resume and watermark_store is None:
+            raise ValueError(
+                'resume needs a watermark_store to save the listing cursor.'
+                ' Please pass a valid WatermarkStore.'
+            )
+        self._listing = listing
+        self._page_size = page_size
+        self._time_filter = time_filter
+        self._prefetch_pages = prefetch_pages
+        self._resume = resume
+        self._rate_limiter = rate_limiter
+
     @log_metadata
     def extract(
         self,
         id: str,
         num_records: int,
-        client: praw.Reddit,
+        client: 'praw.Reddit',
     ) -> List[SocialMediaData]:
         """Get reddit data from a subreddit.
 
@@ -117,31 +416,148 @@ class RedditETL(SocialETL):
             List[RedditPostData]: List of reddit post data.
         """
         logging.info('Extracting reddit data.')
+        return list(self._iter_social_data(id, num_records, client))
+
+    @log_metadata
+    def extract_stream(
+        self,
+        id: str,
+        num_records: int,
+        client: 'praw.Reddit',
+    ) -> Iterator[SocialMediaData]:
+        """Lazily get reddit data from a subreddit, one post at a time.
+
+        Args:
+            id (str): Subreddit to get data from.
+            num_records (int): Number of records to get.
+
+        Returns:
+            Iterator[SocialMediaData]: Iterator of reddit post data.
+        """
+        logging.info('Streaming reddit data.')
+        return self._iter_social_data(id, num_records, client)
+
+    def _iter_social_data(
+        self,
+        id: str,
+        num_records: int,
+        client: 'praw.Reddit',
+    ) -> Iterator[SocialMediaData]:
         if client is None:
             raise ValueError(
                 'reddit object is None. Please pass a valid praw.Reddit'
                 ' object.'
             )
+        return self._iter_submissions(id, num_records, client)
 
-        subreddit = client.subreddit(id)
-        top_subreddit = subreddit.hot(limit=num_records)
-        reddit_data = []
-        for submission in top_subreddit:
-            reddit_data.append(
-                SocialMediaData(
-                    id=submission.id,
-                    source='reddit',
-                    social_data=RedditPostData(
-                        title=submission.title,
-                        score=submission.score,
-                        url=submission.url,
-                        comms_num=submission.num_comments,
-                        created=str(submission.created),
-                        text=submission.selftext,
-                    ),
-                )
+    def _iter_submissions(
+        self,
+        id: str,
+        num_records: int,
+        client: 'praw.Reddit',
+    ) -> Iterator[SocialMediaData]:
+        # the listing cursor is kept next to the watermark, as the last_id
+        # of a '<subreddit>:<listing>' target
+        cursor_id = f'{id}:{self._listing}'
+        watermarks = self._get_watermarks([id, cursor_id])
+        watermark = watermarks.get(id, Watermark())
+        after = watermarks.get(cursor_id, Watermark()).last_id
+        # only the 'new' listing is ordered by creation time; a post can
+        # reach hot or top long after it was created, so those listings
+        # rely on the content hash skip of the loader instead. A resumed
+        # run pages on into older posts, which the watermark of the newest
+        # post would all drop.
+        by_created = self._listing == 'new'
+        last_created = (
+            watermark.last_created
+            if by_created and not self._resume
+            else None
+        )
+        newest = watermark.last_created
+        pages = self._iter_pages(
+            id, client, after if self._resume else None, num_records
+        )
+        # the pages are fetched on a new thread per extraction, whose pooled
+        # cache connection is closed once the listing is done
+        release = self._cache.release_thread if self._cache else None
+        for page, after in prefetch(
+            pages, depth=int(self._prefetch_pages), on_exit=release
+        ):
+            for post in page:
+                created = float(post.social_data.created)  # type: ignore
+                if last_created is not None and created <= last_created:
+                    continue
+                if by_created:
+                    newest = max(newest or created, created)
+                yield post
+        if self._resume:
+            self._pending_watermarks[cursor_id] = Watermark(last_id=after)
+        if newest != watermark.last_created:
+            self._pending_watermarks[id] = Watermark(last_created=newest)
+
+    def _iter_pages(
+        self,
+        id: str,
+        client: 'praw.Reddit',
+        after: Optional[str],
+        num_records: int,
+    ) -> Iterator[Tuple[List[SocialMediaData], Optional[str]]]:
+        """Function to page through the listing of a subreddit, starting
+        after the post whose fullname is the after cursor.
+
+        Yields:
+            Tuple[List[SocialMediaData], Optional[str]]: A page of posts and
+                the cursor of the next page, None once the listing is
+                exhausted.
+        """
+        while num_records > 0:
+            limit = min(self._page_size, num_records)
+            page = self._cached(
+                'reddit.listing',
+                f'{id}|{self._listing}|{self._time_filter}|{after}|{limit}',
+                lambda: self._fetch_page(id, client, after, limit),
             )
-        return reddit_data
+            num_records -= len(page)
+            # the fullname of a submission is its id prefixed with t3_
+            after = f't3_{page[-1].id}' if len(page) == limit else None
+            yield page, after
+            if after is None:
+                return
+
+    def _fetch_page(
+        self,
+        id: str,
+        client: 'praw.Reddit',
+        after: Optional[str],
+        limit: int,
+    ) -> List[SocialMediaData]:
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+        listing = getattr(client.subreddit(id), self._listing)
+        options = (
+            {'time_filter': self._time_filter}
+            if self._listing == 'top'
+            else {}
+        )
+        return [
+            SocialMediaData(
+                id=submission.id,
+                source='reddit',
+                social_data=RedditPostData(
+                    title=submission.title,
+                    score=submission.score,
+                    url=submission.url,
+                    comms_num=submission.num_comments,
+                    created=str(submission.created),
+                    text=submission.selftext,
+                ),
+            )
+            for submission in listing(
+                limit=limit,
+                params={'after': after} if after else {},
+                **options,
+            )
+        ]
 
     @log_metadata
     def transform(
@@ -169,35 +585,24 @@ class RedditETL(SocialETL):
         self,
         social_data: List[SocialMediaData],
         db_cursor_context: DatabaseConnection,
-    ) -> None:
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> LoadStats:
         """Function to load data into a database.
 
         Args:
             reddit_data (List[RedditPostData]): List of reddit post data.
+            batch_size (int): Number of rows written per transaction.
+
+        Returns:
+            LoadStats: Rows inserted, updated and skipped.
         """
         logging.info('Loading reddit data.')
-        if db_cursor_context is None:
-            raise ValueError(
-                'db_cursor is None. Please pass a valid DatabaseConnection'
-                ' object.'
-            )
-
-        with db_cursor_context as cur:
-            for post in social_data:
-                cur.execute(
-                    """
-                    INSERT OR REPLACE INTO social_posts (
-                        id, source, social_data
-                    ) VALUES (
-                        :id, :source, :social_data
-                    )
-                    """,
-                    {
-                        'id': post.id,
-                        'source': post.source,
-                        'social_data': str(asdict(post.social_data)),
-                    },
-                )
+        return bulk_load(
+            self._track_loaded(social_data),
+            db_cursor_context,
+            batch_size=batch_size,
+            sinks=self._sinks,
+        )
 
     def run(
         self,
@@ -208,6 +613,9 @@ class RedditETL(SocialETL):
         ],
         id: str = 'dataengineering',
         num_records: int = 100,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_BATCH_SIZE,
+        metrics: Optional[RunMetrics] = None,
     ):
         """Function to run the ETL pipeline.
 
@@ -216,71 +624,199 @@ class RedditETL(SocialETL):
             client (praw.Reddit): Reddit client.
             id (str): Subreddit to get data from.
             num_records (int): Number of records to get.
+            stream (bool): Stream records through the pipeline instead of
+                materializing a list per stage.
+            chunk_size (int): Number of records loaded per transaction.
+            metrics (Optional[RunMetrics]): Collects the time, records and
+                memory of each stage of the run.
         """
         logging.info('Running reddit ETL.')
-        self.load(
-            social_data=self.transform(
-                social_data=self.extract(
-                    id=id, num_records=num_records, client=client
-                ),
-                transform_function=transform_function,
-            ),
+        self._run_pipeline(
             db_cursor_context=db_cursor_context,
+            client=client,
+            transform_function=transform_function,
+            id=id,
+            num_records=num_records,
+            stream=stream,
+            chunk_size=chunk_size,
+            metrics=metrics,
         )
 
 
 class TwitterETL(SocialETL):
+    source = 'twitter'
+
+    def __init__(
+        self,
+        max_workers: int = 1,
+        rate_limiter: Optional[TokenBucket] = None,
+        watermark_store: Optional[WatermarkStore] = None,
+        cache: Optional[ResponseCache] = None,
+        dedup_index: Optional[DedupIndex] = None,
+        sinks: Optional[List['ColumnarSink']] = None,
+    ) -> None:
+        """Class to ETL tweets from the accounts a user follows.
+
+        Args:
+            max_workers (int, optional): Number of timelines fetched
+                concurrently. Defaults to 1 (sequential).
+            rate_limiter (Optional[TokenBucket], optional): Bucket every
+                timeline request waits on, to stay under the API quota.
+                Defaults to None.
+            watermark_store (Optional[WatermarkStore], optional): When set,
+                only tweets newer than the last one loaded per followed
+                user are requested (since_id). Defaults to None.
+            cache (Optional[ResponseCache], optional): Cache of the user id
+                and following list lookups. Defaults to None.
+            dedup_index (Optional[DedupIndex], optional): Index of the ids
+                loaded by earlier runs, to drop them after extract.
+                Defaults to None.
+            sinks (Optional[List[ColumnarSink]], optional): Columnar sinks
+                fed by load. Defaults to None.
+        """
+        super().__init__(
+            watermark_store=watermark_store,
+            cache=cache,
+            dedup_index=dedup_index,
+            sinks=sinks,
+        )
+        if max_workers < 1:
+            raise ValueError(
+                f'max_workers must be positive, got {max_workers}.'
+            )
+        self._max_workers = max_workers
+        self._rate_limiter = rate_limiter
+
     @log_metadata
     def extract(
         self,
         id: str,
         num_records: int,
-        client: tweepy.API,
+        client: 'tweepy.API',
     ) -> List[SocialMediaData]:
         logging.info("Extracting twitter data.")
+        return list(self._iter_social_data(id, num_records, client))
+
+    @log_metadata
+    def extract_stream(
+        self,
+        id: str,
+        num_records: int,
+        client: 'tweepy.API',
+    ) -> Iterator[SocialMediaData]:
+        """Lazily get tweets from the users that id follows. Timelines
+        are only requested until num_records tweets have been yielded.
+
+        Args:
+            id (str): Twitter username whose following list is read.
+            num_records (int): Number of records to get.
+
+        Returns:
+            Iterator[SocialMediaData]: Iterator of twitter post data.
+        """
+        logging.info("Streaming twitter data.")
+        return self._iter_social_data(id, num_records, client)
+
+    def _iter_social_data(
+        self,
+        id: str,
+        num_records: int,
+        client: 'tweepy.API',
+    ) -> Iterator[SocialMediaData]:
         # if twitter client is None, raise an error
         if client is None:
             raise ValueError(
                 "twitter object is None. Please pass a valid tweepy.Tweet"
                 " object."
             )
+        return islice(self._iter_tweets(id, client), num_records)
 
+    def _iter_tweets(
+        self, id: str, client: 'tweepy.API'
+    ) -> Iterator[SocialMediaData]:
         # given user name, get user id with tweepy
-        user_id = client.get_user(username=id).data.id
+        user_id = self._cached(
+            'twitter.get_user',
+            id,
+            lambda: client.get_user(username=id).data.id,
+        )
         # get list of users the user_id is following with tweepy
-        user_ids_to_follow = [
-            str(u.id) for u in client.get_users_following(id=user_id).data
-        ]
+        user_ids_to_follow = self._cached(
+            'twitter.get_users_following',
+            str(user_id),
+            lambda: [
+                str(u.id)
+                for u in client.get_users_following(id=user_id).data
+            ],
+        )
         start_time = (datetime.now() - timedelta(days=1)).strftime(
             "%Y-%m-%dT%H:%M:%SZ"
         )
-        list_of_tweets = [
-            client.get_users_tweets(
-                id=user_id,
-                exclude="retweets,replies",
-                start_time=start_time,
-                tweet_fields="id,text,author_id,created_at",
-            ).data
-            for user_id in user_ids_to_follow
-        ]
-        list_of_tweets = [t for t in list_of_tweets if t is not None]
-        # flatten list of tweets
-        list_of_tweets = [
-            tweet
-            for tweet_list in list_of_tweets
-            for tweet in tweet_list
-            if tweet_list is not None
-        ]
-        # convert list of tweets to list of TwitterTweetData
-        list_of_tweets = [
+        watermarks = self._get_watermarks(user_ids_to_follow)
+        timelines = bounded_map(
+            lambda user_id: self._get_users_tweets(
+                client,
+                start_time,
+                user_id,
+                since_id=watermarks.get(user_id, Watermark()).last_id,
+            ),
+            user_ids_to_follow,
+            max_workers=self._max_workers,
+        )
+        for user_id, tweets in zip(user_ids_to_follow, timelines):
+            if not tweets:
+                continue
+            yield from tweets[:-1]
+            # set right before the last tweet is yielded, as islice may never
+            # resume the generator after it; tweets cut off by num_records
+            # before that are requested again by the next run
+            if self._watermark_store is not None:
+                newest = max(tweets, key=lambda tweet: int(tweet.id))
+                self._pending_watermarks[user_id] = Watermark(
+                    last_id=str(newest.id)
+                )
+            yield tweets[-1]
+
+    def _get_users_tweets(
+        self,
+        client: 'tweepy.API',
+        start_time: str,
+        user_id: str,
+        since_id: Optional[str] = None,
+    ) -> List[SocialMediaData]:
+        return self._cached(
+            'twitter.get_users_tweets',
+            f'{user_id}|{since_id}',
+            lambda: self._fetch_users_tweets(
+                client, start_time, user_id, since_id
+            ),
+        )
+
+    def _fetch_users_tweets(
+        self,
+        client: 'tweepy.API',
+        start_time: str,
+        user_id: str,
+        since_id: Optional[str],
+    ) -> List[SocialMediaData]:
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+        tweets = client.get_users_tweets(
+            id=user_id,
+            exclude="retweets,replies",
+            start_time=start_time,
+            since_id=since_id,
+            tweet_fields="id,text,author_id,created_at",
+        ).data
+        # users without tweets in the window return no data
+        return [
             SocialMediaData(
                 id=tweet.id,
                 source='twitter',
                 social_data=TwitterTweetData(text=tweet.text),
             )
-            for tweet in list_of_tweets
+            for tweet in tweets or []
         ]
-        return list_of_tweets[:num_records]
 
     @log_metadata
     def transform(
@@ -308,35 +844,24 @@ class TwitterETL(SocialETL):
         self,
         social_data: List[SocialMediaData],
         db_cursor_context: DatabaseConnection,
-    ) -> None:
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> LoadStats:
         """Function to load data into a database.
 
         Args:
             social_data (List[SocialMediaData]): List of twitter post data.
+            batch_size (int): Number of rows written per transaction.
+
+        Returns:
+            LoadStats: Rows inserted, updated and skipped.
         """
         logging.info('Loading twitter data.')
-        if db_cursor_context is None:
-            raise ValueError(
-                'db_cursor is None. Please pass a valid DatabaseConnection'
-                ' object.'
-            )
-
-        with db_cursor_context as cur:
-            for post in social_data:
-                cur.execute(
-                    """
-                    INSERT OR REPLACE INTO social_posts (
-                        id, source, social_data
-                    ) VALUES (
-                        :id, :source, :social_data
-                    )
-                    """,
-                    {
-                        'id': post.id,
-                        'source': post.source,
-                        'social_data': str(asdict(post.social_data)),
-                    },
-                )
+        return bulk_load(
+            self._track_loaded(social_data),
+            db_cursor_context,
+            batch_size=batch_size,
+            sinks=self._sinks,
+        )
 
     def run(
         self,
@@ -347,6 +872,9 @@ class TwitterETL(SocialETL):
         ],
         id: str = 'startdataeng',
         num_records: int = 100,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_BATCH_SIZE,
+        metrics: Optional[RunMetrics] = None,
     ):
         """Function to run the ETL pipeline.
 
@@ -355,37 +883,162 @@ class TwitterETL(SocialETL):
             client (tweepy.Twitter): Twitter client.
             id (str): Subreddit to get data from.
             num_records (int): Number of records to get.
+            stream (bool): Stream records through the pipeline instead of
+                materializing a list per stage.
+            chunk_size (int): Number of records loaded per transaction.
+            metrics (Optional[RunMetrics]): Collects the time, records and
+                memory of each stage of the run.
         """
         logging.info('Running twitter ETL.')
-        self.load(
-            social_data=self.transform(
-                social_data=self.extract(
-                    id=id, num_records=num_records, client=client
-                ),
-                transform_function=transform_function,
-            ),
+        self._run_pipeline(
             db_cursor_context=db_cursor_context,
+            client=client,
+            transform_function=transform_function,
+            id=id,
+            num_records=num_records,
+            stream=stream,
+            chunk_size=chunk_size,
+            metrics=metrics,
         )
 
 
-def etl_factory(source: str) -> Tuple[praw.Reddit | tweepy.Client, SocialETL]:
-    factory = {
-        'reddit': (
-            praw.Reddit(
-                client_id=os.environ['REDDIT_CLIENT_ID'],
-                client_secret=os.environ['REDDIT_CLIENT_SECRET'],
-                user_agent=os.environ['REDDIT_USER_AGENT'],
-            ),
-            RedditETL(),
-        ),
-        'twitter': (
-            tweepy.Client(bearer_token=os.environ['BEARER_TOKEN']),
-            TwitterETL(),
-        ),
-    }
-    if source in factory:
-        return factory[source]
-    else:
+def reddit_client() -> 'praw.Reddit':
+    """Function to build a Reddit client from the REDDIT_* env vars. praw
+    is imported here so that only runs that ETL reddit pay for it."""
+    import praw
+
+    return praw.Reddit(
+        client_id=os.environ['REDDIT_CLIENT_ID'],
+        client_secret=os.environ['REDDIT_CLIENT_SECRET'],
+        user_agent=os.environ['REDDIT_USER_AGENT'],
+    )
+
+
+def twitter_client() -> 'tweepy.Client':
+    """Function to build a Twitter client from the BEARER_TOKEN env var.
+    tweepy is imported here so that only runs that ETL twitter pay for
+    it."""
+    import tweepy
+
+    return tweepy.Client(bearer_token=os.environ['BEARER_TOKEN'])
+
+
+def reddit_etl(
+    max_workers: int = 1,
+    rate_limiter: Optional[TokenBucket] = None,
+    watermark_store: Optional[WatermarkStore] = None,
+    cache: Optional[ResponseCache] = None,
+    dedup_index: Optional[DedupIndex] = None,
+    sinks: Optional[List['ColumnarSink']] = None,
+    **options: Any,
+) -> RedditETL:
+    if max_workers != 1:
+        raise ValueError(
+            'reddit pages through a listing one request at a time. Please'
+            ' pass max_workers=1, or rate limit it with requests_per_second.'
+        )
+    return RedditETL(
+        rate_limiter=rate_limiter,
+        watermark_store=watermark_store,
+        cache=cache,
+        dedup_index=dedup_index,
+        sinks=sinks,
+        **options,
+    )
+
+
+def twitter_etl(
+    max_workers: int = 1,
+    rate_limiter: Optional[TokenBucket] = None,
+    watermark_store: Optional[WatermarkStore] = None,
+    cache: Optional[ResponseCache] = None,
+    dedup_index: Optional[DedupIndex] = None,
+    sinks: Optional[List['ColumnarSink']] = None,
+) -> TwitterETL:
+    return TwitterETL(
+        max_workers=max_workers,
+        rate_limiter=rate_limiter,
+        watermark_store=watermark_store,
+        cache=cache,
+        dedup_index=dedup_index,
+        sinks=sinks,
+    )
+
+
+# source name to the builders of its API client and ETL object; builders
+# only run for the source being ETLed
+SOURCE_REGISTRY: Dict[
+    str, Tuple[Callable[[], Any], Callable[..., SocialETL]]
+] = {
+    'reddit': (reddit_client, reddit_etl),
+    'twitter': (twitter_client, twitter_etl),
+}
+
+
+def register_source(
+    source: str,
+    client_builder: Callable[[], Any],
+    etl_builder: Callable[..., SocialETL],
+) -> None:
+    """Function to add (or replace) a source of etl_factory.
+
+    Args:
+        source (str): Source name.
+        client_builder (Callable[[], Any]): Function returning the API
+            client of the source.
+        etl_builder (Callable[..., SocialETL]): Function taking the
+            max_workers, rate_limiter, watermark_store, cache,
+            dedup_index and sinks keyword arguments (plus any source
+            specific options) and returning the ETL object of the source.
+    """
+    SOURCE_REGISTRY[source] = (client_builder, etl_builder)
+
+
+def etl_factory(
+    source: str,
+    max_workers: int = 1,
+    requests_per_second: Optional[float] = None,
+    watermark_store: Optional[WatermarkStore] = None,
+    cache: Optional[ResponseCache] = None,
+    dedup_index: Optional[DedupIndex] = None,
+    sinks: Optional[List['ColumnarSink']] = None,
+    **options: Any,
+) -> Tuple[Any, SocialETL]:
+    """Factory function to return the API client and ETL object of a source.
+
+    Args:
+        source (str): Source to ETL, one of SOURCE_REGISTRY.
+        max_workers (int, optional): Number of concurrent API calls, for
+            sources that support it (twitter). Defaults to 1.
+        requests_per_second (Optional[float], optional): Rate limit of the
+            API calls. Defaults to None (no limit).
+        watermark_store (Optional[WatermarkStore], optional): Store of
+            high-water marks for incremental extraction. Defaults to None.
+        cache (Optional[ResponseCache], optional): Cache in front of the
+            API calls of the source. Defaults to None.
+        dedup_index (Optional[DedupIndex], optional): Index of the posts
+            loaded by earlier runs, dropped after extract. Defaults to None.
+        sinks (Optional[List[ColumnarSink]], optional): Columnar sinks the
+            loaded posts are also written to. Defaults to None.
+        **options: Source specific keyword arguments of the ETL object,
+            e.g. listing='new' for reddit.
+    """
+    if source not in SOURCE_REGISTRY:
         raise ValueError(
             f"source {source} is not supported. Please pass a valid source."
         )
+    client_builder, etl_builder = SOURCE_REGISTRY[source]
+    rate_limiter = (
+        TokenBucket(rate=requests_per_second)
+        if requests_per_second
+        else None
+    )
+    return client_builder(), etl_builder(
+        max_workers=max_workers,
+        rate_limiter=rate_limiter,
+        watermark_store=watermark_store,
+        cache=cache,
+        dedup_index=dedup_index,
+        sinks=sinks,
+        **options,
+    )
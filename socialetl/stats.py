@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class RunningStats:
+    """Dataclass to hold the running mean and variance of a stream of
+    numbers, updated in a single pass with Welford's algorithm, which stays
+    numerically stable where sum / sum of squares would not.
+
+    Args:
+        count (int): Number of values seen.
+        mean (float): Mean of the values seen.
+        m2 (float): Sum of squared differences from the mean.
+    """
+
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Population variance, like numpy.var and the list based filter."""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return self.variance**0.5
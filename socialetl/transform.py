@@ -1,8 +1,31 @@
 import logging
-import random
-from typing import Callable, List
+from array import array
+from functools import partial, update_wrapper
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
 
+from batch import SocialMediaBatch
+from sampling import reservoir_sample, stratified_sample
 from social_etl import RedditPostData, SocialMediaData
+from stats import RunningStats
+from utils.iterables import batched
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# transformations that consume an iterator in a single pass with bounded
+# memory and can therefore be applied to a stream as is
+STREAMING_TRANSFORMATIONS = {'no_tx', 'sd_stream', 'rand', 'sample', 'strat'}
+
+# RedditPostData fields the standard deviation filters can compare
+NUMERIC_FIELDS = ('comms_num', 'score')
 
 
 def no_transformation(
@@ -13,74 +36,212 @@ def no_transformation(
 
 
 def random_choice_filter(
-    social_data: List[SocialMediaData],
+    social_data: Iterable[SocialMediaData],
+    k: int = 2,
+    seed: Optional[int] = None,
 ) -> List[SocialMediaData]:
-    """Function to filter social media data, by only keeping the
-    posts with number of comments greater than 2 standard deviations
-    away from the mean number of comments.
+    """Function to filter social media data, by only keeping k randomly
+    chosen posts. Posts are chosen without replacement with a reservoir
+    sample, so the input is read once and may be a stream.
 
     Args:
-        social_data (List[SocialMediaData]): List of social media post data.
+        social_data (Iterable[SocialMediaData]): Social media post data.
+        k (int, optional): Number of posts to keep. Defaults to 2.
+        seed (Optional[int], optional): Seed that makes the choice
+            reproducible. Defaults to None.
 
     Returns:
         List[SocialMediaData]: Filtered list of social media post data.
     """
-    logging.info('Randomly choosing 2 social media data points.')
-    return random.choices(social_data, k=2)
+    logging.info(f'Randomly choosing {k} social media data points.')
+    return reservoir_sample(social_data, k=k, seed=seed)
+
+
+def numeric_field(field: str) -> str:
+    """Function to check that field is one of NUMERIC_FIELDS."""
+    if field not in NUMERIC_FIELDS:
+        raise ValueError(
+            f'Field {field} is not supported. Please pass one of'
+            f' {", ".join(NUMERIC_FIELDS)}.'
+        )
+    return field
+
+
+def _field_values(
+    social_data: List[SocialMediaData] | SocialMediaBatch, field: str
+) -> 'np.ndarray':
+    # numpy is only imported by the runs using the batch sd filter
+    import numpy as np
+
+    if isinstance(social_data, SocialMediaBatch):
+        column = social_data.column(field)
+        # array('q') columns are viewed in place instead of copied
+        if isinstance(column, array):
+            return np.frombuffer(column, dtype=np.int64)
+        return np.asarray(column)
+    return np.fromiter(
+        (getattr(post.social_data, field) for post in social_data),
+        dtype=np.float64,
+        count=len(social_data),
+    )
 
 
 def standard_deviation_outlier_filter(
-    social_data: List[SocialMediaData],
-) -> List[SocialMediaData]:
+    social_data: List[SocialMediaData] | SocialMediaBatch,
+    field: str = 'comms_num',
+    k: float = 2.0,
+) -> List[SocialMediaData] | SocialMediaBatch:
     """Function to filter social media data, by only keeping the
-    posts with number of comments greater than 2 standard deviations
-    away from the mean number of comments.
+    posts with a field (by default the number of comments) greater than
+    k standard deviations away from the mean of that field.
 
     Args:
-        social_data (List[SocialMediaData]): List of social media post data.
+        social_data (List[SocialMediaData] | SocialMediaBatch): List or
+            columnar batch of social media post data.
+        field (str, optional): RedditPostData field to compare, one of
+            NUMERIC_FIELDS. Defaults to 'comms_num'.
+        k (float, optional): Number of standard deviations above the mean
+            a post must be to be kept. Defaults to 2.0.
 
     Returns:
-        List[SocialMediaData]: Filtered list of social media post data.
+        List[SocialMediaData] | SocialMediaBatch: Filtered social media post
+            data, of the same container type as social_data.
     """
     logging.info(
         'Filtering social media data based on Standard Deviation Outlier'
         ' algorithm.'
     )
+    numeric_field(field)
+    if not len(social_data):
+        return social_data
     # check if social data is an instance of RedditPostData
-    if not isinstance(social_data[0].social_data, RedditPostData):
+    if isinstance(social_data, SocialMediaBatch):
+        is_reddit = social_data.social_data_type is RedditPostData
+    else:
+        is_reddit = isinstance(social_data[0].social_data, RedditPostData)
+    if not is_reddit:
         raise TypeError(
             'Social data for this standard_deviation_outlier_filter must be an'
             ' instance of RedditPostData.'
         )
-    num_comments = [
-        post.social_data.comms_num for post in social_data  # type: ignore
-    ]
-
-    mean_num_comments = sum(num_comments) / len(num_comments)
-    std_num_comments = (
-        sum([(x - mean_num_comments) ** 2 for x in num_comments])
-        / len(num_comments)
-    ) ** 0.5
-    return [
-        post
-        for post in social_data
-        if post.social_data.comms_num  # type: ignore
-        > mean_num_comments + 2 * std_num_comments
-    ]
+
+    values = _field_values(social_data, field)
+    (keep,) = (values > values.mean() + k * values.std()).nonzero()
+    if isinstance(social_data, SocialMediaBatch):
+        return social_data.take(keep.tolist())
+    return [social_data[idx] for idx in keep]
+
+
+def streaming_standard_deviation_outlier_filter(
+    social_data: Iterable[SocialMediaData],
+    field: str = 'comms_num',
+    k: float = 2.0,
+    warmup: int = 30,
+) -> Iterator[SocialMediaData]:
+    """Function to filter a stream of social media data in a single pass,
+    by keeping the posts with a field greater than k standard deviations
+    away from the running mean of the posts seen before them. This
+    approximates standard_deviation_outlier_filter without holding the
+    stream in memory; the first warmup posts only feed the statistics.
+
+    Args:
+        social_data (Iterable[SocialMediaData]): Social media post data.
+        field (str, optional): RedditPostData field to compare, one of
+            NUMERIC_FIELDS. Defaults to 'comms_num'.
+        k (float, optional): Number of standard deviations above the
+            running mean a post must be to be kept. Defaults to 2.0.
+        warmup (int, optional): Number of posts read before any post is
+            kept. Defaults to 30.
+
+    Yields:
+        SocialMediaData: The outlier posts.
+    """
+    logging.info(
+        'Filtering social media data based on streaming Standard Deviation'
+        ' Outlier algorithm.'
+    )
+    numeric_field(field)
+    stats = RunningStats()
+    for post in social_data:
+        if not isinstance(post.social_data, RedditPostData):
+            raise TypeError(
+                'Social data for this'
+                ' streaming_standard_deviation_outlier_filter must be an'
+                ' instance of RedditPostData.'
+            )
+        value = getattr(post.social_data, field)
+        if stats.count >= warmup and value > stats.mean + k * stats.std:
+            yield post
+        stats.update(value)
+
+
+def windowed_transformation(
+    transform_function: Callable[
+        [List[SocialMediaData]], List[SocialMediaData]
+    ],
+    window_size: int,
+) -> Callable[[Iterable[SocialMediaData]], Iterator[SocialMediaData]]:
+    """Function to apply a list based transformation to an iterator, one
+    window of window_size records at a time. Transformations that need
+    global statistics (e.g. the standard deviation filter) compute them
+    per window, which keeps memory bounded by window_size.
+
+    Args:
+        transform_function (Callable): Transformation over a list of
+            social media post data.
+        window_size (int): Number of records per window.
+
+    Returns:
+        Callable[[Iterable[SocialMediaData]], Iterator[SocialMediaData]]:
+            Transformation over an iterator of social media post data.
+    """
+
+    def windowed(
+        social_data: Iterable[SocialMediaData],
+    ) -> Iterator[SocialMediaData]:
+        for window in batched(social_data, window_size):
+            yield from transform_function(window)
+
+    windowed.__name__ = f'windowed_{transform_function.__name__}'
+    return windowed
 
 
 def transformation_factory(
     transformation_type: str,
+    window_size: Optional[int] = None,
+    **options: Any,
 ) -> Callable[[List[SocialMediaData]], List[SocialMediaData]]:
-    """Factory function to return the transformation function."""
+    """Factory function to return the transformation function.
+
+    Args:
+        transformation_type (str): Name of the transformation.
+        window_size (Optional[int], optional): When set, return a variant
+            that consumes an iterator window_size records at a time.
+            Defaults to None.
+        **options: Keyword arguments bound to the transformation, e.g.
+            field='score', k=3 for the standard deviation filters.
+    """
     factory = {
         'sd': standard_deviation_outlier_filter,
+        'sd_stream': streaming_standard_deviation_outlier_filter,
         'no_tx': no_transformation,
         'rand': random_choice_filter,
+        'sample': reservoir_sample,
+        'strat': stratified_sample,
     }
     if transformation_type not in factory:
         raise ValueError(
             f'Transformation type {transformation_type} is not supported.'
         )
 
-    return factory[transformation_type]
+    transform_function = factory[transformation_type]
+    if options:
+        transform_function = update_wrapper(
+            partial(transform_function, **options), transform_function
+        )
+    if (
+        window_size is None
+        or transformation_type in STREAMING_TRANSFORMATIONS
+    ):
+        return transform_function
+    return windowed_transformation(transform_function, window_size)
@@ -0,0 +1,96 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Deque, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def bounded_map(
+    func: Callable[[T], R], iterable: Iterable[T], max_workers: int
+) -> Iterator[R]:
+    """Function to lazily map func over iterable on a thread pool, keeping
+    at most max_workers calls in flight. Results are yielded in input
+    order, and closing the iterator early cancels the calls not yet
+    started.
+
+    Args:
+        func (Callable[[T], R]): Function to apply, usually an API call.
+        iterable (Iterable[T]): Inputs to func.
+        max_workers (int): Maximum number of concurrent calls. 1 runs the
+            calls sequentially on the calling thread.
+
+    Yields:
+        R: func(item) for each item of iterable.
+    """
+    if max_workers < 1:
+        raise ValueError(f'max_workers must be positive, got {max_workers}.')
+    if max_workers == 1:
+        yield from map(func, iterable)
+        return
+
+    items = iter(iterable)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending: Deque[Future] = deque(
+        executor.submit(func, item) for item in islice(items, max_workers)
+    )
+    try:
+        while pending:
+            result = pending.popleft().result()
+            # keep the pool full while the caller consumes result
+            for item in islice(items, 1):
+                pending.append(executor.submit(func, item))
+            yield result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def prefetch(
+    iterable: Iterable[T],
+    depth: int = 1,
+    on_exit: Optional[Callable[[], None]] = None,
+) -> Iterator[T]:
+    """Function to compute the next depth items of iterable on a background
+    thread while the caller processes the current one, e.g. to fetch the
+    next page of an API listing while converting the current page. Items
+    are computed one at a time, in order, so iterable may be a generator.
+
+    Args:
+        iterable (Iterable[T]): Items to prefetch, usually a generator
+            doing blocking I/O.
+        depth (int, optional): Number of items computed ahead. 0 iterates
+            on the calling thread. Defaults to 1.
+        on_exit (Optional[Callable[[], None]], optional): Function run on
+            the background thread once the iteration ends or is closed,
+            e.g. to release the connections it opened. Defaults to None.
+
+    Yields:
+        T: The items of iterable.
+    """
+    if depth < 0:
+        raise ValueError(f'depth must not be negative, got {depth}.')
+    if depth == 0:
+        yield from iterable
+        return
+
+    iterator = iter(iterable)
+    exhausted = object()
+    executor = ThreadPoolExecutor(max_workers=1)
+    pending: Deque[Future] = deque(
+        executor.submit(next, iterator, exhausted) for _ in range(depth)
+    )
+    try:
+        while True:
+            item = pending.popleft().result()
+            if item is exhausted:
+                return
+            pending.append(executor.submit(next, iterator, exhausted))
+            yield item
+    finally:
+        for future in pending:
+            future.cancel()
+        # queued behind a next call still running, on the same thread
+        if on_exit is not None:
+            executor.submit(on_exit)
+        executor.shutdown(wait=False)
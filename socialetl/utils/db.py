@@ -1,33 +1,505 @@
+import functools
+import io
+import os
+import re
 import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
 from contextlib import contextmanager
-from typing import Iterator
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# PRAGMAs applied on connect. All profiles use WAL so readers can query
+# social_posts while an ETL writes; they differ in durability and memory:
+# safe fsyncs every commit, balanced only at WAL checkpoints (a power loss
+# can drop the last commits but never corrupts the db) and bulk never
+# fsyncs, for backfills that can be rerun.
+PERFORMANCE_PROFILES: Dict[str, Dict[str, str | int]] = {
+    'safe': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -2_000,
+        'temp_store': 'DEFAULT',
+        'mmap_size': 0,
+    },
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64_000,
+        'temp_store': 'MEMORY',
+        'mmap_size': 268_435_456,
+    },
+    'bulk': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -256_000,
+        'temp_store': 'MEMORY',
+        'mmap_size': 1_073_741_824,
+    },
+}
+
+# The same profiles for the other backends, applied with SET on connect.
+# Postgres without synchronous_commit can lose the last commits on a crash
+# but is never corrupted, as SQLite with synchronous NORMAL; DuckDB
+# checkpoints its WAL (rewriting the changed row groups) less often.
+BACKEND_PROFILES: Dict[str, Dict[str, Dict[str, str]]] = {
+    'postgres': {
+        'safe': {'synchronous_commit': 'on'},
+        'balanced': {'synchronous_commit': 'off'},
+        'bulk': {'synchronous_commit': 'off'},
+    },
+    'duckdb': {
+        'safe': {},
+        'balanced': {'checkpoint_threshold': "'256MB'"},
+        'bulk': {'checkpoint_threshold': "'1GB'"},
+    },
+}
+
+
+# string literals, which are left as is, :name parameters (a : right
+# after another one is a Postgres cast) and ? placeholders
+PARAM_PATTERN = re.compile(r"'(?:[^']|'')*'|(?<![:\w]):([A-Za-z_]\w*)|\?")
+
+
+@functools.lru_cache(maxsize=512)
+def translate_params(
+    sql: str, named: str, positional: str, escape_percent: bool = False
+) -> str:
+    """Function to rewrite the :name and ? parameters of a statement, as
+    written for sqlite3, in the paramstyle of another driver.
+
+    Args:
+        sql (str): Statement with :name or ? parameters.
+        named (str): Format of a named parameter, e.g. '%({})s'.
+        positional (str): Positional placeholder, e.g. '%s'.
+        escape_percent (bool, optional): Double the % signs of the
+            statement, for drivers using the format paramstyles.
+            Defaults to False.
+
+    Returns:
+        str: The statement in the driver's paramstyle.
+    """
+    if escape_percent:
+        sql = sql.replace('%', '%%')
+
+    def replace(match: re.Match) -> str:
+        token = match.group(0)
+        if token.startswith("'"):
+            return token
+        if token == '?':
+            return positional
+        return named.format(match.group(1))
+
+    return PARAM_PATTERN.sub(replace, sql)
+
+
+class BackendCursor:
+    def __init__(self, cursor: Any, backend: 'DatabaseBackend') -> None:
+        """Class to wrap the cursor of a driver, so statements written
+        with sqlite3 :name and ? parameters run on it. Other attributes
+        (fetchone, fetchall, description, ...) are the driver's.
+
+        Args:
+            cursor (Any): Driver cursor.
+            backend (DatabaseBackend): Backend the cursor belongs to.
+        """
+        self._cursor = cursor
+        self.backend = backend
+
+    def execute(
+        self, sql: str, params: Optional[Sequence | Dict[str, Any]] = None
+    ) -> 'BackendCursor':
+        if params is None:
+            self._cursor.execute(sql)
+        else:
+            self._cursor.execute(self.backend.translate(sql), params)
+        return self
+
+    def executemany(
+        self, sql: str, params: Sequence[Sequence | Dict[str, Any]]
+    ) -> 'BackendCursor':
+        self._cursor.executemany(self.backend.translate(sql), params)
+        return self
+
+    def copy_rows(
+        self, table: str, columns: List[str], rows: List[Dict[str, Any]]
+    ) -> None:
+        """Function to bulk insert rows with the fastest path of the
+        backend, e.g. COPY for Postgres."""
+        self.backend.copy_rows(self._cursor, table, columns, rows)
+
+    def begin(self) -> None:
+        self.backend.begin(self._cursor)
+
+    def commit(self) -> None:
+        self.backend.commit(self._cursor)
+
+    def rollback(self) -> None:
+        self.backend.rollback(self._cursor)
+
+    def __iter__(self) -> Iterator[Any]:
+        while rows := self._cursor.fetchmany(1000):
+            yield from rows
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+class DatabaseBackend(ABC):
+    name: str
+    default_target: str
+    named_param = ':{}'
+    positional_param = '?'
+    escape_percent = False
+
+    def translate(self, sql: str) -> str:
+        """Function to rewrite a statement in the paramstyle of the
+        driver."""
+        return translate_params(
+            sql, self.named_param, self.positional_param, self.escape_percent
+        )
+
+    @abstractmethod
+    def connect(
+        self, target: str, profile: Optional[str], pooled: bool
+    ) -> Any:
+        """Function to open a connection to target, a file or DSN."""
+
+    def apply_profile(self, conn: Any, profile: Optional[str]) -> None:
+        if profile is None:
+            return
+        cursor = conn.cursor()
+        for setting, value in BACKEND_PROFILES[self.name][profile].items():
+            cursor.execute(f'SET {setting} = {value}')
+        cursor.close()
+        conn.commit()
+
+    def cursor(self, conn: Any) -> Any:
+        return BackendCursor(conn.cursor(), self)
+
+    def copy_rows(
+        self,
+        cursor: Any,
+        table: str,
+        columns: List[str],
+        rows: List[Dict[str, Any]],
+    ) -> None:
+        cursor.executemany(
+            self.translate(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES'
+                f' ({", ".join(f":{column}" for column in columns)})'
+            ),
+            rows,
+        )
+
+    def begin(self, cursor: Any) -> None:
+        cursor.execute('BEGIN')
+
+    def commit(self, cursor: Any) -> None:
+        cursor.execute('COMMIT')
+
+    def rollback(self, cursor: Any) -> None:
+        cursor.execute('ROLLBACK')
+
+    def describe(self, target: str) -> str:
+        return f'{self.name}://{target}'
+
+
+class SQLiteBackend(DatabaseBackend):
+    name = 'sqlite3'
+    default_target = 'data/socialetl.db'
+
+    def connect(
+        self, target: str, profile: Optional[str], pooled: bool
+    ) -> sqlite3.Connection:
+        # pooled connections are closed by close(), possibly from another
+        # thread, but each one is only ever used by the thread that opened it
+        conn = sqlite3.connect(target, check_same_thread=not pooled)
+        if profile is not None:
+            for pragma, value in PERFORMANCE_PROFILES[profile].items():
+                conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def cursor(self, conn: sqlite3.Connection) -> sqlite3.Cursor:
+        # statements are written for sqlite3, so its cursor is used as is
+        return conn.cursor()
+
+
+def copy_text(value: Any) -> str:
+    """Function to write a value in the COPY text format: None as \\N, and
+    backslashes, tabs and line breaks escaped."""
+    if value is None:
+        return '\\N'
+    # chained replaces are about 3x faster than str.translate here
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+class PostgresBackend(DatabaseBackend):
+    name = 'postgres'
+    default_target = 'dbname=socialetl'
+    named_param = '%({})s'
+    positional_param = '%s'
+    escape_percent = True
+
+    def connect(
+        self, target: str, profile: Optional[str], pooled: bool
+    ) -> Any:
+        try:
+            import psycopg2
+        except ImportError:
+            raise ValueError(
+                'psycopg2 is not installed. Please pip install'
+                ' psycopg2-binary to use the postgres db_type.'
+            )
+        conn = psycopg2.connect(target)
+        self.apply_profile(conn, profile)
+        return conn
+
+    def copy_rows(
+        self,
+        cursor: Any,
+        table: str,
+        columns: List[str],
+        rows: List[Dict[str, Any]],
+    ) -> None:
+        # one COPY FROM STDIN round trip instead of one INSERT per row
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join([copy_text(row[col]) for col in columns]))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.copy_expert(
+            f'COPY {table} ({", ".join(columns)}) FROM STDIN', buffer
+        )
+
+    def begin(self, cursor: Any) -> None:
+        # psycopg2 opens a transaction before the first statement
+        pass
+
+    def commit(self, cursor: Any) -> None:
+        cursor.connection.commit()
+
+    def rollback(self, cursor: Any) -> None:
+        cursor.connection.rollback()
+
+    def describe(self, target: str) -> str:
+        # keep passwords of key=value and URL DSNs out of logs
+        target = re.sub(r'(password=)\S+', r'\1***', target)
+        target = re.sub(r'(://[^:/@]+):[^@]*@', r'\1:***@', target)
+        return target if '://' in target else f'{self.name}://{target}'
+
+
+class DuckDBBackend(DatabaseBackend):
+    name = 'duckdb'
+    default_target = 'data/socialetl.duckdb'
+    named_param = '${}'
+
+    def connect(
+        self, target: str, profile: Optional[str], pooled: bool
+    ) -> Any:
+        try:
+            import duckdb
+        except ImportError:
+            raise ValueError(
+                'duckdb is not installed. Please pip install duckdb to use'
+                ' the duckdb db_type.'
+            )
+        conn = duckdb.connect(target)
+        self.apply_profile(conn, profile)
+        return conn
+
+    def copy_rows(
+        self,
+        cursor: Any,
+        table: str,
+        columns: List[str],
+        rows: List[Dict[str, Any]],
+    ) -> None:
+        try:
+            import pyarrow as pa
+        except ImportError:
+            return super().copy_rows(cursor, table, columns, rows)
+        # a columnar scan of the batch instead of one INSERT per row
+        batch = pa.table(
+            {column: [row[column] for row in rows] for column in columns}
+        )
+        cursor.register('copy_rows_batch', batch)
+        try:
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(columns)})'
+                f' SELECT {", ".join(columns)} FROM copy_rows_batch'
+            )
+        finally:
+            cursor.unregister('copy_rows_batch')
+
+    def begin(self, cursor: Any) -> None:
+        cursor.begin()
+
+    def commit(self, cursor: Any) -> None:
+        cursor.commit()
+
+    def rollback(self, cursor: Any) -> None:
+        cursor.rollback()
+
+
+# db_type to its backend
+DB_BACKENDS: Dict[str, DatabaseBackend] = {
+    'sqlite3': SQLiteBackend(),
+    'postgres': PostgresBackend(),
+    'duckdb': DuckDBBackend(),
+}
+
+
+@dataclass
+class PoolStats:
+    """Dataclass to hold connection usage counters of a DatabaseConnection.
+
+    Args:
+        connections_opened (int): Number of connections opened through
+            the backend.
+        cursors_acquired (int): Number of managed cursors handed out.
+        acquire_seconds_total (float): Time spent acquiring cursors.
+        acquire_seconds_max (float): Slowest cursor acquisition.
+    """
+
+    connections_opened: int = 0
+    cursors_acquired: int = 0
+    acquire_seconds_total: float = 0.0
+    acquire_seconds_max: float = 0.0
+
+    @property
+    def acquire_seconds_mean(self) -> float:
+        if not self.cursors_acquired:
+            return 0.0
+        return self.acquire_seconds_total / self.cursors_acquired
 
 
 class DatabaseConnection:
     def __init__(
-        self, db_type: str = 'sqlite3', db_file: str = 'data/socialetl.db'
+        self,
+        db_type: str = 'sqlite3',
+        db_file: Optional[str] = None,
+        pooled: bool = False,
+        profile: Optional[str] = None,
+        dsn: Optional[str] = None,
     ) -> None:
         """Class to connect to a database.
 
         Args:
-            db_type (str, optional): Database type.
+            db_type (str, optional): Database type, one of DB_BACKENDS.
                 Defaults to 'sqlite3'.
-            db_file (str, optional): Database file.
-                Defaults to 'data/socialetl.db'.
+            db_file (Optional[str], optional): Database file of sqlite3 and
+                duckdb. Defaults to 'data/socialetl.db', or
+                'data/socialetl.duckdb' for duckdb.
+            pooled (bool, optional): Keep one long-lived connection per
+                thread instead of connecting on every managed_cursor call.
+                Call close() to release them. Defaults to False.
+            profile (Optional[str], optional): Name of the
+                PERFORMANCE_PROFILES entry applied on connect, or its
+                BACKEND_PROFILES equivalent. Defaults to None (database
+                defaults).
+            dsn (Optional[str], optional): Connection string of postgres.
+                Defaults to the POSTGRES_DSN environment variable, else
+                'dbname=socialetl'.
         """
+        if db_type not in DB_BACKENDS:
+            raise ValueError(
+                f'Database type {db_type} is not supported. Please pass one'
+                f' of {", ".join(DB_BACKENDS)}.'
+            )
+        if profile is not None and profile not in PERFORMANCE_PROFILES:
+            raise ValueError(
+                f'Profile {profile} is not supported. Please pass one of'
+                f' {", ".join(PERFORMANCE_PROFILES)}.'
+            )
+        self._backend = DB_BACKENDS[db_type]
+        if db_type == 'postgres':
+            target = dsn or os.environ.get('POSTGRES_DSN')
+        else:
+            target = db_file
+        self._target = target or self._backend.default_target
+        self._profile = profile
         self._db_type = db_type
-        self._db_file = db_file
+        self._pooled = pooled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # pooled connections, with the thread each one belongs to
+        self._connections: List[Tuple[threading.Thread, Any]] = []
+        self._generation = 0
+        self._stats = PoolStats()
+
+    @property
+    def db_type(self) -> str:
+        return self._db_type
+
+    def _connect(self) -> Any:
+        conn = self._backend.connect(self._target, self._profile, self._pooled)
+        with self._lock:
+            self._stats.connections_opened += 1
+        return conn
+
+    def _pooled_connection(self) -> Any:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.generation != self._generation:
+            conn = self._connect()
+            with self._lock:
+                # connections of exited threads, e.g. short-lived workers,
+                # would otherwise stay open until close()
+                stale = [c for t, c in self._connections if not t.is_alive()]
+                self._connections = [
+                    (t, c) for t, c in self._connections if t.is_alive()
+                ]
+                self._connections.append((threading.current_thread(), conn))
+                self._local.conn = conn
+                self._local.generation = self._generation
+            for stale_conn in stale:
+                stale_conn.close()
+        return conn
+
+    def _record_acquire(self, seconds: float) -> None:
+        with self._lock:
+            self._stats.cursors_acquired += 1
+            self._stats.acquire_seconds_total += seconds
+            self._stats.acquire_seconds_max = max(
+                self._stats.acquire_seconds_max, seconds
+            )
 
     @contextmanager
-    def managed_cursor(self) -> Iterator[sqlite3.Cursor]:
+    def managed_cursor(self) -> Iterator[Any]:
         """Function to create a managed database cursor.
 
+        In pooled mode the cursor's connection is reused, and the work done
+        with the cursor is committed on success and rolled back on error.
+
         Yields:
-            sqlite3.Cursor: A sqlite3 cursor.
+            Any: A sqlite3 cursor, or for other backends a BackendCursor
+                taking the same :name and ? parameters.
         """
-        if self._db_type == 'sqlite3':
-            _conn = sqlite3.connect(self._db_file)
-            cur = _conn.cursor()
+        start = time.perf_counter()
+        if self._pooled:
+            conn = self._pooled_connection()
+            cur = self._backend.cursor(conn)
+            self._record_acquire(time.perf_counter() - start)
+            try:
+                yield cur
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+            finally:
+                cur.close()
+        else:
+            _conn = self._connect()
+            cur = self._backend.cursor(_conn)
+            self._record_acquire(time.perf_counter() - start)
             try:
                 yield cur
             finally:
@@ -35,22 +507,76 @@ class DatabaseConnection:
                 cur.close()
                 _conn.close()
 
+    def pool_stats(self) -> PoolStats:
+        """Function to get a snapshot of the connection usage counters.
+
+        Returns:
+            PoolStats: Connections opened and cursor acquisition latency.
+        """
+        with self._lock:
+            return PoolStats(**vars(self._stats))
+
+    def release_thread(self) -> None:
+        """Function to close the pooled connection of the calling thread,
+        e.g. before a short-lived worker thread exits. Its next
+        managed_cursor call opens a new connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.generation != self._generation:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections = [
+                (t, c) for t, c in self._connections if c is not conn
+            ]
+        conn.close()
+
+    def close(self) -> None:
+        """Function to close the pooled connections. The next
+        managed_cursor call opens a new connection."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for _, conn in connections:
+            conn.close()
+
+    def __enter__(self) -> 'DatabaseConnection':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
     def __str__(self) -> str:
-        return f'{self._db_type}://{self._db_file}'
+        return self._backend.describe(self._target)
 
 
 def db_factory(
-    db_type: str = 'sqlite3', db_file: str = 'data/socialetl.db'
+    db_type: str = 'sqlite3',
+    db_file: Optional[str] = None,
+    pooled: bool = False,
+    profile: Optional[str] = None,
+    dsn: Optional[str] = None,
 ) -> DatabaseConnection:
     """Function to create an ETL object.
 
     Args:
-        db_type (str, optional): Database type.
+        db_type (str, optional): Database type, one of DB_BACKENDS.
             Defaults to 'sqlite3'.
-        db_file (str, optional): Database file.
-            Defaults to 'data/socialetl.db'.
+        db_file (Optional[str], optional): Database file of sqlite3 and
+            duckdb. Defaults to the backend's default file.
+        pooled (bool, optional): Reuse one connection per thread.
+            Defaults to False.
+        profile (Optional[str], optional): PERFORMANCE_PROFILES entry
+            applied on connect. Defaults to None.
+        dsn (Optional[str], optional): Connection string of postgres.
+            Defaults to the POSTGRES_DSN environment variable.
 
     Returns:
         DatabaseConnection: A DatabaseConnection object.
     """
-    return DatabaseConnection(db_type=db_type, db_file=db_file)
+    return DatabaseConnection(
+        db_type=db_type,
+        db_file=db_file,
+        pooled=pooled,
+        profile=profile,
+        dsn=dsn,
+    )
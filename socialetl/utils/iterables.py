@@ -0,0 +1,21 @@
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar('T')
+
+
+def batched(iterable: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    """Function to split an iterable into lists of at most batch_size.
+
+    Args:
+        iterable (Iterable[T]): Items to split.
+        batch_size (int): Maximum number of items per batch.
+
+    Yields:
+        List[T]: A batch of items.
+    """
+    if batch_size < 1:
+        raise ValueError(f'batch_size must be positive, got {batch_size}.')
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
@@ -0,0 +1,73 @@
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,
+        capacity: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Thread-safe token bucket used to keep API calls under a rate
+        limit. Tokens refill continuously at rate per second, up to
+        capacity, and every call consumes one token.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float, optional): Maximum burst size.
+                Defaults to rate (i.e. one second worth of calls).
+            clock (Callable[[], float], optional): Monotonic clock.
+                Defaults to time.monotonic.
+            sleep (Callable[[float], None], optional): Sleep function.
+                Defaults to time.sleep.
+        """
+        if rate <= 0:
+            raise ValueError(f'rate must be positive, got {rate}.')
+        self._rate = rate
+        self._capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self._capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_window(
+        cls, requests: int, window_seconds: float
+    ) -> 'TokenBucket':
+        """Function to build a bucket from an API quota, e.g. twitter's
+        1500 requests per 15 minute window for get_users_tweets.
+
+        Args:
+            requests (int): Requests allowed per window.
+            window_seconds (float): Length of the window in seconds.
+
+        Returns:
+            TokenBucket: A bucket that never exceeds the quota.
+        """
+        return cls(rate=requests / window_seconds, capacity=1)
+
+    def acquire(self) -> float:
+        """Function to block until a token is available and consume it.
+
+        Returns:
+            float: Seconds spent waiting for the token.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    self._capacity,
+                    self._tokens + (now - self._updated_at) * self._rate,
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self._rate
+            self._sleep(wait)
+            waited += wait
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from utils.db import DatabaseConnection
+from utils.iterables import batched
+
+# stay under SQLITE_MAX_VARIABLE_NUMBER of older sqlite builds
+MAX_SQL_VARIABLES = 900
+
+UPSERT_WATERMARK_SQL = """
+    INSERT INTO etl_watermarks (
+        source, target_id, last_id, last_created
+    ) VALUES (
+        :source, :target_id, :last_id, :last_created
+    )
+    ON CONFLICT (source, target_id) DO UPDATE SET
+        last_id = excluded.last_id,
+        last_created = excluded.last_created,
+        dt_updated = current_timestamp
+"""
+
+
+@dataclass(slots=True)
+class Watermark:
+    """Dataclass to hold the newest item seen for a source and target.
+
+    Args:
+        last_id (Optional[str]): ID of the newest item, e.g. a tweet id.
+        last_created (Optional[float]): Creation epoch of the newest item.
+    """
+
+    last_id: Optional[str] = None
+    last_created: Optional[float] = None
+
+
+class WatermarkStore:
+    def __init__(self, db: DatabaseConnection) -> None:
+        """Class to read and persist high-water marks in the
+        etl_watermarks table.
+
+        Args:
+            db (DatabaseConnection): Database holding etl_watermarks.
+        """
+        self._db = db
+
+    def get(self, source: str, target_id: str) -> Watermark:
+        """Function to get the watermark of a target.
+
+        Args:
+            source (str): Source of the target, e.g. 'twitter'.
+            target_id (str): Subreddit name or twitter user id.
+
+        Returns:
+            Watermark: The stored watermark, empty if there is none.
+        """
+        return self.get_many(source, [target_id]).get(target_id, Watermark())
+
+    def get_many(
+        self, source: str, target_ids: List[str]
+    ) -> Dict[str, Watermark]:
+        """Function to get the watermarks of several targets in one query.
+
+        Args:
+            source (str): Source of the targets.
+            target_ids (List[str]): Target ids to look up.
+
+        Returns:
+            Dict[str, Watermark]: Target id to watermark, for the targets
+                that have one.
+        """
+        watermarks: Dict[str, Watermark] = {}
+        with self._db.managed_cursor() as cur:
+            for batch in batched(target_ids, MAX_SQL_VARIABLES):
+                cur.execute(
+                    'SELECT target_id, last_id, last_created'
+                    ' FROM etl_watermarks WHERE source = ? AND target_id IN'
+                    f' ({", ".join("?" * len(batch))})',
+                    [source, *batch],
+                )
+                for target_id, last_id, last_created in cur.fetchall():
+                    watermarks[target_id] = Watermark(last_id, last_created)
+        return watermarks
+
+    def set_many(self, source: str, watermarks: Dict[str, Watermark]) -> None:
+        """Function to persist the watermarks of several targets in one
+        transaction.
+
+        Args:
+            source (str): Source of the targets.
+            watermarks (Dict[str, Watermark]): Target id to its watermark.
+        """
+        if not watermarks:
+            return
+        with self._db.managed_cursor() as cur:
+            cur.executemany(
+                UPSERT_WATERMARK_SQL,
+                [
+                    {
+                        'source': source,
+                        'target_id': target_id,
+                        'last_id': watermark.last_id,
+                        'last_created': watermark.last_created,
+                    }
+                    for target_id, watermark in watermarks.items()
+                ],
+            )
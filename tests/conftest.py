@@ -5,6 +5,7 @@ import pytest
 
 from socialetl.schema_manager import setup_db_schema, teardown_db_schema
 from socialetl.utils.db import DatabaseConnection
+from metadata import flush_metadata
 from social_etl import SocialMediaData, TwitterTweetData, etl_factory
 
 
@@ -20,6 +21,7 @@ def mock_social_posts_table(session_mocker) -> Generator:
     )
     setup_db_schema()
     yield
+    flush_metadata()
     teardown_db_schema()
     os.remove("data/test.db")
 
@@ -1,8 +1,10 @@
 import json
 import logging
+import threading
+from contextlib import contextmanager
 
-from metadata import log_metadata
-from utils.db import db_factory
+from metadata import MetadataBuffer, flush_metadata, log_metadata
+from utils.db import DatabaseConnection, db_factory
 
 
 class TestMetadata:
@@ -14,6 +16,8 @@ class TestMetadata:
             return a + b + c + d
 
         test_function(1, 2, 3, d=4)
+        # rows are buffered in memory until flushed
+        flush_metadata()
 
         # check if test_function is logged in the database
         db = db_factory(db_file="data/test.db")
@@ -31,3 +35,101 @@ class TestMetadata:
                 'c': 3,
                 'd': 4,
             }
+
+    def test_log_metadata_profiling_columns(self, mocker):
+        logging.info("Testing log_metadata duration and record counts")
+
+        @log_metadata
+        def test_records(social_data):
+            return social_data[:2]
+
+        test_records(social_data=[1, 2, 3])
+        flush_metadata()
+
+        db = db_factory(db_file="data/test.db")
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT duration_ms, num_records FROM log_metadata WHERE"
+                " function_name = 'test_records'"
+            )
+            duration_ms, num_records = cur.fetchone()
+        assert duration_ms >= 0
+        assert num_records == 2
+
+    def test_log_metadata_buffers_rows(self, mocker):
+        logging.info("Testing log_metadata buffering")
+        buffer = mocker.patch("metadata._buffer", MetadataBuffer(3, 60))
+        flush = mocker.spy(buffer, "flush")
+
+        @log_metadata
+        def test_buffered(a):
+            return a
+
+        for idx in range(5):
+            test_buffered(idx)
+        # one flush once the third row is buffered, two rows pending
+        assert flush.call_count == 1
+        assert len(buffer) == 2
+        flush_metadata()
+        assert len(buffer) == 0
+
+    def test_log_metadata_flush_error(self, mocker, tmp_path):
+        logging.info("Testing a failed log_metadata flush")
+        # the database has no log_metadata table, so the flush fails
+        buffer = mocker.patch("metadata._buffer", MetadataBuffer(1, 60))
+        db = DatabaseConnection(db_file=str(tmp_path / "empty.db"))
+        buffer.use_db(db)
+
+        @log_metadata
+        def test_failed_flush(a):
+            return a
+
+        assert test_failed_flush(1) == 1
+        # the rows of a failed flush are kept for the next one
+        assert len(buffer) == 1
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "CREATE TABLE log_metadata (function_name TEXT,"
+                " input_params TEXT, duration_ms REAL, num_records INTEGER)"
+            )
+        buffer.flush()
+        assert len(buffer) == 0
+        with db.managed_cursor() as cur:
+            cur.execute("SELECT function_name FROM log_metadata")
+            assert cur.fetchall() == [("test_failed_flush",)]
+
+    def test_append_during_flush(self, tmp_path):
+        logging.info("Testing that a flush does not block appends")
+        buffer = MetadataBuffer(100, 60)
+        db = DatabaseConnection(db_file=str(tmp_path / "slow.db"))
+        buffer.use_db(db)
+        writing, appended = threading.Event(), threading.Event()
+        managed_cursor = db.managed_cursor
+
+        @contextmanager
+        def slow_cursor():
+            writing.set()
+            assert appended.wait(1)
+            with managed_cursor() as cur:
+                cur.execute(
+                    "CREATE TABLE log_metadata (function_name TEXT,"
+                    " input_params TEXT, duration_ms REAL,"
+                    " num_records INTEGER)"
+                )
+                yield cur
+
+        db.managed_cursor = slow_cursor
+        row = {
+            "func_name": "f",
+            "input_params": "{}",
+            "duration_ms": 1.0,
+            "num_records": None,
+        }
+        buffer.append(row)
+        flush = threading.Thread(target=buffer.flush)
+        flush.start()
+        assert writing.wait(1)
+        buffer.append(row)
+        appended.set()
+        flush.join()
+        assert len(buffer) == 1
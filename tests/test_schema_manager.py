@@ -0,0 +1,157 @@
+import logging
+
+import pytest
+from loader import bulk_load
+from social_etl import SocialMediaData, TwitterTweetData
+from socialetl.schema_manager import (
+    drop_partitions,
+    ensure_partition,
+    list_partitions,
+    migrate_social_data_to_json,
+    migrate_to_partitions,
+    partition_name,
+    setup_db_schema,
+    teardown_db_schema,
+    utc_day,
+)
+from utils.db import DatabaseConnection, db_factory
+
+
+class TestSchemaManager:
+    def test_generated_columns(self):
+        logging.info("Testing social_posts generated columns")
+        db = db_factory(db_file="data/test.db")
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO social_posts (id, source, social_data)"
+                " VALUES ('schema0', 'schema', :social_data)",
+                {
+                    "social_data": (
+                        '{"score": 10, "comms_num": 3,'
+                        ' "created": "1675000000.0"}'
+                    )
+                },
+            )
+            cur.execute(
+                "SELECT score, comms_num, created FROM social_posts"
+                " WHERE id = 'schema0'"
+            )
+            assert cur.fetchone() == (10, 3, 1675000000.0)
+            cur.execute(
+                "EXPLAIN QUERY PLAN SELECT count(*) FROM social_posts"
+                " WHERE source = 'schema'"
+            )
+            assert "social_posts_source_idx" in str(cur.fetchall())
+            cur.execute("DELETE FROM social_posts WHERE source = 'schema'")
+
+    def test_migrate_social_data_to_json(self):
+        logging.info("Testing migration of python repr social_data to JSON")
+        db = db_factory(db_file="data/test.db")
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO social_posts (id, source, social_data)"
+                " VALUES ('schema1', 'schema', :social_data)",
+                {"social_data": str({"text": "it's", "score": 1})},
+            )
+        migrate_social_data_to_json(db=db)
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT social_data, score FROM social_posts"
+                " WHERE id = 'schema1'"
+            )
+            assert cur.fetchone() == ('{"text": "it\'s", "score": 1}', 1)
+            cur.execute("DELETE FROM social_posts WHERE source = 'schema'")
+
+    def test_partitions(self, tmp_path):
+        logging.info("Testing partitioned social_posts and retention")
+        db = DatabaseConnection(db_file=str(tmp_path / "partitions.db"))
+        setup_db_schema(db=db)
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "INSERT INTO social_posts (id, source, social_data)"
+                " VALUES ('old0', 'reddit', '{\"score\": 1}')"
+            )
+        migrate_to_partitions(db=db)
+        assert len(list_partitions(db=db)) == 1
+        (migrated,) = [p["name"] for p in list_partitions(db=db)]
+        indexes = [f"{migrated}_dt_created_idx", f"{migrated}_source_idx"]
+        with db.managed_cursor() as cur:
+            cur.execute(f"DROP INDEX {migrated}_source_idx")
+        # a partitioned database gets the indexes its partitions miss
+        migrate_to_partitions(db=db)
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+                " AND tbl_name = ? AND sql IS NOT NULL ORDER BY name",
+                (migrated,),
+            )
+            assert [row[0] for row in cur.fetchall()] == indexes
+            cur.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM {migrated}"
+                " WHERE dt_created >= '2020-01-01'"
+            )
+            assert indexes[0] in cur.fetchone()[-1]
+
+        with db.managed_cursor() as cur:
+            old = ensure_partition(cur, "twitter", "20200101")
+            cur.execute(
+                f"INSERT INTO {old} (id, source, social_data)"
+                " VALUES ('tw0', 'twitter', '{\"text\": \"old\"}')"
+            )
+        posts = [
+            SocialMediaData(
+                id=f"tw{idx}",
+                source="twitter",
+                social_data=TwitterTweetData(text=f"text{idx}"),
+            )
+            for idx in range(3)
+        ]
+        stats = bulk_load(posts, db.managed_cursor())
+        assert (stats.inserted, stats.updated) == (2, 1)
+        with db.managed_cursor() as cur:
+            # the stored post is updated in its partition, not duplicated
+            cur.execute(
+                "SELECT partition_name, count(*) FROM social_posts"
+                " WHERE source = 'twitter' GROUP BY 1 ORDER BY 1"
+            )
+            today = partition_name("twitter", utc_day())
+            assert cur.fetchall() == [(old, 1), (today, 2)]
+
+        assert drop_partitions(retention_days=30, db=db) == [old]
+        with db.managed_cursor() as cur:
+            cur.execute("SELECT count(*) FROM social_posts")
+            assert cur.fetchone()[0] == 3
+        with pytest.raises(ValueError):
+            partition_name("reddit; DROP TABLE x", "20200101")
+        teardown_db_schema(db=db)
+
+    def test_migrate_partitions_without_source_or_day(self, tmp_path):
+        logging.info("Testing partition migration of incomplete rows")
+        db = DatabaseConnection(db_file=str(tmp_path / "incomplete.db"))
+        setup_db_schema(db=db)
+        # retention needs partitions to drop
+        with pytest.raises(ValueError):
+            drop_partitions(retention_days=30, db=db)
+        with db.managed_cursor() as cur:
+            cur.executemany(
+                "INSERT INTO social_posts (id, source, social_data,"
+                " dt_created) VALUES (?, ?, ?, ?)",
+                [
+                    ("nosource", None, str({"text": "it's"}), "2020-01-01"),
+                    ("noday", "twitter", '{"text": "a"}', None),
+                ],
+            )
+        migrate_to_partitions(db=db)
+        assert [p["name"] for p in list_partitions(db=db)] == [
+            partition_name("unknown", "20200101"),
+            partition_name("twitter", utc_day()),
+        ]
+        # the python repr is rewritten in its partition, not the view
+        migrate_social_data_to_json(db=db)
+        with db.managed_cursor() as cur:
+            cur.execute("SELECT id, social_data FROM social_posts ORDER BY 1")
+            assert cur.fetchall() == [
+                ("noday", '{"text": "a"}'),
+                ("nosource", '{"text": "it\'s"}'),
+            ]
+        teardown_db_schema(db=db)
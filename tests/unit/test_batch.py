@@ -0,0 +1,54 @@
+from array import array
+from typing import List
+
+import pytest
+from batch import SocialMediaBatch
+from social_etl import RedditPostData, SocialMediaData, TwitterTweetData
+from transform import transformation_factory
+
+
+class TestSocialMediaBatch:
+    """A class to test the columnar SocialMediaBatch."""
+
+    @pytest.fixture
+    def mock_reddit_data(self) -> List[SocialMediaData]:
+        return [
+            SocialMediaData(
+                id=f"id{str(idx)}",
+                source="reddit",
+                social_data=RedditPostData(
+                    title=f"title{str(idx)}",
+                    score=idx,
+                    url=f"url{str(idx)}",
+                    comms_num=elt,
+                    created="1675000000.0",
+                    text=f"text{str(idx)}",
+                ),
+            )
+            for idx, elt in enumerate([1] * 15 + [8])
+        ]
+
+    def test_round_trip(self, mock_reddit_data) -> None:
+        batch = SocialMediaBatch.from_records(mock_reddit_data)
+        assert len(batch) == 16
+        assert isinstance(batch.column("score"), array)
+        assert isinstance(batch.column("title"), list)
+        assert list(batch) == mock_reddit_data
+
+    def test_rejects_mixed_types(self, mock_reddit_data) -> None:
+        batch = SocialMediaBatch.from_records(mock_reddit_data)
+        with pytest.raises(TypeError):
+            batch.append(
+                SocialMediaData(
+                    id="id0",
+                    source="twitter",
+                    social_data=TwitterTweetData(text="text0"),
+                )
+            )
+
+    def test_sd_filter_on_batch(self, mock_reddit_data) -> None:
+        batch = SocialMediaBatch.from_records(mock_reddit_data)
+        transformed_data = transformation_factory("sd")(batch)
+        assert isinstance(transformed_data, SocialMediaBatch)
+        assert transformed_data.ids == ["id15"]
+        assert list(transformed_data.column("comms_num")) == [8]
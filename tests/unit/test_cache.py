@@ -0,0 +1,103 @@
+import os
+
+import pytest
+from cache import (
+    DEFAULT_TTLS,
+    MemoryResponseCache,
+    SQLiteResponseCache,
+    cache_factory,
+)
+from social_etl import TwitterETL
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestResponseCache:
+    """A class to test the API response caches."""
+
+    @pytest.fixture
+    def sqlite_cache(self):
+        cache = SQLiteResponseCache(
+            db_file='data/test_api_cache.db',
+            ttls={'short': 10},
+            default_ttl=100,
+            max_entries=3,
+            clock=FakeClock(),
+        )
+        yield cache
+        cache.close()
+        os.remove('data/test_api_cache.db')
+
+    @pytest.mark.parametrize('backend', ['sqlite', 'memory'])
+    def test_ttl_and_lru(self, backend, sqlite_cache) -> None:
+        cache = sqlite_cache
+        if backend == 'memory':
+            cache = MemoryResponseCache(
+                ttls={'short': 10}, max_entries=3, clock=FakeClock()
+            )
+        clock = cache._clock
+        calls = []
+
+        def fetch(value):
+            calls.append(value)
+            return {'value': value}
+
+        assert cache.get_or_fetch('short', 'a', lambda: fetch('a')) == {
+            'value': 'a'
+        }
+        assert cache.get_or_fetch('short', 'a', lambda: fetch('x')) == {
+            'value': 'a'
+        }
+        clock.now += 11
+        cache.get_or_fetch('short', 'a', lambda: fetch('a'))
+        assert calls == ['a', 'a']
+
+        # 'b' is the least recently used entry once 'a' is read again
+        for key in 'bc':
+            clock.now += 1
+            cache.get_or_fetch('long', key, lambda: fetch(key))
+        clock.now += 1
+        cache.get_or_fetch('short', 'a', lambda: fetch('a'))
+        cache.get_or_fetch('long', 'd', lambda: fetch('d'))
+        cache.get_or_fetch('long', 'b', lambda: fetch('b'))
+        assert calls == ['a', 'a', 'b', 'c', 'd', 'b']
+        assert cache.stats.hits == 2
+        assert cache.stats.misses == 6
+        assert cache.stats.evictions >= 2
+
+    def test_max_bytes(self, sqlite_cache) -> None:
+        sqlite_cache.max_bytes = 3000
+        for key in range(3):
+            sqlite_cache._clock.now += 1
+            sqlite_cache.get_or_fetch('long', str(key), lambda: 'x' * 1000)
+        with sqlite_cache._db.managed_cursor() as cur:
+            cur.execute('SELECT key FROM api_cache')
+            assert [row[0] for row in cur.fetchall()] == ['1', '2']
+
+    def test_invalid_backend(self) -> None:
+        assert cache_factory(None) is None
+        with pytest.raises(ValueError):
+            cache_factory('redis')
+
+    def test_twitter_lookups_cached(self, mocker, sqlite_cache) -> None:
+        sqlite_cache.ttls = DEFAULT_TTLS
+        client = mocker.Mock()
+        client.get_user.return_value.data.id = 42
+        client.get_users_following.return_value.data = [
+            mocker.Mock(id=idx) for idx in range(3)
+        ]
+        client.get_users_tweets.return_value.data = []
+        for _ in range(2):
+            TwitterETL(cache=sqlite_cache).extract(
+                id='startdataeng', num_records=10, client=client
+            )
+        assert client.get_user.call_count == 1
+        assert client.get_users_following.call_count == 1
+        assert client.get_users_tweets.call_count == 6
+        assert sqlite_cache.stats.hits == 2
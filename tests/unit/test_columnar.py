@@ -0,0 +1,83 @@
+import pytest
+from fake_clients import FakeRedditClient
+from social_etl import RedditETL, TwitterTweetData
+from transform import transformation_factory
+from utils.db import DatabaseConnection
+
+pa = pytest.importorskip("pyarrow")
+ds = pytest.importorskip("pyarrow.dataset")
+
+from columnar import ColumnarSink, arrow_schema  # noqa: E402
+
+
+class TestColumnarSink:
+    """A class to test the columnar sink fed by load."""
+
+    @pytest.fixture
+    def db(self):
+        db = DatabaseConnection(db_file="data/test.db")
+        yield db
+        with db.managed_cursor() as cur:
+            cur.execute("DELETE FROM social_posts WHERE id LIKE 'columnar-%'")
+
+    def run(
+        self, db: DatabaseConnection, sink: ColumnarSink, seed: int = 1
+    ) -> None:
+        RedditETL(prefetch_pages=False, sinks=[sink]).run(
+            db_cursor_context=db.managed_cursor(),
+            client=FakeRedditClient(num_posts=250, seed=seed),
+            transform_function=transformation_factory("no_tx"),
+            id="columnar",
+            num_records=250,
+        )
+        sink.close()
+
+    @pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+    def test_load_fans_out(
+        self, db: DatabaseConnection, tmp_path, file_format: str
+    ) -> None:
+        sink = ColumnarSink(
+            root=str(tmp_path), format=file_format, row_group_size=100
+        )
+        self.run(db, sink)
+        assert (sink.stats.rows, sink.stats.row_groups) == (250, 3)
+        (path,) = sink.stats.files
+        assert "source=reddit" in path
+
+        dataset = ds.dataset(
+            str(tmp_path),
+            format="parquet" if file_format == "parquet" else "ipc",
+            partitioning="hive",
+        )
+        table = dataset.to_table()
+        assert table.num_rows == 250
+        assert table.schema.field("score").type == pa.int64()
+        assert pa.types.is_timestamp(table.schema.field("created").type)
+        assert set(table.column("source").to_pylist()) == {"reddit"}
+        assert set(table.column("op").to_pylist()) == {"inserted"}
+
+        # posts already loaded unchanged are not written again
+        sink = ColumnarSink(root=str(tmp_path), format=file_format)
+        self.run(db, sink)
+        assert sink.stats.rows == 0 and not sink.stats.files
+
+        # changed posts get a row per version, told apart by op
+        sink = ColumnarSink(root=str(tmp_path), format=file_format)
+        self.run(db, sink, seed=2)
+        dataset = ds.dataset(
+            str(tmp_path),
+            format="parquet" if file_format == "parquet" else "ipc",
+            partitioning="hive",
+        )
+        ops = dataset.to_table(columns=["op"]).column("op").to_pylist()
+        assert sorted(set(ops)) == ["inserted", "updated"]
+        assert ops.count("updated") == 250
+
+    def test_options(self, tmp_path) -> None:
+        assert arrow_schema(TwitterTweetData).names == ["id", "op", "text"]
+        with pytest.raises(ValueError):
+            ColumnarSink(root=str(tmp_path), format="csv")
+        with pytest.raises(ValueError):
+            ColumnarSink(
+                root=str(tmp_path), format="arrow", compression="gzip"
+            )
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+from utils.concurrency import bounded_map, prefetch
+from utils.rate_limit import TokenBucket
+
+
+class TestBoundedMap:
+    """A class to test the bounded concurrent map."""
+
+    def test_preserves_order(self) -> None:
+        def slow_square(x: int) -> int:
+            time.sleep(0.01 * (5 - x))
+            return x * x
+
+        assert list(bounded_map(slow_square, range(5), 5)) == [
+            0,
+            1,
+            4,
+            9,
+            16,
+        ]
+
+    def test_max_workers_in_flight(self) -> None:
+        in_flight = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def track(x: int) -> int:
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+            return x
+
+        assert list(bounded_map(track, range(20), 3)) == list(range(20))
+        assert peak <= 3
+
+    def test_invalid_max_workers(self) -> None:
+        with pytest.raises(ValueError):
+            list(bounded_map(str, range(3), 0))
+
+
+class TestPrefetch:
+    """A class to test the background prefetch of an iterator."""
+
+    def test_overlaps_fetch_and_processing(self) -> None:
+        def pages():
+            for page in range(5):
+                time.sleep(0.02)
+                yield page
+
+        start = time.perf_counter()
+        consumed = []
+        for page in prefetch(pages()):
+            time.sleep(0.02)
+            consumed.append(page)
+        # 5 fetches and 5 conversions of 20ms, overlapped
+        assert time.perf_counter() - start < 0.18
+        assert consumed == list(range(5))
+        assert list(prefetch(pages(), depth=0)) == list(range(5))
+
+    def test_on_exit_runs_on_the_background_thread(self) -> None:
+        fetch_threads = set()
+        exit_threads = []
+        done = threading.Event()
+
+        def pages():
+            for page in range(5):
+                fetch_threads.add(threading.get_ident())
+                yield page
+
+        def on_exit() -> None:
+            exit_threads.append(threading.get_ident())
+            done.set()
+
+        iterator = prefetch(pages(), depth=2, on_exit=on_exit)
+        assert next(iterator) == 0
+        # closed early, e.g. by a consumer breaking out of its loop
+        iterator.close()
+        assert done.wait(1)
+        assert exit_threads == list(fetch_threads)
+        assert exit_threads != [threading.get_ident()]
+
+
+class TestTokenBucket:
+    """A class to test the token bucket rate limiter."""
+
+    def test_acquire_waits_when_empty(self) -> None:
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds: float) -> None:
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(
+            rate=2, capacity=2, clock=lambda: now[0], sleep=sleep
+        )
+        # the burst is served immediately, then calls are spaced 1/rate
+        assert [bucket.acquire() for _ in range(4)] == [0, 0, 0.5, 0.5]
+        assert sum(sleeps) == pytest.approx(1.0)
+
+    def test_per_window(self) -> None:
+        bucket = TokenBucket.per_window(requests=1500, window_seconds=900)
+        assert bucket._rate == pytest.approx(1500 / 900)
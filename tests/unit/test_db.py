@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+
+import pytest
+from instrumentation import RunMetrics
+from loader import bulk_load
+from metadata import MetadataBuffer
+from schema_manager import setup_db_schema, teardown_db_schema
+from social_etl import SocialMediaData, TwitterTweetData
+from utils.db import DatabaseConnection, translate_params
+
+
+class TestDatabaseConnection:
+    """A class to test the DatabaseConnection class."""
+
+    def test_unpooled_connects_per_cursor(self) -> None:
+        db = DatabaseConnection(db_file="data/test.db")
+        for _ in range(3):
+            with db.managed_cursor() as cur:
+                cur.execute("SELECT 1")
+        assert db.pool_stats().connections_opened == 3
+        assert db.pool_stats().cursors_acquired == 3
+
+    def test_pooled_reuses_connection(self) -> None:
+        with DatabaseConnection(db_file="data/test.db", pooled=True) as db:
+            for _ in range(3):
+                with db.managed_cursor() as cur:
+                    cur.execute("SELECT 1")
+            stats = db.pool_stats()
+        assert stats.connections_opened == 1
+        assert stats.cursors_acquired == 3
+        assert stats.acquire_seconds_max >= stats.acquire_seconds_mean > 0
+
+    def test_pooled_connection_per_thread(self) -> None:
+        db = DatabaseConnection(db_file="data/test.db", pooled=True)
+
+        def select() -> None:
+            with db.managed_cursor() as cur:
+                cur.execute("SELECT 1")
+
+        threads = [threading.Thread(target=select) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        select()
+        assert db.pool_stats().connections_opened == 3
+        db.close()
+        # a closed pool reconnects on the next use
+        select()
+        assert db.pool_stats().connections_opened == 4
+        db.close()
+
+    def test_pooled_releases_thread_connections(self) -> None:
+        db = DatabaseConnection(db_file="data/test.db", pooled=True)
+
+        def select(release: bool) -> None:
+            with db.managed_cursor() as cur:
+                cur.execute("SELECT 1")
+            if release:
+                db.release_thread()
+
+        thread = threading.Thread(target=select, args=(True,))
+        thread.start()
+        thread.join()
+        assert db._connections == []
+        # the connection of an exited thread is closed on the next connect
+        thread = threading.Thread(target=select, args=(False,))
+        thread.start()
+        thread.join()
+        assert len(db._connections) == 1
+        select(False)
+        assert [t for t, _ in db._connections] == [threading.current_thread()]
+        db.close()
+
+    def test_pooled_rolls_back_on_error(self) -> None:
+        db = DatabaseConnection(db_file="data/test.db", pooled=True)
+        with pytest.raises(RuntimeError):
+            with db.managed_cursor() as cur:
+                cur.execute(
+                    "INSERT INTO social_posts (id, source, social_data)"
+                    " VALUES ('rollback0', 'rollback', '{}')"
+                )
+                raise RuntimeError("abort")
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM social_posts WHERE source = 'rollback'"
+            )
+            assert cur.fetchone()[0] == 0
+        db.close()
+
+    def test_profile_pragmas(self) -> None:
+        db = DatabaseConnection(db_file="data/test.db", profile="bulk")
+        with db.managed_cursor() as cur:
+            cur.execute("PRAGMA journal_mode")
+            assert cur.fetchone()[0] == "wal"
+            cur.execute("PRAGMA synchronous")
+            assert cur.fetchone()[0] == 0
+            cur.execute("PRAGMA cache_size")
+            assert cur.fetchone()[0] == -256_000
+
+    def test_unknown_profile(self) -> None:
+        with pytest.raises(ValueError):
+            DatabaseConnection(db_file="data/test.db", profile="fastest")
+
+    def test_unknown_db_type(self) -> None:
+        with pytest.raises(ValueError):
+            DatabaseConnection(db_type="mysql")
+
+    def test_translate_params(self) -> None:
+        sql = "SELECT ':a', b::text FROM t WHERE id = :id AND c LIKE '%x' OR ?"
+        assert translate_params(sql, "%({})s", "%s", True) == (
+            "SELECT ':a', b::text FROM t WHERE id = %(id)s"
+            " AND c LIKE '%%x' OR %s"
+        )
+        assert translate_params(sql, "${}", "?") == (
+            "SELECT ':a', b::text FROM t WHERE id = $id AND c LIKE '%x' OR ?"
+        )
+
+
+class TestBackends:
+    """A class to test the bulk load of the backends other than sqlite3."""
+
+    @pytest.fixture(params=["duckdb", "postgres"])
+    def db(self, request, tmp_path):
+        if request.param == "duckdb":
+            pytest.importorskip("duckdb")
+        elif not os.environ.get("POSTGRES_DSN"):
+            pytest.skip("POSTGRES_DSN is not set")
+        db = DatabaseConnection(
+            db_type=request.param,
+            db_file=str(tmp_path / "test.duckdb"),
+            pooled=True,
+            profile="balanced",
+        )
+        teardown_db_schema(db)
+        setup_db_schema(db=db)
+        yield db
+        teardown_db_schema(db)
+        db.close()
+
+    def test_bulk_load(self, db: DatabaseConnection) -> None:
+        posts = [
+            SocialMediaData(
+                id=f"backend{idx}",
+                source="twitter",
+                social_data=TwitterTweetData(text=f"tab\tand\\{idx}"),
+            )
+            for idx in range(250)
+        ]
+        stats = bulk_load(posts + posts[:1], db.managed_cursor(), 100)
+        assert (stats.inserted, stats.updated, stats.skipped) == (250, 0, 1)
+
+        posts[0] = SocialMediaData(
+            id="backend0",
+            source="twitter",
+            social_data=TwitterTweetData(text="changed"),
+        )
+        stats = bulk_load(posts, db.managed_cursor(), 100)
+        assert (stats.inserted, stats.updated, stats.skipped) == (0, 1, 249)
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT social_data FROM social_posts WHERE id = :id",
+                {"id": "backend1"},
+            )
+            assert json.loads(cur.fetchone()[0]) == {"text": "tab\tand\\1"}
+
+    def test_log_metadata(self, db: DatabaseConnection) -> None:
+        buffer = MetadataBuffer()
+        buffer.use_db(db)
+        buffer.append(
+            {
+                "func_name": "load",
+                "input_params": "{}",
+                "duration_ms": 1.5,
+                "num_records": 250,
+            }
+        )
+        buffer.flush()
+        with db.managed_cursor() as cur:
+            cur.execute("SELECT function_name, num_records FROM log_metadata")
+            assert cur.fetchall() == [("load", 250)]
+
+    def test_etl_runs(self, db: DatabaseConnection) -> None:
+        metrics = RunMetrics()
+        with metrics.stage("load"):
+            pass
+        metrics.save(db)
+        with db.managed_cursor() as cur:
+            cur.execute("SELECT started_at FROM etl_runs")
+            # epoch seconds keep their sub-second part, unlike a float4
+            assert cur.fetchall() == [(metrics.stages["load"].started_at,)]
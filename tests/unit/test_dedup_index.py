@@ -0,0 +1,75 @@
+import pytest
+from dedup_index import BloomFilter, DedupIndex
+from fake_clients import FakeRedditClient
+from social_etl import RedditETL
+from transform import transformation_factory
+from utils.db import DatabaseConnection
+
+
+class TestDedupIndex:
+    """A class to test the cross-run dedup index."""
+
+    @pytest.fixture
+    def db(self):
+        db = DatabaseConnection(db_file="data/test.db")
+        yield db
+        with db.managed_cursor() as cur:
+            cur.execute("DELETE FROM social_posts WHERE id LIKE 'dedup-%'")
+            cur.execute("DELETE FROM dedup_index")
+
+    def run(self, db: DatabaseConnection, num_posts: int) -> RedditETL:
+        dedup_index = DedupIndex(db)
+        reddit_etl = RedditETL(prefetch_pages=False, dedup_index=dedup_index)
+        reddit_etl.run(
+            db_cursor_context=db.managed_cursor(),
+            client=FakeRedditClient(num_posts=num_posts, seed=1),
+            transform_function=transformation_factory("no_tx"),
+            id="dedup",
+            num_records=num_posts,
+        )
+        dedup_index.save()
+        return reddit_etl
+
+    def test_bloom_filter(self) -> None:
+        bloom = BloomFilter(capacity=10_000, fp_rate=0.01)
+        bloom.add_many([f"key{idx}" for idx in range(10_000)])
+        assert all(bloom.contains_many([f"key{idx}" for idx in range(10_000)]))
+        false_positives = sum(
+            bloom.contains_many([f"other{idx}" for idx in range(50_000)])
+        )
+        assert false_positives / 50_000 < 0.02
+        capped = BloomFilter(capacity=10_000, fp_rate=0.01, max_bytes=1024)
+        assert capped.bits.nbytes == 1024
+        with pytest.raises(ValueError):
+            BloomFilter(capacity=10, fp_rate=1.5)
+
+    def test_drops_loaded_posts(self, db: DatabaseConnection) -> None:
+        self.run(db, num_posts=200)
+        # the index is read back from dedup_index, and only the 100 posts
+        # missing from the first run go through transform and load
+        reddit_etl = self.run(db, num_posts=300)
+        stats = reddit_etl._dedup_index.stats
+        assert (stats.checked, stats.dropped) == (300, 200)
+        assert len(reddit_etl._dedup_index) >= 300
+
+        # posts deleted from social_posts are only found by the verification
+        with db.managed_cursor() as cur:
+            cur.execute("DELETE FROM social_posts WHERE id = 'dedup-0'")
+        posts = RedditETL().extract(
+            "dedup", num_records=300, client=FakeRedditClient(300, seed=1)
+        )
+        assert DedupIndex(db).filter(posts) == []
+        dedup_index = DedupIndex(db, verify=True)
+        assert [post.id for post in dedup_index.filter(posts)] == ["dedup-0"]
+        assert dedup_index.stats.false_positives == 1
+
+    def test_saves_once(self, db: DatabaseConnection, mocker) -> None:
+        dedup_index = DedupIndex(db)
+        save = mocker.spy(dedup_index, "_save")
+        for idx in range(3):
+            dedup_index.add([f"dedup-{idx}"])
+        dedup_index.save()
+        dedup_index.save()
+        assert save.call_count == 1
+        # the stored count is read back, without counting social_posts
+        assert len(DedupIndex(db)) == len(dedup_index)
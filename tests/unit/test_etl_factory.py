@@ -0,0 +1,42 @@
+import pathlib
+import subprocess
+import sys
+
+import pytest
+import social_etl
+from social_etl import RedditETL, etl_factory, register_source
+
+SOCIALETL_DIR = pathlib.Path(__file__).parents[2] / 'socialetl'
+
+
+class TestEtlFactory:
+    """A class to test the lazy, registry based etl_factory."""
+
+    def test_sdks_imported_on_demand(self) -> None:
+        code = (
+            'import sys, main, social_etl;'
+            ' social_etl.etl_factory("twitter");'
+            ' print("praw" in sys.modules, "tweepy" in sys.modules,'
+            ' "numpy" in sys.modules)'
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=SOCIALETL_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        assert output.split() == ['False', 'True', 'False']
+
+    def test_register_source(self, monkeypatch) -> None:
+        monkeypatch.setattr(social_etl, 'SOURCE_REGISTRY', {})
+        register_source(
+            'fake',
+            client_builder=lambda: 'client',
+            etl_builder=lambda **kwargs: RedditETL(),
+        )
+        client, fake_etl = etl_factory('fake', max_workers=4)
+        assert client == 'client'
+        assert isinstance(fake_etl, RedditETL)
+        with pytest.raises(ValueError):
+            etl_factory('reddit')
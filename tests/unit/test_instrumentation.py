@@ -0,0 +1,74 @@
+import json
+import time
+
+import pytest
+from fake_clients import FakeRedditClient
+from instrumentation import RunMetrics
+from social_etl import RedditETL
+from transform import transformation_factory
+from utils.db import DatabaseConnection
+
+
+class TestRunMetrics:
+    """A class to test the per-stage instrumentation of a run."""
+
+    @pytest.mark.parametrize("stream", [False, True])
+    def test_run_metrics(self, stream: bool) -> None:
+        db = DatabaseConnection(db_file="data/test.db")
+        metrics = RunMetrics(chunk_size=100)
+        RedditETL(prefetch_pages=False).run(
+            db_cursor_context=db.managed_cursor(),
+            client=FakeRedditClient(num_posts=500, seed=1),
+            transform_function=transformation_factory("no_tx"),
+            id="metrics",
+            num_records=500,
+            stream=stream,
+            chunk_size=100,
+            metrics=metrics,
+        )
+        assert list(metrics.stages) == ["extract", "transform", "load"]
+        extract, transform, load = metrics.stages.values()
+        assert extract.records_out == 500
+        assert transform.records_in == transform.records_out == 500
+        assert load.records_in == 500
+        assert load.bytes_written > 0
+        assert all(stage.wall_seconds > 0 for stage in (extract, load))
+
+        metrics.save(db)
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT stage, records_out FROM etl_runs WHERE run_id = ?",
+                (metrics.run_id,),
+            )
+            assert dict(cur.fetchall())["extract"] == 500
+            cur.execute("DELETE FROM social_posts WHERE id LIKE 'metrics-%'")
+
+    def test_nested_stages_are_exclusive(self) -> None:
+        metrics = RunMetrics(source="reddit", target_id="python")
+
+        def slow_source():
+            for idx in range(3):
+                time.sleep(0.01)
+                yield idx
+
+        with metrics.stage("load"):
+            assert list(metrics.timed("extract", slow_source())) == [0, 1, 2]
+        assert metrics.stages["extract"].wall_seconds >= 0.03
+        assert metrics.stages["load"].wall_seconds < 0.01
+
+    def test_exports(self) -> None:
+        metrics = RunMetrics(source="reddit", target_id='py"thon')
+        with metrics.stage("extract") as stage:
+            stage.records_out = 3
+        text = metrics.export("prometheus")
+        assert "# TYPE socialetl_stage_wall_seconds gauge" in text
+        assert (
+            'socialetl_stage_records_out{source="reddit",'
+            'target="py\\"thon",stage="extract"} 3'
+        ) in text
+        root, extract = json.loads(metrics.export("otel"))
+        assert extract["parentSpanId"] == root["spanId"]
+        assert extract["traceId"] == root["traceId"] == metrics.run_id
+        assert extract["attributes"]["socialetl.records_out"] == 3
+        with pytest.raises(ValueError):
+            metrics.export("statsd")
@@ -0,0 +1,94 @@
+from typing import List, Tuple
+
+import pytest
+from loader import bulk_load
+from social_etl import SocialMediaData, TwitterTweetData
+from utils.db import DatabaseConnection
+from utils.iterables import batched
+
+
+class TestBulkLoad:
+    """A class to test the batched bulk loader."""
+
+    @pytest.fixture
+    def mock_social_data(self) -> List[SocialMediaData]:
+        return [
+            SocialMediaData(
+                id=f"bulk{str(idx)}",
+                source="bulk",
+                social_data=TwitterTweetData(text=f"text{str(idx)}"),
+            )
+            for idx in range(25)
+        ]
+
+    def test_batched(self) -> None:
+        assert [len(b) for b in batched(range(25), 10)] == [10, 10, 5]
+        with pytest.raises(ValueError):
+            list(batched(range(5), 0))
+
+    def test_bulk_load(self, mock_social_data: List[SocialMediaData]) -> None:
+        db = DatabaseConnection(db_file="data/test.db")
+        stats = bulk_load(
+            iter(mock_social_data), db.managed_cursor(), batch_size=10
+        )
+        assert stats.rows == 25
+        assert stats.batches == 3
+        assert stats.rows_per_sec > 0
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM social_posts WHERE source = 'bulk'"
+            )
+            assert cur.fetchone()[0] == 25
+
+    def test_change_detection(
+        self, mock_social_data: List[SocialMediaData]
+    ) -> None:
+        db = DatabaseConnection(db_file="data/test.db")
+        social_data = [
+            SocialMediaData(
+                id=f"hash{post.id}",
+                source="hash",
+                social_data=TwitterTweetData(text=post.social_data.text),
+            )
+            for post in mock_social_data
+        ]
+        stats = bulk_load(social_data, db.managed_cursor(), batch_size=10)
+        assert (stats.inserted, stats.updated, stats.skipped) == (25, 0, 0)
+
+        social_data[3].social_data.text = "edited"
+        # a duplicate id in the batch is compared to the row before it
+        social_data.append(social_data[4])
+        stats = bulk_load(social_data, db.managed_cursor(), batch_size=30)
+        assert (stats.inserted, stats.updated, stats.skipped) == (0, 1, 25)
+        assert stats.written == 1
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT social_data FROM social_posts WHERE id = 'hashbulk3'"
+            )
+            assert "edited" in cur.fetchone()[0]
+
+    def test_sinks_get_last_duplicate(self) -> None:
+        db = DatabaseConnection(db_file="data/test.db")
+        written: List[Tuple[SocialMediaData, str]] = []
+
+        class RecordingSink:
+            def write(self, posts: List[SocialMediaData], op: str) -> None:
+                written.extend((post, op) for post in posts)
+
+        social_data = [
+            SocialMediaData(
+                id="sinkdup",
+                source="sinkdup",
+                social_data=TwitterTweetData(text=text),
+            )
+            for text in ["first", "last"]
+        ]
+        bulk_load(social_data, db.managed_cursor(), sinks=[RecordingSink()])
+        # the first duplicate inserted the post, the last one is kept
+        assert written == [(social_data[1], "inserted")]
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT social_data FROM social_posts WHERE id = 'sinkdup'"
+            )
+            assert "last" in cur.fetchone()[0]
+            cur.execute("DELETE FROM social_posts WHERE id = 'sinkdup'")
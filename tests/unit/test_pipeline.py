@@ -0,0 +1,70 @@
+from typing import List
+
+import pytest
+from pipeline import pipeline_factory
+from social_etl import RedditPostData, SocialMediaData
+
+
+class TestTransformPipeline:
+    """A class to test the composable transformation pipeline."""
+
+    @pytest.fixture
+    def mock_reddit_data(self) -> List[SocialMediaData]:
+        return [
+            SocialMediaData(
+                id=f"id{str(idx % 12)}",
+                source="reddit",
+                social_data=RedditPostData(
+                    title=f"title{str(idx)}",
+                    score=idx,
+                    url=f"url{str(idx)}",
+                    comms_num=8 if idx == 11 else 1,
+                    created="1675000000.0",
+                    text=f"text{str(idx)}",
+                ),
+            )
+            for idx in range(16)
+        ]
+
+    def test_fused_stages(self, mock_reddit_data) -> None:
+        pipeline = pipeline_factory(
+            "dedup|min:field=score,value=4"
+            "|project:fields=title+comms_num|sd:k=2"
+        )
+        transformed_data = pipeline(mock_reddit_data)
+        assert isinstance(transformed_data, list)
+        assert [p.id for p in transformed_data] == ["id11"]
+        assert transformed_data[0].social_data.text == ""
+        assert transformed_data[0].social_data.title == "title11"
+        # the row-wise stages share one loop, sd runs on its output
+        counts = [
+            (s.name, s.records_in, s.records_out, s.segment)
+            for s in pipeline.stats
+        ]
+        assert counts == [
+            ("dedup", 16, 12, 0),
+            ("min(score>=4)", 12, 8, 0),
+            ("project(title+comms_num)", 8, 8, 0),
+            ("sd", 8, 1, 1),
+        ]
+
+    def test_streaming_windows(self, mock_reddit_data) -> None:
+        pipeline = pipeline_factory("sd", window_size=8)
+        transformed_data = pipeline(iter(mock_reddit_data))
+        assert not isinstance(transformed_data, list)
+        assert [p.id for p in transformed_data] == ["id11"]
+        assert pipeline.stats[0].records_in == 16
+
+    def test_invalid_spec(self) -> None:
+        with pytest.raises(ValueError):
+            pipeline_factory("sd|unknown")
+        with pytest.raises(ValueError):
+            pipeline_factory("sd:k")
+
+    @pytest.mark.parametrize(
+        "spec", ["sd:foo=1", "sd:field=nope", "sd_stream:field=nope"]
+    )
+    def test_invalid_options(self, spec: str) -> None:
+        # caught when the spec is parsed, before any record is extracted
+        with pytest.raises(ValueError, match="Invalid options for stage sd"):
+            pipeline_factory(spec)
@@ -1,11 +1,44 @@
 import json
 from datetime import datetime
+from types import SimpleNamespace
 from typing import List
 
 import pytest
-from social_etl import RedditPostData, SocialMediaData, etl_factory
+import social_etl
+from cache import MemoryResponseCache
+from social_etl import RedditETL, RedditPostData, SocialMediaData, etl_factory
 from transform import transformation_factory
 from utils.db import db_factory
+from watermark import Watermark, WatermarkStore
+
+
+class FakeSubreddit:
+    """A 'new' listing of num_posts submissions, newest first, paged by
+    fullname cursors like the reddit API."""
+
+    def __init__(self, num_posts: int) -> None:
+        self.posts = [
+            SimpleNamespace(
+                id=f'post{str(idx)}',
+                fullname=f't3_post{str(idx)}',
+                title=f'title{str(idx)}',
+                score=idx,
+                url=f'url{str(idx)}',
+                num_comments=idx,
+                created=float(1675000000 - idx),
+                selftext=f'text{str(idx)}',
+            )
+            for idx in range(num_posts)
+        ]
+        self.requests: List = []
+
+    def new(self, limit: int, params: dict):
+        after = params.get('after')
+        self.requests.append(after)
+        start = 0
+        if after is not None:
+            start = [post.fullname for post in self.posts].index(after) + 1
+        return iter(self.posts[start:][:limit])
 
 
 class TestRedditETL:
@@ -60,6 +93,27 @@ class TestRedditETL:
         assert transformed_data[0].social_data.comms_num == 8  # type: ignore
         assert len(transformed_data) == 1
 
+    def test_windowed_transform(
+        self, mock_reddit_data: List[SocialMediaData]
+    ) -> None:
+        """Function to test the streaming (windowed) sd transformation.
+
+        Args:
+            mock_reddit_data (List[SocialMediaData]): List of SocialMediaData
+            objects that replicate what we get from the extract method.
+        """
+        _, reddit_etl = etl_factory('reddit')
+        transformed_data = reddit_etl.transform(
+            iter(mock_reddit_data + mock_reddit_data),
+            transformation_factory('sd', window_size=len(mock_reddit_data)),
+        )
+        # windows are consumed lazily and each keeps its own outlier
+        assert not isinstance(transformed_data, list)
+        assert [post.social_data.comms_num for post in transformed_data] == [
+            8,
+            8,
+        ]
+
     def test_load(self, mock_reddit_data: List[SocialMediaData]) -> None:
         """Function to test the load method of the RedditETL class.
 
@@ -95,3 +149,78 @@ class TestRedditETL:
             json.loads(rows[0][2].replace("\'", "\"")).get('text')
             == transformed_data[0].social_data.text
         )
+
+    def test_paginated_extract(self) -> None:
+        """Function to test paging through a listing and resuming from the
+        saved cursor."""
+        subreddit = FakeSubreddit(250)
+        client = SimpleNamespace(subreddit=lambda id: subreddit)
+        store = WatermarkStore(db_factory(db_file="data/test.db"))
+        reddit_etl = RedditETL(
+            listing='new', resume=True, watermark_store=store
+        )
+
+        first = reddit_etl.extract('paged', num_records=150, client=client)
+        assert [post.id for post in first] == [
+            f'post{str(idx)}' for idx in range(150)
+        ]
+        assert subreddit.requests == [None, 't3_post99']
+        # the cursor is only saved once the run is loaded
+        reddit_etl._commit_progress()
+        assert store.get('reddit', 'paged:new').last_id == 't3_post149'
+
+        second = reddit_etl.extract('paged', num_records=150, client=client)
+        assert [post.id for post in second] == [
+            f'post{str(idx)}' for idx in range(150, 250)
+        ]
+        reddit_etl._commit_progress()
+        # the listing is exhausted, so the next run starts from the top
+        assert store.get('reddit', 'paged:new').last_id is None
+
+    def test_cached_listing(self) -> None:
+        """Function to test that listing pages are served from the
+        cache."""
+        subreddit = FakeSubreddit(150)
+        client = SimpleNamespace(subreddit=lambda id: subreddit)
+        reddit_etl = RedditETL(listing='new', cache=MemoryResponseCache())
+        for _ in range(2):
+            posts = reddit_etl.extract(
+                'cached', num_records=150, client=client
+            )
+            assert len(posts) == 150
+        assert subreddit.requests == [None, 't3_post99']
+
+    @pytest.mark.parametrize(
+        "listing, extracted, last_created",
+        [("new", 2, 1675000000.0), ("hot", 5, 1674999998.0)],
+    )
+    def test_watermark_by_listing(
+        self, listing: str, extracted: int, last_created: float
+    ) -> None:
+        """Function to test that only the 'new' listing drops the posts
+        created before the watermark, and moves it, as hot and top can
+        list an old post after the watermark moved past it."""
+        subreddit = FakeSubreddit(5)
+        subreddit.hot = subreddit.new
+        client = SimpleNamespace(subreddit=lambda id: subreddit)
+        store = WatermarkStore(db_factory(db_file="data/test.db"))
+        id = f'{listing}_listing'
+        store.set_many('reddit', {id: Watermark(last_created=1674999998.0)})
+        reddit_etl = RedditETL(listing=listing, watermark_store=store)
+        posts = reddit_etl.extract(id, num_records=5, client=client)
+        assert len(posts) == extracted
+        reddit_etl._commit_progress()
+        assert store.get('reddit', id).last_created == last_created
+
+    def test_rate_limited_pages(self) -> None:
+        """Function to test that every listing page acquires a token of
+        the rate limiter, and that reddit rejects concurrent workers."""
+        subreddit = FakeSubreddit(250)
+        client = SimpleNamespace(subreddit=lambda id: subreddit)
+        acquired = []
+        bucket = SimpleNamespace(acquire=lambda: acquired.append(1))
+        reddit_etl = social_etl.reddit_etl(rate_limiter=bucket, listing='new')
+        reddit_etl.extract('limited', num_records=250, client=client)
+        assert len(acquired) == len(subreddit.requests) == 3
+        with pytest.raises(ValueError):
+            social_etl.reddit_etl(max_workers=4)
@@ -0,0 +1,63 @@
+import pytest
+import social_etl
+from fake_clients import FakeRedditClient, FakeTwitterClient, use_fake_clients
+from replay import (
+    ReplayCache,
+    ResponseNotRecorded,
+    recording_cache,
+    use_offline_clients,
+)
+from social_etl import RedditETL, TwitterETL, etl_factory
+
+
+class TestFakeClientsAndReplay:
+    """A class to test the fake API clients and the record/replay mode."""
+
+    @pytest.fixture(autouse=True)
+    def isolated_registry(self, monkeypatch) -> None:
+        monkeypatch.setattr(
+            social_etl, 'SOURCE_REGISTRY', dict(social_etl.SOURCE_REGISTRY)
+        )
+
+    def test_fake_reddit_client(self) -> None:
+        client = FakeRedditClient(num_posts=250, seed=1)
+        posts = RedditETL().extract('fake', num_records=1000, client=client)
+        assert len(posts) == 250
+        assert len({post.id for post in posts}) == 250
+        again = RedditETL().extract('fake', num_records=1000, client=client)
+        assert posts == again
+
+    def test_fake_twitter_client(self) -> None:
+        client = FakeTwitterClient(num_following=4, tweets_per_user=25)
+        tweets = TwitterETL().extract('fake', num_records=1000, client=client)
+        assert len(tweets) == 100
+        assert len({tweet.id for tweet in tweets}) == 100
+        # since_id only returns newer tweets
+        user_id = client.get_users_following(id=1).data[0].id
+        newest = client.get_users_tweets(id=str(user_id)).data[0].id
+        older = str(int(newest) - 5)
+        assert len(
+            client.get_users_tweets(id=str(user_id), since_id=older).data
+        ) == 5
+        assert client.get_users_tweets(
+            id=str(user_id), since_id=newest
+        ).data is None
+
+    def test_record_and_replay(self, tmp_path) -> None:
+        fixture = str(tmp_path / 'reddit.db')
+        use_fake_clients(num_posts=300, latency=0.001)
+        client, reddit_etl = etl_factory(
+            'reddit', cache=recording_cache(fixture)
+        )
+        recorded = reddit_etl.extract('python', num_records=300, client=client)
+
+        use_offline_clients()
+        cache = ReplayCache(fixture)
+        client, reddit_etl = etl_factory('reddit', cache=cache)
+        replayed = reddit_etl.extract('python', num_records=300, client=client)
+        assert replayed == recorded
+        assert cache.stats.hits == 3
+        with pytest.raises(ResponseNotRecorded):
+            reddit_etl.extract('rust', num_records=10, client=client)
+        with pytest.raises(FileNotFoundError):
+            ReplayCache(str(tmp_path / 'missing.db'))
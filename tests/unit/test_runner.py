@@ -0,0 +1,124 @@
+import threading
+import time
+from typing import List
+
+import metadata
+import pytest
+from fake_clients import FakeRedditClient
+from metadata import MetadataBuffer
+from runner import EtlJob, parse_job, run_jobs
+from social_etl import RedditETL, RedditPostData, SocialMediaData
+from utils.db import DatabaseConnection
+
+
+class TestRunner:
+    """A class to test the multi job ETL runner."""
+
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def fake_etl_builder(self, job: EtlJob):
+        reddit_etl = RedditETL()
+
+        def extract(id: str, num_records: int, client) -> List:
+            if id == 'broken':
+                raise RuntimeError('subreddit not found')
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(0.05)
+            with self.lock:
+                self.active -= 1
+            return [
+                SocialMediaData(
+                    id=f'{id}_{str(idx)}',
+                    source='reddit',
+                    social_data=RedditPostData(
+                        title=f'title{str(idx)}',
+                        score=idx,
+                        url=f'url{str(idx)}',
+                        comms_num=idx,
+                        created='1675000000.0',
+                        text=f'text{str(idx)}',
+                    ),
+                )
+                for idx in range(num_records)
+            ]
+
+        reddit_etl.extract = extract  # type: ignore
+        return FakeRedditClient(), reddit_etl
+
+    def test_parse_job(self) -> None:
+        assert parse_job('reddit:python') == EtlJob('reddit', 'python')
+        assert parse_job('reddit:python:min:field=score,value=3') == EtlJob(
+            'reddit', 'python', 'min:field=score,value=3'
+        )
+        with pytest.raises(ValueError):
+            parse_job('reddit')
+
+    def test_run_jobs(self, monkeypatch) -> None:
+        jobs = [EtlJob('reddit', f'runner_sub{str(idx)}') for idx in range(8)]
+        jobs.append(EtlJob('reddit', 'broken'))
+        jobs.append(
+            EtlJob('reddit', 'runner_min', 'min:field=score,value=6')
+        )
+        db = DatabaseConnection(db_file='data/test.db', pooled=True)
+        writer_threads = set()
+        load = DatabaseConnection.managed_cursor
+
+        def record_writer(self, *args, **kwargs):
+            if self is db:
+                writer_threads.add(threading.get_ident())
+            return load(self, *args, **kwargs)
+
+        monkeypatch.setattr(
+            DatabaseConnection, 'managed_cursor', record_writer
+        )
+        # flush on every row, to catch a flush from a worker
+        buffer = MetadataBuffer(flush_size=1)
+        flush_threads = set()
+
+        def record_flush():
+            flush_threads.add(threading.get_ident())
+            MetadataBuffer.flush(buffer)
+
+        monkeypatch.setattr(buffer, 'flush', record_flush)
+        monkeypatch.setattr(metadata, '_buffer', buffer)
+        report = run_jobs(
+            jobs,
+            db,
+            max_workers=4,
+            num_records=10,
+            etl_builder=self.fake_etl_builder,
+        )
+        monkeypatch.undo()
+        db.close()
+
+        # the extracts overlap, on at most 4 workers
+        assert 1 < self.max_active <= 4
+        assert writer_threads == {threading.get_ident()}
+        assert flush_threads == {threading.get_ident()}
+        assert [result.job for result in report.results] == jobs
+        assert [result.records for result in report.results] == (
+            [10] * 8 + [0, 4]
+        )
+        assert [result.job.id for result in report.failed] == ['broken']
+        assert report.records == 84
+        assert report.records_per_sec > 0
+        with db.managed_cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM social_posts WHERE id LIKE 'runner_%'"
+            )
+            assert cur.fetchone()[0] == 84
+            cur.execute(
+                "SELECT target_id, records_out FROM etl_runs"
+                " WHERE stage = 'load' AND target_id LIKE 'runner_%'"
+            )
+            loads = dict(cur.fetchall())
+        assert loads == {
+            result.job.id: result.records
+            for result in report.results
+            if not result.error
+        }
+        assert {result.run_id for result in report.failed} == {None}
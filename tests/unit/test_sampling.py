@@ -0,0 +1,86 @@
+import random
+from collections import Counter
+from typing import List
+
+import pytest
+import sampling
+from sampling import reservoir_sample, stratified_sample
+from social_etl import RedditPostData, SocialMediaData, TwitterTweetData
+
+
+def reddit_post(idx: int) -> SocialMediaData:
+    return SocialMediaData(
+        id=f"id{str(idx)}",
+        source="reddit",
+        social_data=RedditPostData(
+            title=f"title{str(idx)}",
+            score=idx,
+            url=f"url{str(idx)}",
+            comms_num=0,
+            created="1675000000.0",
+            text=f"text{str(idx)}",
+        ),
+    )
+
+
+class TestSampling:
+    """A class to test the reservoir and stratified samplers."""
+
+    @pytest.fixture
+    def mock_social_data(self) -> List[SocialMediaData]:
+        tweets = [
+            SocialMediaData(
+                id=f"tweet{str(idx)}",
+                source="twitter",
+                social_data=TwitterTweetData(text=f"text{str(idx)}"),
+            )
+            for idx in range(50)
+        ]
+        return [reddit_post(idx) for idx in range(300)] + tweets
+
+    def test_reservoir_sample(self, mock_social_data) -> None:
+        sample = reservoir_sample(iter(mock_social_data), k=10, seed=1)
+        assert len(sample) == 10
+        assert len({post.id for post in sample}) == 10
+        assert sample == reservoir_sample(mock_social_data, k=10, seed=1)
+        assert len(reservoir_sample(mock_social_data[:3], k=10)) == 3
+        with pytest.raises(ValueError):
+            reservoir_sample(mock_social_data, k=0)
+
+    def test_reservoir_sample_is_uniform(self) -> None:
+        posts = [reddit_post(idx) for idx in range(20)]
+        counts = Counter(
+            post.id
+            for seed in range(2000)
+            for post in reservoir_sample(posts, k=5, seed=seed)
+        )
+        # every post is expected 2000 * 5 / 20 = 500 times
+        assert len(counts) == 20
+        assert all(400 < count < 600 for count in counts.values())
+
+    def test_reservoir_sample_draws_close_to_one(self, monkeypatch) -> None:
+        class HighRandom(random.Random):
+            def random(self) -> float:
+                # the largest float below 1, for which w rounds to 1.0
+                return 1 - 2**-53
+
+        monkeypatch.setattr(sampling.random, "Random", HighRandom)
+        posts = [reddit_post(idx) for idx in range(5)]
+        assert len(reservoir_sample(posts, k=2, seed=1)) == 2
+
+    def test_stratified_sample(self, mock_social_data) -> None:
+        sample = stratified_sample(mock_social_data, k=4, seed=1)
+        assert Counter(post.source for post in sample) == {
+            'reddit': 4,
+            'twitter': 4,
+        }
+        sample = stratified_sample(
+            mock_social_data, k=2, by='score', bucket_size=100, seed=1
+        )
+        buckets = Counter(
+            getattr(post.social_data, 'score', -1) // 100 for post in sample
+        )
+        # three score buckets of reddit posts and the tweets
+        assert sorted(buckets.values()) == [2, 2, 2, 2]
+        with pytest.raises(ValueError):
+            stratified_sample(mock_social_data, by='title')
@@ -0,0 +1,64 @@
+import json
+from dataclasses import asdict
+
+import pytest
+from serializer import SERIALIZERS, row_encoder_factory, social_data_dict
+from social_etl import (
+    RedditPostData,
+    SocialMediaData,
+    TwitterTweetData,
+)
+
+
+class TestSerializer:
+    """A class to test the social_posts row encoders."""
+
+    @pytest.fixture
+    def mock_reddit_post(self) -> SocialMediaData:
+        return SocialMediaData(
+            id="id0",
+            source="reddit",
+            social_data=RedditPostData(
+                title="title0",
+                score=1,
+                url="url0",
+                comms_num=2,
+                created="1675000000.0",
+                text="it's text0",
+            ),
+        )
+
+    def test_social_data_dict(self, mock_reddit_post) -> None:
+        assert social_data_dict(mock_reddit_post.social_data) == asdict(
+            mock_reddit_post.social_data
+        )
+        assert social_data_dict(TwitterTweetData(text="text0")) == {
+            "text": "text0"
+        }
+
+    @pytest.mark.parametrize(
+        "backend", [b for b in SERIALIZERS if b != "msgpack"]
+    )
+    def test_json_backends(self, mock_reddit_post, backend) -> None:
+        row = row_encoder_factory(backend)(mock_reddit_post)
+        assert row["id"] == "id0"
+        assert row["source"] == "reddit"
+        assert json.loads(row["social_data"]) == asdict(
+            mock_reddit_post.social_data
+        )
+
+    def test_default_backend(self) -> None:
+        # the stored text, and so the content hash, is the same whatever
+        # optional backends are installed
+        post = SocialMediaData(
+            id="id0",
+            source="twitter",
+            social_data=TwitterTweetData(text="caf\u00e9"),
+        )
+        row = row_encoder_factory()(post)
+        assert row["social_data"] == '{"text":"caf\\u00e9"}'
+        assert row == row_encoder_factory("json")(post)
+
+    def test_unknown_backend(self) -> None:
+        with pytest.raises(ValueError):
+            row_encoder_factory("pickle")
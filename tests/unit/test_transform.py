@@ -0,0 +1,75 @@
+import random
+from typing import List
+
+import numpy as np
+import pytest
+from batch import SocialMediaBatch
+from social_etl import RedditPostData, SocialMediaData
+from stats import RunningStats
+from transform import (
+    standard_deviation_outlier_filter,
+    transformation_factory,
+)
+
+
+class TestStandardDeviationFilters:
+    """A class to test the standard deviation outlier filters."""
+
+    @pytest.fixture
+    def mock_reddit_data(self) -> List[SocialMediaData]:
+        rng = random.Random(42)
+        return [
+            SocialMediaData(
+                id=f"id{str(idx)}",
+                source="reddit",
+                social_data=RedditPostData(
+                    title=f"title{str(idx)}",
+                    score=rng.randint(0, 100) + (500 if idx == 150 else 0),
+                    url=f"url{str(idx)}",
+                    comms_num=rng.randint(0, 10),
+                    created="1675000000.0",
+                    text=f"text{str(idx)}",
+                ),
+            )
+            for idx in range(200)
+        ]
+
+    def test_matches_pure_python(self, mock_reddit_data) -> None:
+        num_comments = [p.social_data.comms_num for p in mock_reddit_data]
+        mean = sum(num_comments) / len(num_comments)
+        std = (
+            sum([(x - mean) ** 2 for x in num_comments]) / len(num_comments)
+        ) ** 0.5
+        expected = [
+            p for p in mock_reddit_data if p.social_data.comms_num > mean + std
+        ]
+        assert (
+            standard_deviation_outlier_filter(mock_reddit_data, k=1)
+            == expected
+        )
+        batch = SocialMediaBatch.from_records(mock_reddit_data)
+        assert list(standard_deviation_outlier_filter(batch, k=1)) == expected
+
+    def test_field_and_k(self, mock_reddit_data) -> None:
+        transform_function = transformation_factory("sd", field="score", k=3)
+        transformed_data = transform_function(mock_reddit_data)
+        assert [p.id for p in transformed_data] == ["id150"]
+        with pytest.raises(ValueError):
+            transformation_factory("sd", field="title")(mock_reddit_data)
+
+    def test_streaming(self, mock_reddit_data) -> None:
+        transform_function = transformation_factory(
+            "sd_stream", field="score", k=3
+        )
+        assert [p.id for p in transform_function(iter(mock_reddit_data))] == [
+            "id150"
+        ]
+
+    def test_running_stats(self) -> None:
+        values = np.random.default_rng(0).normal(1e6, 5, size=1000)
+        stats = RunningStats()
+        for value in values:
+            stats.update(value)
+        assert stats.count == 1000
+        assert stats.mean == pytest.approx(values.mean())
+        assert stats.std == pytest.approx(values.std())
@@ -1,8 +1,14 @@
 import json
+import time
 from typing import List
 
 import pytest
-from social_etl import SocialMediaData, TwitterTweetData, etl_factory
+from social_etl import (
+    SocialMediaData,
+    TwitterETL,
+    TwitterTweetData,
+    etl_factory,
+)
 from transform import transformation_factory
 from utils.db import DatabaseConnection
 
@@ -73,6 +79,63 @@ class TestTwitterETL:
             == mock_twitter_data[0].social_data.text
         )
 
+    def test_extract_stream(self, mocker) -> None:
+        """Function to test that extract_stream only requests timelines
+        until num_records tweets have been yielded."""
+        _, twitter_etl = etl_factory('twitter')
+        client = mocker.Mock()
+        client.get_users_following.return_value.data = [
+            mocker.Mock(id=idx) for idx in range(3)
+        ]
+        client.get_users_tweets.return_value.data = [
+            mocker.Mock(id=f"id{str(idx)}", text=f"text{str(idx)}")
+            for idx in range(2)
+        ]
+        social_data = twitter_etl.extract_stream(
+            id="startdataeng", num_records=3, client=client
+        )
+        assert client.get_users_tweets.call_count == 0
+        assert [post.social_data.text for post in social_data] == [
+            "text0",
+            "text1",
+            "text0",
+        ]
+        assert client.get_users_tweets.call_count == 2
+
+    def test_concurrent_extract(self, mocker) -> None:
+        """Function to test that timelines are fetched concurrently and
+        merged in the same order as the sequential extract."""
+        latency = 0.05
+
+        def get_users_tweets(id, **kwargs):
+            time.sleep(latency)
+            return mocker.Mock(
+                data=[mocker.Mock(id=f"{id}_tweet", text=f"text{id}")]
+            )
+
+        client = mocker.Mock()
+        client.get_users_following.return_value.data = [
+            mocker.Mock(id=idx) for idx in range(8)
+        ]
+        client.get_users_tweets.side_effect = get_users_tweets
+
+        timings = {}
+        results = {}
+        for max_workers in [1, 8]:
+            start = time.perf_counter()
+            twitter_etl = TwitterETL(max_workers=max_workers)
+            results[max_workers] = twitter_etl.extract(
+                id="startdataeng", num_records=100, client=client
+            )
+            timings[max_workers] = time.perf_counter() - start
+
+        assert [post.id for post in results[8]] == [
+            post.id for post in results[1]
+        ]
+        assert len(results[8]) == 8
+        assert timings[1] >= 8 * latency
+        assert timings[8] < timings[1] / 2
+
     def test_load(self, mock_twitter_data: List[SocialMediaData]) -> None:
         """Function to test the load method of the TwitterETL class.
 
@@ -0,0 +1,97 @@
+from typing import List
+
+import pytest
+from loader import bulk_load
+from social_etl import SocialMediaData, TwitterETL, TwitterTweetData
+from transform import transformation_factory
+from utils.db import DatabaseConnection
+from watermark import Watermark, WatermarkStore
+
+
+class TestWatermark:
+    """A class to test incremental extraction with high-water marks."""
+
+    @pytest.fixture
+    def store(self) -> WatermarkStore:
+        return WatermarkStore(DatabaseConnection(db_file="data/test.db"))
+
+    def test_round_trip(self, store: WatermarkStore) -> None:
+        assert store.get("test", "missing") == Watermark()
+        store.set_many("test", {"a": Watermark(last_id="1")})
+        store.set_many(
+            "test",
+            {"a": Watermark(last_id="2"), "b": Watermark(last_created=3.0)},
+        )
+        assert store.get_many("test", ["a", "b", "c"]) == {
+            "a": Watermark(last_id="2"),
+            "b": Watermark(last_created=3.0),
+        }
+
+    def test_twitter_since_id(self, store: WatermarkStore, mocker) -> None:
+        client = mocker.Mock()
+        client.get_users_following.return_value.data = [mocker.Mock(id=7)]
+        client.get_users_tweets.return_value.data = [
+            mocker.Mock(id=idx, text=f"text{str(idx)}") for idx in [12, 11]
+        ]
+        twitter_etl = TwitterETL(watermark_store=store)
+        for _ in range(2):
+            twitter_etl.run(
+                db_cursor_context=DatabaseConnection(
+                    db_file="data/test.db"
+                ).managed_cursor(),
+                client=client,
+                transform_function=transformation_factory("no_tx"),
+            )
+        since_ids = [
+            call.kwargs["since_id"]
+            for call in client.get_users_tweets.call_args_list
+        ]
+        assert since_ids == [None, "12"]
+
+    @pytest.mark.parametrize(
+        "user_id, num_records, since_id", [(8, 2, "22"), (9, 1, None)]
+    )
+    def test_twitter_since_id_cut_off(
+        self,
+        store: WatermarkStore,
+        mocker,
+        user_id: int,
+        num_records: int,
+        since_id: str,
+    ) -> None:
+        client = mocker.Mock()
+        client.get_users_following.return_value.data = [
+            mocker.Mock(id=user_id)
+        ]
+        client.get_users_tweets.return_value.data = [
+            mocker.Mock(id=idx, text=f"text{str(idx)}") for idx in [22, 21]
+        ]
+        twitter_etl = TwitterETL(watermark_store=store)
+        for _ in range(2):
+            twitter_etl.run(
+                db_cursor_context=DatabaseConnection(
+                    db_file="data/test.db"
+                ).managed_cursor(),
+                client=client,
+                transform_function=transformation_factory("no_tx"),
+                num_records=num_records,
+            )
+        # the watermark moves once the whole timeline was extracted, even
+        # when num_records ends exactly on its last tweet
+        assert client.get_users_tweets.call_args_list[-1].kwargs[
+            "since_id"
+        ] == since_id
+
+    def test_load_skips_unchanged(self) -> None:
+        db = DatabaseConnection(db_file="data/test.db")
+        social_data: List[SocialMediaData] = [
+            SocialMediaData(
+                id=f"wm{str(idx)}",
+                source="wm",
+                social_data=TwitterTweetData(text=f"text{str(idx)}"),
+            )
+            for idx in range(3)
+        ]
+        assert bulk_load(social_data, db.managed_cursor()).skipped == 0
+        social_data[0].social_data.text = "edited"
+        assert bulk_load(social_data, db.managed_cursor()).skipped == 2